@@ -0,0 +1,77 @@
+"""
+Benchmark throughput embedding (simbol/detik) per konfigurasi batch & paralelisme
+fastembed, memakai teks simbol nyata dari proyek ini.
+
+Selain throughput, dicetak efisiensi padding: token berguna / token yang benar-benar
+diproses ONNX (setiap batch di-padding ke teks terpanjangnya).
+Jalankan dari root repo:  python benchmarks/bench_embedding.py [path_proyek] [maks_simbol]
+"""
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+sys.path.append(os.getcwd())
+
+_TMP = tempfile.mkdtemp(prefix="aron-bench-")
+os.environ.setdefault("ARON_DB_DIR", _TMP)
+os.environ.setdefault("ARON_DB_PATH", os.path.join(_TMP, "aron_symbols.db"))
+os.environ.setdefault("ARON_EMBEDDING_WARMUP", "lazy")
+from fastembed import TextEmbedding
+from src.core.config import settings
+from src.memory.file_filter import FileEnumerator
+from src.memory.indexer import SymbolParser
+from src.memory.vector_store import VectorStore
+
+# (label, EMBEDDING_SORT_BY_LENGTH, EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS, EMBEDDING_PARALLEL)
+CONFIGS = [
+    ("arrival/20", False, 20, None, None),
+    ("arrival/64", False, 64, None, None),
+    ("sorted/32", True, 32, None, None),
+    ("sorted/64", True, 64, None, None),
+    ("sorted/32 t=1", True, 32, 1, None),
+    ("sorted/32 p=2", True, 32, 1, 2),
+]
+
+def _symbol_texts(project: str, limit: int):
+    parser, texts = SymbolParser(), []
+    for file_path, ext, _ in FileEnumerator(project).iter_files():
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            rel_path = os.path.relpath(file_path, project)
+            for s in parser.parse(f.read(), rel_path, ext):
+                texts.append(f"{s['name']} in {s['file_path']}: {s['content']}")
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+def _padding_efficiency(lengths, sort: bool, batch: int) -> float:
+    lengths = sorted(lengths) if sort else list(lengths)
+    padded = sum(max(chunk) * len(chunk) for chunk in (lengths[i:i + batch] for i in range(0, len(lengths), batch)))
+    return sum(lengths) / padded if padded else 1.0
+
+def _token_lengths(model: TextEmbedding, texts):
+    tokenizer = getattr(getattr(model, "model", None), "tokenizer", None)
+    if tokenizer is None:
+        return [len(t) for t in texts], "chars"
+    return [len(e.ids) for e in tokenizer.encode_batch(texts)], "tokens"
+
+def main(project: str, limit: int = 2000):
+    texts = _symbol_texts(project, limit)
+    store = VectorStore()
+    print(f"{len(texts)} symbol texts from {project}")
+    print(f"{'config':<16}{'symbols/s':>12}{'padding eff.':>14}")
+    for label, sort, batch, threads, parallel in CONFIGS:
+        with mock.patch.multiple(settings, EMBEDDING_SORT_BY_LENGTH=sort, EMBEDDING_BATCH_SIZE=batch,
+                                 EMBEDDING_THREADS=threads, EMBEDDING_PARALLEL=parallel):
+            store.model = TextEmbedding(model_name=settings.EMBEDDING_MODEL,
+                                        cache_dir=str(settings.MODEL_DIR / ".embeddings"), threads=threads)
+            lengths, unit = _token_lengths(store.model, texts)
+            store.embed_texts(texts[:batch])  # Pemanasan sesi ONNX
+            start = time.perf_counter()
+            store.embed_texts(texts)
+            elapsed = time.perf_counter() - start
+        print(f"{label:<16}{len(texts) / elapsed:>12.1f}{_padding_efficiency(lengths, sort, batch):>13.1%} ({unit})")
+    store.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.getcwd(), int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
@@ -0,0 +1,69 @@
+"""
+Benchmark mode ringkas backend NumPy: ukuran index, byte yang dipindai per query,
+latensi p50, dan recall@k terhadap pencarian exact float32.
+
+Vektor sintetis berkelompok (mirip embedding kode: banyak simbol bertetangga),
+query = titik data + noise. Ground truth dihitung brute-force float32.
+Jalankan dari root repo:  python benchmarks/bench_quantization.py [jumlah_vektor] [k]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+import numpy as np
+sys.path.append(os.getcwd())
+from src.memory.vector_backends import NumpyBackend, EMBEDDING_DIM
+
+CONFIGS = [
+    ("float32", dict(dtype="float32")),
+    ("float16", dict(dtype="float16")),
+    ("int8", dict(quantization="int8", rescore=False)),
+    ("int8+rescore", dict(quantization="int8", rescore=True)),
+    ("binary", dict(quantization="binary", rescore=False)),
+    ("binary+rescore", dict(quantization="binary", rescore=True)),
+    ("binary+rescore10", dict(quantization="binary", rescore=True, oversampling=10.0)),
+]
+
+def _dataset(n: int, queries: int, clusters: int = 500):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, EMBEDDING_DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    probes = vectors[rng.integers(0, n, queries)] + 0.3 * rng.standard_normal((queries, EMBEDDING_DIM)).astype(np.float32)
+    return vectors, probes
+
+def _mb(size: int) -> str:
+    return f"{size / 2 ** 20:.1f}"
+
+def main(n: int = 100_000, k: int = 10, queries: int = 100):
+    vectors, probes = _dataset(n, queries)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    truth = [set(np.argsort(-(normed @ q))[:k]) for q in probes]
+    points = [(f"p{i}", vectors[i], {"name": f"p{i}", "file_path": f"f{i % 997}.py"}) for i in range(n)]
+
+    root = tempfile.mkdtemp(prefix="aron-quant-")
+    print(f"n={n}, dim={EMBEDDING_DIM}, k={k}, queries={queries}")
+    print(f"{'mode':<18}{'disk (MB)':>10}{'scan/query (MB)':>17}{'p50 (ms)':>10}{'recall@k':>10}")
+    try:
+        for label, options in CONFIGS:
+            backend = NumpyBackend(root, label, payloads_on_disk=True, **options)
+            backend.init_collection()
+            for start in range(0, n, 10_000):
+                backend.upsert(points[start:start + 10_000])
+            timings, hits = [], 0
+            for q, expected in zip(probes, truth):
+                start = time.perf_counter()
+                results = backend.search_batch([q], k)[0]
+                timings.append((time.perf_counter() - start) * 1000)
+                hits += len(expected & {int(r["name"][1:]) for r in results})
+            disk = sum(f.stat().st_size for f in backend.dir.iterdir() if f.suffix == ".bin")
+            footprint = backend.footprint()
+            print(f"{label:<18}{_mb(disk):>10}{_mb(footprint['scanned_per_query']):>17}"
+                  f"{statistics.median(timings):>10.2f}{hits / (k * len(probes)):>10.3f}")
+            backend.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main(n=int(sys.argv[1]) if len(sys.argv) > 1 else 100_000, k=int(sys.argv[2]) if len(sys.argv) > 2 else 10)
@@ -0,0 +1,77 @@
+"""
+Benchmark retrieval: latensi (p50) dan recall@k untuk dense saja, BM25 saja,
+dan HybridRetriever (fast path identifier + RRF) pada simbol proyek ini.
+
+Query dibuat dari simbol yang terindeks:
+  - identifier : nama simbol apa adanya (`ProjectIndexer`, `_run_shell`)
+  - deskriptif : nama dipecah jadi kata ("project indexer", "run shell")
+
+Index dibangun di direktori sementara agar database utama tidak tersentuh.
+Jalankan dari root repo:  python benchmarks/bench_retrieval.py [path_proyek] [k]
+"""
+import os
+import re
+import sys
+import time
+import random
+import tempfile
+import statistics
+sys.path.append(os.getcwd())
+
+_TMP = tempfile.mkdtemp(prefix="aron-bench-")
+os.environ.setdefault("ARON_DB_DIR", _TMP)
+os.environ.setdefault("ARON_DB_PATH", os.path.join(_TMP, "aron_symbols.db"))
+os.environ.setdefault("ARON_CURRENT_PROJECT_DIR", sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), "src"))
+
+from src.core.config import settings
+from src.memory.vector_store import VectorStore
+from src.memory.indexer import ProjectIndexer
+from src.memory.models import Session, engine, select, CodeSymbol, lexical_search
+from src.memory.hybrid import HybridRetriever, looks_like_identifier
+
+def _words(name: str) -> str:
+    name = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", name)
+    return " ".join(part.lower() for part in re.split(r"[_\W]+", name) if part)
+
+def _evaluate(label: str, search, queries, k: int):
+    timings, hits = [], 0
+    for query, expected in queries:
+        start = time.perf_counter()
+        results = search(query, k)
+        timings.append((time.perf_counter() - start) * 1000)
+        hits += any((r.get("file_path"), r.get("name")) == expected for r in results[:k])
+    recall = hits / len(queries) if queries else 0.0
+    print(f"  {label:<10}{statistics.median(timings):>10.2f}{max(timings):>10.2f}{recall:>12.3f}")
+
+def main(k: int = 5, samples: int = 100):
+    store = VectorStore()
+    ProjectIndexer(str(settings.CURRENT_PROJECT_DIR), store, workers=1).scan_project(full=True, verbose=False)
+    store.model  # Tunggu warm-up agar tidak ikut terukur
+    project = store.project_hash
+
+    with Session(engine) as session:
+        rows = session.exec(select(CodeSymbol.file_path, CodeSymbol.name).where(CodeSymbol.project == project)).all()
+    random.seed(0)
+    rows = random.sample(rows, min(samples, len(rows)))
+    suites = {
+        "identifier": [(name, (path, name)) for path, name in rows if looks_like_identifier(name)],
+        "descriptive": [(_words(name), (path, name)) for path, name in rows if len(_words(name).split()) > 1],
+    }
+
+    hybrid = HybridRetriever(store)
+    retrievers = {
+        "dense": lambda q, n: store.search(q, limit=n),
+        "bm25": lambda q, n: lexical_search(project, q, n),
+        "hybrid": hybrid.search,
+    }
+    for suite, queries in suites.items():
+        print(f"\n{suite} queries (n={len(queries)}, k={k})")
+        print(f"  {'path':<10}{'p50 (ms)':>10}{'max (ms)':>10}{'recall@k':>12}")
+        for label, search in retrievers.items():
+            store.result_cache.clear()
+            _evaluate(label, search, queries, k)
+    print(f"\nhybrid path usage: {hybrid.stats}")
+    store.close()
+
+if __name__ == "__main__":
+    main(k=int(sys.argv[2]) if len(sys.argv) > 2 else 5)
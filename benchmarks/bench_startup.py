@@ -0,0 +1,39 @@
+"""
+Micro-benchmark: waktu konstruksi VectorStore (yang menahan prompt pertama)
+dan latensi pencarian pertama untuk tiap mode EMBEDDING_WARMUP.
+
+Jalankan dari root repo:  python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+from pathlib import Path
+sys.path.append(os.getcwd())
+from src.core.config import settings
+from src.memory.vector_store import VectorStore
+
+def _measure(mode: str):
+    with tempfile.TemporaryDirectory() as db_dir, \
+         mock.patch.object(settings, "EMBEDDING_WARMUP", mode), \
+         mock.patch.object(settings, "DB_DIR", Path(db_dir)):
+        start = time.perf_counter()
+        store = VectorStore()
+        construct = time.perf_counter() - start
+        # Simulasi jeda pengguna mengetik pertanyaan pertama
+        time.sleep(1.0)
+        start = time.perf_counter()
+        store.search("where is the config loaded", limit=3)
+        first_search = time.perf_counter() - start
+        store.close()
+    return construct * 1000, first_search * 1000
+
+def main():
+    print(f"{'mode':<12}{'startup (ms)':>14}{'first search (ms)':>20}")
+    for mode in ("eager", "background", "lazy"):
+        construct, first_search = _measure(mode)
+        print(f"{mode:<12}{construct:>14.1f}{first_search:>20.1f}")
+
+if __name__ == "__main__":
+    main()
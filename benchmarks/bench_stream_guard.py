@@ -0,0 +1,79 @@
+"""
+Micro-benchmark pengecekan stop sequence & repetisi per token di generate_stream:
+loop lama (scan seluruh teks + splitlines tiap token) vs StopMatcher/RepetitionDetector.
+
+Output sintetis mirip kode (~4 karakter per token) tanpa stop sequence maupun loop,
+jadi kedua varian memproses seluruh output (kasus terburuk untuk loop lama).
+Jalankan dari root repo:  python benchmarks/bench_stream_guard.py [jumlah_token ...]
+"""
+import os
+import sys
+import time
+import random
+import statistics
+sys.path.append(os.getcwd())
+from src.llm.stream_guard import StopMatcher, RepetitionDetector
+
+STOPS = ["<｜User｜>", "<｜Assistant｜>", "User:", "Assistant:", "\n\n", "[List of commands]", "• /", "\n•"]
+
+def _tokens(count: int):
+    rng = random.Random(0)
+    words = ["def", " parse", "(self", ", path", "):", "\n    ", " return", " value", " +", " 1", "\n", " if", " not", " x"]
+    tokens = []
+    while len(tokens) < count:
+        tokens.append(rng.choice(words))
+        # Variasi isi baris agar tidak pernah tiga baris identik berturut-turut
+        if tokens[-1] == "\n":
+            tokens.append(f"# {len(tokens)}")
+    return tokens[:count]
+
+def legacy(stream):
+    """Salinan loop generate_stream sebelum StopMatcher."""
+    generated_text = ""
+    for current_chunk in stream:
+        new_total_text = generated_text + current_chunk
+        should_stop = False
+        for stop in STOPS:
+            if stop in new_total_text:
+                should_stop = True
+                break
+        if should_stop:
+            break
+        lines = new_total_text.splitlines()
+        if len(lines) > 5:
+            last_three = lines[-3:]
+            if len(set(last_three)) == 1 and len(last_three[0].strip()) > 5:
+                break
+        generated_text = new_total_text
+        yield current_chunk
+
+def streaming(stream):
+    stops, repetition = StopMatcher(STOPS), RepetitionDetector()
+    for current_chunk in stream:
+        safe_chunk = stops.feed(current_chunk)
+        if stops.stopped or repetition.feed(current_chunk):
+            break
+        if safe_chunk:
+            yield safe_chunk
+    else:
+        yield stops.flush()
+
+def _measure(fn, tokens, repeat: int = 7):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = "".join(fn(iter(tokens)))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), output
+
+def main(counts):
+    print(f"{'tokens':>8}{'legacy (ms)':>14}{'streaming (ms)':>16}{'legacy us/tok':>15}{'stream us/tok':>15}")
+    for count in counts:
+        tokens = _tokens(count)
+        old, old_out = _measure(legacy, tokens)
+        new, new_out = _measure(streaming, tokens)
+        assert old_out == new_out, "output berbeda"
+        print(f"{count:>8}{old * 1000:>14.2f}{new * 1000:>16.2f}{old / count * 1e6:>15.2f}{new / count * 1e6:>15.2f}")
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [500, 2000, 8000])
@@ -0,0 +1,51 @@
+"""
+Micro-benchmark: waktu parse per file tree-sitter dengan query yang
+dikompilasi ulang setiap file (perilaku lama) vs query dari cache per bahasa.
+
+Jalankan dari root repo:  python benchmarks/bench_treesitter_query.py
+"""
+import os
+import sys
+import time
+import statistics
+sys.path.append(os.getcwd())
+from src.memory.indexer import SymbolParser, TREESITTER_QUERIES
+
+SAMPLES = {
+    "python": ("bench.py", "class Service{i}:\n    def handle_{i}(self, x):\n        return x * {i}\n\n"),
+    "typescript": ("bench.ts", "export class Service{i} {{\n  handle{i}(x: number) {{ return x * {i}; }}\n}}\n"),
+    "java": ("Bench.java", "class Service{i} {{\n  int handle{i}(int x) {{ return x * {i}; }}\n}}\n"),
+    "kotlin": ("bench.kt", "class Service{i} {{\n  fun handle{i}(x: Int): Int {{ return x * {i} }}\n}}\n"),
+    "javascript": ("bench.js", "class Service{i} {{\n  handle{i}(x) {{ return x * {i}; }}\n}}\n"),
+}
+
+def _time_per_file(fn, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main(defs_per_file: int = 40, runs: int = 200):
+    parser = SymbolParser()
+    print(f"{'language':<12}{'recompile (ms)':>16}{'cached (ms)':>14}{'speedup':>10}")
+    for lang_name, (file_name, template) in SAMPLES.items():
+        if lang_name not in parser.parsers:
+            print(f"{lang_name:<12}{'(parser not available)':>40}")
+            continue
+        source = "".join(template.format(i=i) for i in range(defs_per_file))
+        ts_parser, language = parser.parsers[lang_name], parser.languages[lang_name]
+
+        def recompile():
+            tree = ts_parser.parse(bytes(source, "utf8"))
+            language.query(TREESITTER_QUERIES[lang_name]).captures(tree.root_node)
+
+        def cached():
+            parser._parse_with_treesitter(source, file_name, lang_name)
+
+        before, after = _time_per_file(recompile, runs), _time_per_file(cached, runs)
+        print(f"{lang_name:<12}{before:>16.3f}{after:>14.3f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ setup(
     version="0.2.0",
     packages=find_packages(),
     install_requires=[
-        "mlx-lm",
+        "mlx-lm; platform_system == 'Darwin' and platform_machine == 'arm64'",
         "typer[all]",
         "rich",
         "gitpython",
@@ -21,6 +21,10 @@ setup(
         "qdrant-client",
         "Pillow",
     ],
+    extras_require={
+        # Backend CPU untuk model GGUF (Linux / x86)
+        "cpu": ["llama-cpp-python"],
+    },
     entry_points={
         "console_scripts": [
             "aron=src.main:app",
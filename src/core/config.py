@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Dict, Optional
 import os
 import logging
 import sys
@@ -33,9 +34,51 @@ class Settings(BaseSettings):
     CURRENT_PROJECT_DIR: Path = Path(os.getcwd())
     
     # MLX / LLM Settings
+    # Backend inferensi: auto (mlx di Apple Silicon, lalu llama_cpp) | mlx | llama_cpp | scripted
+    INFERENCE_BACKEND: str = "auto"
     DEFAULT_MODEL: str = "mlx-community/deepseek-coder-6.7b-instruct-4bit"
+    # llama.cpp (CPU, model GGUF): path file .gguf; kosong = cari di MODEL_DIR
+    GGUF_MODEL: str = ""
+    LLAMA_N_CTX: int = 8192
+    LLAMA_THREADS: Optional[int] = None  # None = deteksi otomatis llama.cpp
+    LLAMA_GPU_LAYERS: int = 0
+    # Backend scripted (tes/benchmark): file JSON berisi daftar respons yang diputar bergiliran
+    SCRIPTED_RESPONSES: str = ""
+    # Model pool: role router (fast | heavy) -> path/HF id; role tanpa entri memakai model default
+    # Contoh env: ARON_MODEL_ROUTES='{"heavy": "models/DeepSeek-Coder-V2-Lite-Instruct-4bit-mlx"}'
+    MODEL_ROUTES: Dict[str, str] = {}
+    MODEL_RAM_BUDGET_GB: Optional[float] = None  # None = MODEL_RAM_FRACTION x RAM total
+    MODEL_RAM_FRACTION: float = 0.6
+    MODEL_RAM_RESERVE_GB: float = 1.0  # RAM bebas minimum setelah memuat model
+    MODEL_PRELOAD: bool = True  # Muat model berikutnya yang paling mungkin di latar
     MAX_TOKENS_GEN: int = 2000
-    CONTEXT_WINDOW_LIMIT: int = 24000
+    # Anggaran konteks dalam token (prompt + output), dibatasi juga oleh panjang konteks model
+    CONTEXT_WINDOW_TOKENS: int = 8192
+    
+    # Vector Store: "qdrant" (embedded) atau "numpy" (matriks memory-mapped, juga fallback bila Qdrant gagal)
+    VECTOR_BACKEND: str = "qdrant"
+    VECTOR_DTYPE: str = "float32"  # Khusus backend numpy: float32 | float16 (setengah ukuran)
+    # Mode ringkas (opt-in): scoring dengan kode int8 (4x lebih kecil) atau biner (32x), vektor penuh
+    # & payload tetap di disk. Qdrant embedded tidak mendukung kuantisasi, jadi mode ini memakai backend numpy.
+    VECTOR_COMPACT: bool = False
+    VECTOR_QUANTIZATION: str = "int8"  # int8 | binary
+    VECTOR_RESCORE: bool = True  # Urutkan ulang kandidat dengan vektor presisi penuh
+    VECTOR_OVERSAMPLING: float = 3.0  # Kandidat aproksimasi = limit x oversampling
+    
+    # Embedding Settings
+    EMBEDDING_MODEL: str = "BAAI/bge-small-en-v1.5"
+    # Cache embedding di disk (dibagi lintas scan & proyek), dibatasi jumlah baris
+    EMBEDDING_CACHE: bool = True
+    EMBEDDING_CACHE_MAX_ROWS: int = 500_000
+    # Kapan model embedding dimuat: "eager" (saat start), "background" (thread latar), "lazy" (saat pertama dipakai)
+    EMBEDDING_WARMUP: str = "background"
+    # LRU di memori: embedding query dan hasil pencarian (dikosongkan saat index berubah)
+    QUERY_CACHE_SIZE: int = 256
+    SEARCH_CACHE_SIZE: int = 128
+    # Retrieval hybrid: BM25 (FTS5) + dense digabung dengan reciprocal-rank fusion
+    HYBRID_SEARCH: bool = True
+    HYBRID_CANDIDATES: int = 20  # Kandidat per retriever sebelum fusion
+    RRF_K: int = 60
     
     # Indexing Settings
     IGNORED_DIRS: list = [
@@ -44,6 +87,43 @@ class Settings(BaseSettings):
         'venv', 'env', '.idea', '.vscode'
     ]
     
+    # Enumerasi file: pakai `git ls-files` jika proyek adalah repo git
+    INDEX_USE_GIT: bool = True
+    INDEX_MAX_FILE_BYTES: int = 1_000_000
+    # Rata-rata panjang baris di awal file di atas ini dianggap minified
+    INDEX_MAX_AVG_LINE_LENGTH: int = 300
+    INDEX_GENERATED_PATTERNS: list = [
+        '*.min.js', '*.bundle.js', '*.g.dart', '*.freezed.dart', '*.pb.dart',
+        '*.pbgrpc.dart', '*.mocks.dart', '*.gr.dart', '*_pb2.py', '*_pb2_grpc.py', '*.d.ts'
+    ]
+    
+    # Jumlah worker process untuk parsing saat indexing (0 = sesuai jumlah core, 1 = serial)
+    INDEX_WORKERS: int = 0
+    # Process pool hanya dipakai jika jumlah file yang perlu di-parse minimal sebanyak ini
+    INDEX_PARALLEL_MIN_FILES: int = 16
+    
+    # Jumlah simbol per transaksi SQLite saat backup CodeSymbol
+    SQL_BATCH_SIZE: int = 500
+    # Pipeline indexing: simbol per batch embedding dan kapasitas antrean antar tahap (dalam batch)
+    INDEX_EMBED_BATCH: int = 256
+    INDEX_QUEUE_SIZE: int = 8
+    # Batch ONNX di dalam satu batch pipeline; teks diurutkan per panjang agar padding minimal
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_SORT_BY_LENGTH: bool = True
+    # fastembed: thread intra-op ONNX (None = semua core) dan proses data-parallel
+    # (None = tanpa pool; pool dibuat per panggilan embed, jadi hanya berguna dengan INDEX_EMBED_BATCH besar)
+    EMBEDDING_THREADS: Optional[int] = None
+    EMBEDDING_PARALLEL: Optional[int] = None
+    
+    # Watcher: re-index otomatis saat file berubah selama sesi chat
+    WATCH_INDEX: bool = True
+    WATCH_BACKEND: str = "auto"  # auto (inotify di Linux) | polling
+    WATCH_POLL_INTERVAL: float = 2.0
+    WATCH_DEBOUNCE_SEC: float = 1.0
+    WATCH_QUEUE_SIZE: int = 2000
+    # Lebih dari ini file tertunda -> satu scan inkremental, bukan re-index per file
+    WATCH_MAX_PENDING: int = 200
+    
     SUPPORTED_EXTENSIONS: dict = {
         '.dart': 'dart',
         '.py': 'python',
@@ -2,11 +2,15 @@ from typing import List, Dict, Any, Optional
 import os
 import json
 from src.core.config import settings
+from src.memory.hybrid import HybridRetriever
 
 class MemoryLayer:
     def __init__(self):
         self.data = []
 
+# Input loop internal (output perintah / kritik) bukan query pencarian yang bermakna
+FEEDBACK_PREFIXES = ("[SYSTEM FEEDBACK]", "[CRITIC FEEDBACK]")
+
 class MemoryManager:
     """
     1. ShortTermMemory (session-based)
@@ -17,7 +21,16 @@ class MemoryManager:
         self.short_term = [] # List of past messages in session
         self.project_context = {} 
         self.vector_store = vector_store
+        # Retriever yang dipakai untuk long-term memory (hybrid jika diaktifkan)
+        self.retriever = vector_store
+        if vector_store and settings.HYBRID_SEARCH:
+            self.retriever = HybridRetriever(vector_store)
         self.max_short_term = 10
+        self._cycle_results: Optional[List[Dict[str, Any]]] = None
+
+    def begin_cycle(self):
+        """Dipanggil di awal run_cycle; retrieval pertama siklus dipakai ulang oleh iterasi feedback."""
+        self._cycle_results = None
 
     def add_short_term(self, role: str, content: str):
         self.short_term.append({"role": role, "content": content})
@@ -41,11 +54,20 @@ class MemoryManager:
         # Long Term (Vector)
         lt_text = "\n[LONG-TERM MEMORY]\n"
         if self.vector_store:
-            results = self.vector_store.search(query, limit=3)
+            results = self._retrieve(query)
             lt_text += "\n".join([f"File: {r['file_path']}\n{r['content'][:500]}" for r in results])
         
         return f"{pm_text}\n{lt_text}\n{st_text}"
 
+    def _retrieve(self, query: str) -> List[Dict[str, Any]]:
+        # Jangan embed output shell / JSON kritik sebagai query; pakai hasil awal siklus
+        if self._cycle_results is not None and query.lstrip().startswith(FEEDBACK_PREFIXES):
+            return self._cycle_results
+        results = self.retriever.search(query, limit=3)
+        if self._cycle_results is None:
+            self._cycle_results = results
+        return results
+
 class ContextCompressor:
     """
     Responsibility: Reduce token size of context before sending to LLM.
@@ -10,6 +10,11 @@ class MetricsTracker:
     def __init__(self):
         self.start_time: float = 0.0
         self.state_transitions: List[Dict[str, Any]] = []
+        # Statistik per panggilan generate (hit cache prompt, prefill)
+        self.generations: List[Dict[str, Any]] = []
+        # Event model pool (load/preload/evict) dan model yang resident di akhir request
+        self.model_events: List[Dict[str, Any]] = []
+        self.resident_models: List[Dict[str, Any]] = []
 
     def log_transition(self, from_state: str, to_state: str):
         self.state_transitions.append({
@@ -18,8 +23,18 @@ class MetricsTracker:
             "to": to_state
         })
 
+    def log_generation(self, stats: Dict[str, Any]):
+        if stats:
+            self.generations.append(dict(stats))
+
+    def log_models(self, events: List[Dict[str, Any]], resident: List[Dict[str, Any]]):
+        self.model_events.extend(events)
+        self.resident_models = resident
+
     def start_request(self):
         self.start_time = time.time()
+        self.generations = []
+        self.model_events = []
 
     def end_request(self, metadata: Dict[str, Any]) -> str:
         duration = (time.time() - self.start_time) * 1000 if self.start_time > 0 else 0
@@ -30,6 +45,10 @@ class MetricsTracker:
             "model_used": metadata.get("model_used"),
             "confidence": metadata.get("confidence"),
             "retry_count": metadata.get("retry_count", 0),
+            "generations": self.generations,
+            "prompt_cache_saved_sec": round(sum(g.get("saved_sec", 0.0) for g in self.generations), 4),
+            "model_events": self.model_events,
+            "resident_models": self.resident_models,
             "state_transitions": self.state_transitions
         }
         return json.dumps(log_entry, indent=2)
@@ -29,10 +29,12 @@ from prompt_toolkit.formatted_text import HTML
 from src.core.config import settings
 from src.core.states import AronState, ExecutionResult
 from src.llm.inference import InferenceEngine
+from src.llm.context_budget import ContextBudget
 from src.tools.patcher import CodePatcher
 from src.tools.validator import ValidationEngine
 from src.memory.vector_store import VectorStore
 from src.memory.indexer import ProjectIndexer
+from src.memory.watcher import IndexWatcher
 from src.llm.hub import ModelHub
 from src.ui.renderer import UIRenderer, ARON_THEME
 
@@ -55,16 +57,20 @@ class Orchestrator:
         self.state = AronState.IDLE
         self._last_stats = {"ram": 0.0, "cpu": 0.0}
         self._last_update_time = 0.0
+        self.startup_sec: Optional[float] = None
         
         self.inference = InferenceEngine()
+        self.inference.set_prompt_prefix([self._system_message()])
         self.patcher = CodePatcher(str(settings.CURRENT_PROJECT_DIR))
         self.validator = ValidationEngine(str(settings.CURRENT_PROJECT_DIR))
         self.ui = UIRenderer()
         
         try:
             self.vector_store = VectorStore()
-        except:
+        except Exception as e:
+            logger.error(f"Vector store unavailable: {e}")
             self.vector_store = None
+        self.watcher: Optional[IndexWatcher] = None
         
         # Initialize Cognitive Engines
         self.planner = TaskPlanner()
@@ -99,6 +105,8 @@ class Orchestrator:
         
         # Penutupan komponen secara eksplisit untuk menghindari error Qdrant/sys.meta_path
         try:
+            if getattr(self, 'watcher', None):
+                self.watcher.stop()
             if hasattr(self, 'vector_store') and self.vector_store:
                 self.vector_store.close()
             if hasattr(self, 'inference') and self.inference:
@@ -116,6 +124,10 @@ class Orchestrator:
         if self.vector_store and self.vector_store.count_points() == 0:
             indexer = ProjectIndexer(str(settings.CURRENT_PROJECT_DIR), self.vector_store)
             indexer.scan_project()
+            self._start_watcher(initial_sync=False)
+        else:
+            # Index sudah ada: kejar perubahan selama Aron mati di latar belakang
+            self._start_watcher(initial_sync=True)
 
         commands = ["/help", "/clear", "/hub", "/update", "/quit"]
         session = PromptSession(
@@ -129,6 +141,7 @@ class Orchestrator:
         
         console.clear()
         console.print(self.ui.generate_header(settings.VERSION, os.path.basename(self.inference.model_path)))
+        self._log_startup_time()
         
         while True:
             try:
@@ -158,8 +171,33 @@ class Orchestrator:
             except (KeyboardInterrupt, EOFError): break
         self._shutdown()
 
+    def _log_startup_time(self):
+        """Mencatat waktu dari proses dimulai sampai prompt pertama siap."""
+        try:
+            self.startup_sec = time.time() - self.process.create_time()
+            embedding = "n/a"
+            if self.vector_store:
+                embedding = "ready" if self.vector_store.is_model_ready() else "warming"
+            logger.info(f"Startup to first prompt: {self.startup_sec:.2f}s (embedding model: {embedding})")
+        except Exception as e:
+            logger.error(f"Startup timing failed: {e}")
+
+    def _start_watcher(self, initial_sync: bool):
+        """Menjalankan watcher agar index tetap segar selama sesi chat."""
+        if not self.vector_store or not settings.WATCH_INDEX:
+            return
+        try:
+            # Serial: fork process pool dari thread latar tidak aman
+            indexer = ProjectIndexer(str(settings.CURRENT_PROJECT_DIR), self.vector_store, workers=1)
+            self.watcher = IndexWatcher(indexer)
+            self.watcher.start(initial_sync=initial_sync)
+        except Exception as e:
+            logger.error(f"Index watcher failed to start: {e}")
+            self.watcher = None
+
     def run_cycle(self, initial_input: str):
         self.metrics.start_request()
+        self.memory.begin_cycle()
         self.metrics.log_transition(self.state.value, AronState.ANALYZING.value)
         self.state = AronState.ANALYZING
         
@@ -191,7 +229,7 @@ class Orchestrator:
                 self.state = AronState.EXECUTING
                 
                 # Apply Model Routing from Router
-                selected_model = routing_info.get("selected_model", "default")
+                self.inference.use_model(routing_info.get("model_role"))
                 
                 prompt = self._build_prompt(current_input, comp_context)
                 full_response = ""
@@ -218,6 +256,9 @@ class Orchestrator:
                                 if sys.stdin.read(1) == '\x1b': break
                 finally:
                     termios.tcsetattr(sys.stdin, termios.TCSADRAIN, old_settings)
+                self.metrics.log_generation({**self.inference.last_request_stats, "budget": self.inference.last_budget})
+                # Selagi aksi diproses / user mengetik: siapkan model yang kemungkinan dipakai berikutnya
+                self.inference.preload_next()
 
                 # 4. ACTION PROCESSING
                 action_results = self._process_actions(full_response)
@@ -286,6 +327,7 @@ class Orchestrator:
             "learning_mode": learning_mode
         }
         
+        self.metrics.log_models(self.inference.pool.drain_events(), self.inference.pool.residency())
         metrics_log = self.metrics.end_request({
             "intent": initial_input[:50],
             "model_used": os.path.basename(self.inference.model_path) if hasattr(self.inference, 'model_path') else "local",
@@ -319,23 +361,25 @@ class Orchestrator:
         start_idx = max(0, len(clean_history) - 5)
         return clean_history[start_idx:]
 
+    def _system_message(self) -> Dict[str, str]:
+        """System prompt tetap sepanjang sesi; KV-nya di-prefill sekali per load model."""
+        return {"role": "system", "content": (
+            "Identity: You are Aron, a Senior AI Architect running LOCALLY on Apple Silicon.\n"
+            f"Current Project Directory: {os.getcwd()}\n"
+            "Capabilities: You have FULL READ/WRITE ACCESS to the local filesystem via shell and file tags. You ARE capable of analyzing projects, debugging, and writing code.\n"
+            "Language Presence: Gunakan Bahasa Indonesia jika pengguna bertanya dalam Bahasa Indonesia. Tetap profesional dan teknis.\n"
+            "Rules:\n"
+            "1. DO NOT use native tool-calls. Use ONLY <shell>cmd</shell> and <file path=\"...\">content</file> tags.\n"
+            "2. Be concise. Minimalist CLI style.\n"
+            "3. Never refuse a task by claiming no access. You are a local agent.\n"
+            "4. If you see [SYSTEM FEEDBACK], it is the OUTPUT of your previous command. Use it.\n"
+            "Commands: /help, /clear, /hub, /update, /quit."
+        )}
+
     def _build_prompt(self, user_input: str, rag_context: str) -> str:
         history = self._sanitize_history()
         
-        messages = [
-            {"role": "system", "content": (
-                "Identity: You are Aron, a Senior AI Architect running LOCALLY on Apple Silicon.\n"
-                f"Current Project Directory: {os.getcwd()}\n"
-                "Capabilities: You have FULL READ/WRITE ACCESS to the local filesystem via shell and file tags. You ARE capable of analyzing projects, debugging, and writing code.\n"
-                "Language Presence: Gunakan Bahasa Indonesia jika pengguna bertanya dalam Bahasa Indonesia. Tetap profesional dan teknis.\n"
-                "Rules:\n"
-                "1. DO NOT use native tool-calls. Use ONLY <shell>cmd</shell> and <file path=\"...\">content</file> tags.\n"
-                "2. Be concise. Minimalist CLI style.\n"
-                "3. Never refuse a task by claiming no access. You are a local agent.\n"
-                "4. If you see [SYSTEM FEEDBACK], it is the OUTPUT of your previous command. Use it.\n"
-                "Commands: /help, /clear, /hub, /update, /quit."
-            )}
-        ]
+        messages = [self._system_message()]
         
         for m in history:
             role = str(m.get('role', 'user')).lower()
@@ -344,14 +388,14 @@ class Orchestrator:
             
         messages.append({"role": "user", "content": user_input})
         
-        # Gunakan apply_chat_template jika tersedia, fallback ke manual jika gagal
+        # Gunakan apply_chat_template jika tersedia (dengan anggaran token), fallback ke manual jika gagal
         try:
-            prompt = self.inference.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+            prompt = self.inference.build_prompt(messages, context=rag_context)
             return prompt
         except:
             # Fallback sangat aman jika template gagal
             full_prompt = "<｜begin of sentence｜>"
-            for msg in messages:
+            for msg in ContextBudget.compose(messages, rag_context):
                 role = "User" if msg['role'] == "user" else "Assistant"
                 if msg['role'] == "system":
                     full_prompt += f"<｜User｜>System Instruction: {msg['content']}<｜Assistant｜>Mengerti.<｜end of sentence｜>"
@@ -406,5 +450,7 @@ class Orchestrator:
     def _patch_file(self, path: str, content: str):
         try:
             self.patcher.write_full_file(path, content)
+            if self.watcher:
+                self.watcher.notify(path)
             console.print(f"[bold green]✓ File updated[/bold green]")
         except Exception as e: console.print(f"[bold red]✗ Patch error: {e}[/bold red]")
@@ -31,19 +31,21 @@ class ToolRouter:
         # 2. Model Routing Logic
         # Direct complexity-based routing
         if any(word in intent_lower for word in ["architect", "redesign", "complex", "review"]):
-            selected_model = self.models["heavy"]
+            model_role = "heavy"
             reasoning_depth = "deep"
         elif len(context) > 10000: # Context is heavy
-            selected_model = self.models["heavy"]
+            model_role = "heavy"
             reasoning_depth = "moderate"
         else:
-            selected_model = self.models["fast"]
+            model_role = "fast"
             reasoning_depth = "standard"
+        selected_model = self.models[model_role]
 
         return {
             "primary_tool": primary_tool,
             "fallback_tool": "shell" if primary_tool != "shell" else None,
             "selected_model": selected_model,
+            "model_role": model_role, # Kunci settings.MODEL_ROUTES untuk model pool
             "reasoning_depth": reasoning_depth,
             "confidence": 0.92
         }
@@ -0,0 +1,386 @@
+import os
+import re
+import abc
+import gc
+import json
+import glob
+import logging
+import time
+import platform
+import importlib.util
+from typing import Any, Dict, Iterator, List, Optional
+from src.core.config import settings
+from src.llm.prompt_cache import PromptCache
+
+logger = logging.getLogger("InferenceBackend")
+
+
+class InferenceBackend(abc.ABC):
+    """
+    Antarmuka mesin inferensi di balik InferenceEngine.
+    Backend hanya memuat model dan menghasilkan potongan teks mentah; stop sequence,
+    deteksi repetisi, dan proteksi konteks ditangani InferenceEngine agar perilakunya
+    sama untuk semua backend. KV cache prompt dipertahankan antar request:
+    `prompt_cache` mencatat token yang sudah ada di dalamnya.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.model = None
+        self.tokenizer = None
+        self.prompt_cache = PromptCache()
+        # Hasil prefill prompt prefix (system prompt) untuk model ini: token & detik
+        self.prefix_stats: Dict[str, Any] = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def resolve_model_path(self) -> str:
+        """Menentukan path model yang valid."""
+        # 1. Cek dari Config/Env
+        if settings.DEFAULT_MODEL and os.path.exists(settings.DEFAULT_MODEL):
+            return settings.DEFAULT_MODEL
+
+        # 2. Cek folder models/ secara otomatis
+        model_dir = settings.MODEL_DIR
+        if os.path.exists(model_dir):
+            # Cari folder yang valid (bukan hidden)
+            candidates = [
+                d for d in os.listdir(model_dir)
+                if os.path.isdir(os.path.join(model_dir, d)) and not d.startswith('.')
+            ]
+            if candidates:
+                # Prioritaskan yang mengandung 'mlx' atau '4bit'
+                best_candidate = candidates[0]
+                for c in candidates:
+                    if 'mlx' in c.lower() and '4bit' in c.lower():
+                        best_candidate = c
+                        break
+                return str(os.path.join(model_dir, best_candidate))
+
+        # 3. Fallback (akan memicu download jika menggunakan string HF repo)
+        return settings.DEFAULT_MODEL
+
+    @abc.abstractmethod
+    def load(self, model_path: str):
+        ...
+
+    def unload(self):
+        self.model = None
+        self.tokenizer = None
+        self.prompt_cache.reset()
+        self.prefix_stats = {}
+        gc.collect()
+
+    @abc.abstractmethod
+    def tokenize(self, text: str) -> List[int]:
+        ...
+
+    @abc.abstractmethod
+    def detokenize(self, tokens: List[int]) -> str:
+        ...
+
+    def context_length(self) -> Optional[int]:
+        """Panjang konteks maksimum model (token); None jika tidak diketahui."""
+        return None
+
+    def apply_chat_template(self, messages: List[Dict[str, str]], add_generation_prompt: bool = True) -> str:
+        """Prompt dari daftar pesan memakai template chat model; ValueError jika model tidak punya."""
+        raise ValueError(f"{self.name} backend has no chat template")
+
+    def prefill(self, tokens: List[int]) -> float:
+        """Mengisi KV cache dengan `tokens` tanpa generate (mis. system prompt); mengembalikan detik."""
+        return 0.0
+
+    @abc.abstractmethod
+    def stream_generate(self, prompt: str, max_tokens: int, temp: float) -> Iterator[str]:
+        ...
+
+    def generate_oneshot(self, prompt: str, max_tokens: int) -> str:
+        return "".join(self.stream_generate(prompt, max_tokens, temp=0.0))
+
+
+class MLXBackend(InferenceBackend):
+    """Backend mlx-lm (Apple Silicon). mlx diimpor saat dipakai, bukan saat modul dimuat."""
+    name = "mlx"
+    PREFILL_CHUNK = 512
+
+    def __init__(self):
+        super().__init__()
+        self._mx = None
+        self.kv = None
+
+    def load(self, model_path: str):
+        import mlx_lm
+        try:
+            import mlx.core as mx
+            self._mx = mx
+            mx.clear_cache()
+        except ImportError:
+            self._mx = None
+        self.model, self.tokenizer = mlx_lm.load(model_path)
+        self._new_cache()
+
+    def unload(self):
+        self.kv = None
+        super().unload()
+        if self._mx: self._mx.clear_cache()
+
+    def tokenize(self, text: str) -> List[int]:
+        # Sama seperti mlx_lm.stream_generate untuk prompt string: BOS ditambahkan jika belum ada
+        bos = getattr(self.tokenizer, "bos_token", None)
+        return list(self.tokenizer.encode(text, add_special_tokens=bos is None or not text.startswith(bos)))
+
+    def detokenize(self, tokens: List[int]) -> str:
+        return self.tokenizer.decode(tokens)
+
+    def context_length(self) -> Optional[int]:
+        args = getattr(self.model, "args", None)
+        return getattr(args, "max_position_embeddings", None)
+
+    def apply_chat_template(self, messages: List[Dict[str, str]], add_generation_prompt: bool = True) -> str:
+        return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=add_generation_prompt)
+
+    def _new_cache(self):
+        from mlx_lm.models.cache import make_prompt_cache
+        self.kv = make_prompt_cache(self.model)
+        self.prompt_cache.reset()
+
+    def _kv_len(self) -> Optional[int]:
+        return getattr(self.kv[0], "offset", None) if self.kv else None
+
+    def _reuse(self, tokens: List[int]) -> int:
+        """Memotong KV cache ke prefix yang sama dengan `tokens`; mengembalikan panjang prefix."""
+        from mlx_lm.models.cache import can_trim_prompt_cache, trim_prompt_cache
+        hit = self.prompt_cache.match(tokens)
+        kv_len = self._kv_len()
+        if kv_len is None or hit == 0:
+            self._new_cache()
+            return 0
+        # KV bisa berisi token di luar yang tercatat (langkah decode terakhir saat stream dihentikan)
+        stale = kv_len - hit
+        if stale > 0:
+            if not can_trim_prompt_cache(self.kv):
+                self._new_cache()
+                return 0
+            trim_prompt_cache(self.kv, stale)
+        return hit
+
+    def prefill(self, tokens: List[int]) -> float:
+        mx = self._mx
+        start = time.perf_counter()
+        self._new_cache()
+        x = mx.array(tokens)
+        for i in range(0, len(tokens), self.PREFILL_CHUNK):
+            self.model(x[None, i:i + self.PREFILL_CHUNK], cache=self.kv)
+            mx.eval([c.state for c in self.kv])
+        elapsed = time.perf_counter() - start
+        self.prompt_cache.tokens = list(tokens)
+        self.prompt_cache.observe(len(tokens), elapsed)
+        return elapsed
+
+    def stream_generate(self, prompt: str, max_tokens: int, temp: float) -> Iterator[str]:
+        import mlx_lm
+        try:
+            from mlx_lm.sample_utils import make_sampler
+            sampler = make_sampler(temp=temp)
+        except ImportError:
+            sampler = None
+        tokens = self.tokenize(prompt)
+        hit = self._reuse(tokens)
+        generated: List[int] = []
+        start = time.perf_counter()
+        try:
+            for response in mlx_lm.stream_generate(self.model, self.tokenizer, prompt=tokens[hit:],
+                                                   max_tokens=max_tokens, sampler=sampler, prompt_cache=self.kv):
+                if not generated:
+                    self.prompt_cache.record(len(tokens), hit, time.perf_counter() - start)
+                generated.append(response.token)
+                yield str(response.text)
+        finally:
+            # Hanya token yang benar-benar sudah masuk KV yang dicatat
+            self.prompt_cache.tokens = (tokens + generated)[:self._kv_len() or 0]
+
+
+class LlamaCppBackend(InferenceBackend):
+    """Backend llama.cpp (llama-cpp-python) untuk model GGUF terkuantisasi di CPU x86/ARM."""
+    name = "llama_cpp"
+
+    def resolve_model_path(self) -> str:
+        if settings.GGUF_MODEL:
+            return settings.GGUF_MODEL
+        # File .gguf pertama di models/ (termasuk satu tingkat subfolder)
+        found = sorted(glob.glob(str(settings.MODEL_DIR / "*.gguf")) + glob.glob(str(settings.MODEL_DIR / "*" / "*.gguf")))
+        return found[0] if found else str(settings.MODEL_DIR / "model.gguf")
+
+    def load(self, model_path: str):
+        from llama_cpp import Llama
+        if os.path.isdir(model_path):
+            files = sorted(glob.glob(os.path.join(model_path, "*.gguf")))
+            if not files:
+                raise FileNotFoundError(f"No .gguf file in {model_path}")
+            model_path = files[0]
+        self.model = Llama(
+            model_path=model_path,
+            n_ctx=settings.LLAMA_N_CTX,
+            n_threads=settings.LLAMA_THREADS,
+            n_gpu_layers=settings.LLAMA_GPU_LAYERS,
+            verbose=False,
+        )
+        self.tokenizer = self.model
+        self.prompt_cache.reset()
+
+    def tokenize(self, text: str) -> List[int]:
+        return self.model.tokenize(text.encode("utf-8"), add_bos=False, special=True)
+
+    def detokenize(self, tokens: List[int]) -> str:
+        return self.model.detokenize(tokens).decode("utf-8", "ignore")
+
+    def context_length(self) -> Optional[int]:
+        return self.model.n_ctx()
+
+    def _prompt_tokens(self, prompt: str) -> List[int]:
+        tokens = self.tokenize(prompt)
+        bos = self.model.token_bos()
+        if bos is not None and bos >= 0 and (not tokens or tokens[0] != bos):
+            tokens.insert(0, bos)
+        return tokens
+
+    def apply_chat_template(self, messages: List[Dict[str, str]], add_generation_prompt: bool = True) -> str:
+        from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+        metadata = self.model.metadata
+        template = metadata.get("tokenizer.chat_template")
+        if not template:
+            raise ValueError("GGUF model has no chat template")
+        vocab = lambda key: self.model.detokenize([int(metadata[key])]).decode("utf-8", "ignore") if key in metadata else ""
+        formatter = Jinja2ChatFormatter(template, eos_token=vocab("tokenizer.ggml.eos_token_id"),
+                                        bos_token=vocab("tokenizer.ggml.bos_token_id"),
+                                        add_generation_prompt=add_generation_prompt)
+        return formatter(messages=messages).prompt
+
+    def _sync_cache(self):
+        self.prompt_cache.tokens = list(getattr(self.model, "_input_ids", []))
+
+    def prefill(self, tokens: List[int]) -> float:
+        start = time.perf_counter()
+        self.model.reset()
+        self.model.eval(tokens)
+        elapsed = time.perf_counter() - start
+        self._sync_cache()
+        self.prompt_cache.observe(len(tokens), elapsed)
+        return elapsed
+
+    def stream_generate(self, prompt: str, max_tokens: int, temp: float) -> Iterator[str]:
+        # Prompt dikirim sebagai token: llama.cpp otomatis memakai ulang prefix KV yang sama
+        tokens = self._prompt_tokens(prompt)
+        hit = self.prompt_cache.match(tokens)
+        start = time.perf_counter()
+        first = True
+        try:
+            for chunk in self.model.create_completion(tokens, max_tokens=max_tokens, temperature=temp, stream=True):
+                if first:
+                    self.prompt_cache.record(len(tokens), hit, time.perf_counter() - start)
+                    first = False
+                yield chunk["choices"][0]["text"]
+        finally:
+            self._sync_cache()
+
+
+class ScriptedBackend(InferenceBackend):
+    """
+    Backend deterministik untuk tes dan benchmark: memutar daftar respons secara bergiliran,
+    dipotong per token sederhana (kata / tanda baca / spasi). Tanpa model dan tanpa RAM berarti.
+    `prefill_sec_per_token` mensimulasikan biaya prefill agar efek cache prompt bisa diukur.
+    """
+    name = "scripted"
+    _TOKEN = re.compile(r"\w+|[^\w\s]|\s+")
+
+    def __init__(self, responses: Optional[List[str]] = None, prefill_sec_per_token: float = 0.0):
+        super().__init__()
+        self.responses = responses if responses is not None else self._load_responses()
+        self.prefill_sec_per_token = prefill_sec_per_token
+        self.calls = 0
+        self.vocab: Dict[str, int] = {}
+        self.pieces: List[str] = []
+
+    @staticmethod
+    def _load_responses() -> List[str]:
+        if settings.SCRIPTED_RESPONSES:
+            with open(settings.SCRIPTED_RESPONSES, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return ["OK."]
+
+    def resolve_model_path(self) -> str:
+        return settings.SCRIPTED_RESPONSES or "scripted"
+
+    def load(self, model_path: str):
+        self.model = self
+        self.tokenizer = self
+        self.prompt_cache.reset()
+
+    def _token_id(self, piece: str) -> int:
+        if piece not in self.vocab:
+            self.vocab[piece] = len(self.pieces)
+            self.pieces.append(piece)
+        return self.vocab[piece]
+
+    def tokenize(self, text: str) -> List[int]:
+        return [self._token_id(piece) for piece in self._TOKEN.findall(text)]
+
+    def detokenize(self, tokens: List[int]) -> str:
+        return "".join(self.pieces[t] for t in tokens)
+
+    def apply_chat_template(self, messages: List[Dict[str, str]], add_generation_prompt: bool = True) -> str:
+        prompt = "".join(f"<|{m['role']}|>{m['content']}<|end|>" for m in messages)
+        return prompt + "<|assistant|>" if add_generation_prompt else prompt
+
+    def _simulate_prefill(self, count: int) -> float:
+        start = time.perf_counter()
+        if self.prefill_sec_per_token and count:
+            time.sleep(count * self.prefill_sec_per_token)
+        return time.perf_counter() - start
+
+    def prefill(self, tokens: List[int]) -> float:
+        elapsed = self._simulate_prefill(len(tokens))
+        self.prompt_cache.tokens = list(tokens)
+        self.prompt_cache.observe(len(tokens), elapsed)
+        return elapsed
+
+    def stream_generate(self, prompt: str, max_tokens: int, temp: float) -> Iterator[str]:
+        tokens = self.tokenize(prompt)
+        hit = self.prompt_cache.match(tokens)
+        self.prompt_cache.record(len(tokens), hit, self._simulate_prefill(len(tokens) - hit))
+        self.prompt_cache.tokens = list(tokens)
+        response = self.responses[self.calls % len(self.responses)] if self.responses else ""
+        self.calls += 1
+        for piece in self._TOKEN.findall(response)[:max_tokens]:
+            self.prompt_cache.tokens.append(self._token_id(piece))
+            yield piece
+
+
+BACKENDS = {
+    "mlx": MLXBackend,
+    "llama_cpp": LlamaCppBackend,
+    "scripted": ScriptedBackend,
+}
+
+
+def _auto_backend() -> str:
+    """mlx di Apple Silicon bila terpasang, lalu llama.cpp; selain itu mlx (gagal jelas saat load)."""
+    apple_silicon = platform.system() == "Darwin" and platform.machine() == "arm64"
+    if apple_silicon and importlib.util.find_spec("mlx_lm"):
+        return "mlx"
+    if importlib.util.find_spec("llama_cpp"):
+        return "llama_cpp"
+    return "mlx"
+
+
+def create_backend(name: Optional[str] = None) -> InferenceBackend:
+    name = name or settings.INFERENCE_BACKEND
+    if name == "auto":
+        name = _auto_backend()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name} (choose from {', '.join(BACKENDS)}, auto)")
+    logger.info(f"Inference backend: {name}")
+    return BACKENDS[name]()
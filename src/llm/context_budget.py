@@ -0,0 +1,92 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("ContextBudget")
+
+# Penanda konteks hasil retrieval di dalam pesan user terakhir
+CONTEXT_HEADER = "[RETRIEVED CONTEXT]\n"
+CONTEXT_FOOTER = "\n[END CONTEXT]\n\n"
+
+
+class ContextBudget:
+    """
+    Responsibility: Menyusun prompt dari daftar pesan agar muat di anggaran token
+    (context window dikurangi max_tokens output), dihitung dengan tokenizer model.
+    Template chat selalu dirender ulang sehingga header/footer-nya tidak pernah terpotong.
+
+    Urutan pengorbanan: history terlama (per pasangan user/assistant), lalu konteks
+    retrieval (dipotong per baris dari belakang), lalu awal input user.
+    System prompt tidak pernah disentuh.
+    """
+    def __init__(self, render: Callable[[List[Dict[str, str]]], str], count: Callable[[str], int]):
+        self.render = render
+        self.count = count
+
+    @staticmethod
+    def compose(messages: List[Dict[str, str]], context: str) -> List[Dict[str, str]]:
+        """Pesan final: konteks retrieval disisipkan di depan pesan user terakhir."""
+        if not context.strip():
+            return messages
+        last = dict(messages[-1])
+        last["content"] = f"{CONTEXT_HEADER}{context.strip()}{CONTEXT_FOOTER}{last['content']}"
+        return messages[:-1] + [last]
+
+    def fit(self, messages: List[Dict[str, str]], budget: int, context: str = "") -> Tuple[str, Dict[str, Any]]:
+        """
+        `messages`: [system..., history..., user terakhir]. Mengembalikan (prompt, statistik).
+        """
+        system = [m for m in messages[:-1] if m["role"] == "system"]
+        history = [m for m in messages[:-1] if m["role"] != "system"]
+        current = dict(messages[-1])
+        stats: Dict[str, Any] = {"budget": budget, "dropped_messages": 0, "context_lines_dropped": 0, "input_trimmed": False}
+
+        def build() -> Tuple[str, int]:
+            prompt = self.render(self.compose(system + history + [current], context))
+            return prompt, self.count(prompt)
+
+        prompt, total = build()
+        stats["original_tokens"] = total
+
+        # 1. History terlama; dibuang berpasangan agar giliran user/assistant tetap berselang-seling
+        while total > budget and history:
+            drop = 2 if len(history) > 1 and history[0]["role"] == "user" else 1
+            history = history[drop:]
+            stats["dropped_messages"] += drop
+            prompt, total = build()
+
+        # 2. Konteks retrieval: baris paling akhir (relevansi terendah) dibuang lebih dulu
+        if total > budget and context:
+            lines = context.splitlines()
+            sizes = [self.count(line) + 1 for line in lines]
+            excess = total - budget
+            while total > budget and lines:
+                while lines and excess > 0:
+                    excess -= sizes.pop()
+                    lines.pop()
+                    stats["context_lines_dropped"] += 1
+                context = "\n".join(lines)
+                prompt, total = build()
+                # Estimasi per baris meleset (penggabungan token di batas baris); ulangi dengan sisa kelebihan
+                excess = total - budget
+
+        # 3. Input terlalu panjang sendiri: pertahankan bagian akhirnya (instruksi terbaru)
+        content = current["content"]
+        while total > budget and content:
+            keep = int(len(content) * budget / total) - 1
+            content = content[-keep:] if keep > 0 else ""
+            current["content"] = content
+            stats["input_trimmed"] = True
+            prompt, total = build()
+
+        stats["prompt_tokens"] = total
+        if stats["original_tokens"] > budget:
+            logger.warning(f"Prompt over budget, trimmed: {stats}")
+        return prompt, stats
+
+
+def trim_middle(tokens: List[int], budget: int, head: Optional[int] = None) -> List[int]:
+    """Token prompt mentah (tanpa struktur pesan): pertahankan awal (template/system) dan akhir (giliran terbaru)."""
+    if len(tokens) <= budget:
+        return tokens
+    head = min(head if head is not None else budget // 4, budget // 2)
+    return tokens[:head] + tokens[len(tokens) - (budget - head):]
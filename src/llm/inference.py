@@ -1,22 +1,15 @@
-import mlx_lm
-import os
-import sys
 import gc
 import logging
-from typing import Optional, Generator
+from typing import Any, Generator, List, Dict, Optional, Tuple
 from src.core.config import settings
+from src.llm.backends import InferenceBackend, create_backend
+from src.llm.context_budget import ContextBudget, trim_middle
+from src.llm.stream_guard import StopMatcher, RepetitionDetector
+from src.llm.model_pool import ModelPool
 
 # Setup logging
 logger = logging.getLogger("InferenceEngine")
 
-try:
-    import mlx.core as mx
-    from mlx_lm.sample_utils import make_sampler
-except ImportError:
-    mx = None
-    make_sampler = None
-    logger.warning("MLX or mlx-lm sample_utils not found. Inference will fail.")
-
 class InferenceEngine:
     _instance = None
 
@@ -29,42 +22,48 @@ class InferenceEngine:
     def __init__(self):
         if self._initialized:
             return
-            
+
+        # Backend dipilih lewat settings.INFERENCE_BACKEND (mlx | llama_cpp | scripted | auto)
+        self.backend: InferenceBackend = create_backend()
         self.model_path = self._resolve_model_path()
-        self.model = None
-        self.tokenizer = None
+        self.default_model_path = self.model_path
+        # Beberapa model bisa resident sekaligus; backend di atas adalah model aktif untuk request ini
+        self.pool = ModelPool()
+        # Pesan awal yang sama di setiap prompt (system prompt); KV-nya dihitung sekali per load model
+        self.prompt_prefix: Optional[List[Dict[str, str]]] = None
+        self.last_request_stats: Dict[str, Any] = {}
+        # Statistik penyusunan prompt terakhir (token, pesan/baris konteks yang dibuang)
+        self.last_budget: Dict[str, Any] = {}
         self._initialized = True
-        logger.info(f"InferenceEngine initialized. Model target: {self.model_path}")
+        logger.info(f"InferenceEngine initialized. Backend: {self.backend.name}, model target: {self.model_path}")
 
     def _resolve_model_path(self) -> str:
-        """Menentukan path model yang valid."""
-        # 1. Cek dari Config/Env
-        if settings.DEFAULT_MODEL and os.path.exists(settings.DEFAULT_MODEL):
-            return settings.DEFAULT_MODEL
-            
-        # 2. Cek folder models/ secara otomatis
-        model_dir = settings.MODEL_DIR
-        if os.path.exists(model_dir):
-            # Cari folder yang valid (bukan hidden)
-            candidates = [
-                d for d in os.listdir(model_dir) 
-                if os.path.isdir(os.path.join(model_dir, d)) and not d.startswith('.')
-            ]
-            if candidates:
-                # Prioritaskan yang mengandung 'mlx' atau '4bit'
-                best_candidate = candidates[0]
-                for c in candidates:
-                    if 'mlx' in c.lower() and '4bit' in c.lower():
-                        best_candidate = c
-                        break
-                return str(os.path.join(model_dir, best_candidate))
-        
-        # 3. Fallback (akan memicu download jika menggunakan string HF repo)
-        return settings.DEFAULT_MODEL
+        """Menentukan path model yang valid untuk backend aktif."""
+        return self.backend.resolve_model_path()
+
+    @property
+    def model(self):
+        return self.backend.model
+
+    @property
+    def tokenizer(self):
+        return self.backend.tokenizer
+
+    @property
+    def prefix_stats(self) -> Dict[str, Any]:
+        """Statistik prefill prompt prefix milik model aktif (setiap model resident punya KV sendiri)."""
+        return self.backend.prefix_stats
+
+    def set_backend(self, backend: InferenceBackend):
+        """Mengganti backend untuk model aktif (mis. tes); entri pool lama untuk path ini dikeluarkan."""
+        resident = self.pool.get(self.model_path)
+        if resident is not None and resident is not backend:
+            self.pool.evict(self.model_path)
+        self.backend = backend
 
     def load_model(self):
-        """Memuat model ke memori jika belum dimuat dengan validasi RAM."""
-        if self.model is not None:
+        """Memuat model aktif ke memori (lewat pool) jika belum dimuat dengan validasi RAM."""
+        if self.backend.is_loaded:
             return
 
         import psutil
@@ -73,108 +72,181 @@ class InferenceEngine:
         if vm.available < (1024 ** 3):
             logger.warning(f"Low RAM detected ({vm.available / (1024**3):.2f} GB). Model loading might be slow or unstable.")
 
-        logger.info(f"Loading model from {self.model_path}...")
         try:
+            self.backend = self.pool.acquire(self.model_path, self._loader(self.backend))
+        except Exception as e:
+            logger.critical(f"Failed to load model: {e}")
+            raise RuntimeError(f"Could not load AI model: {e}")
+
+    def _loader(self, backend: Optional[InferenceBackend] = None):
+        def load(model_path: str) -> InferenceBackend:
+            target = backend if backend is not None else create_backend()
+            logger.info(f"Loading model from {model_path} ({target.name})...")
             # Force GC sebelum load
             gc.collect()
-            if mx: mx.clear_cache()
-
-            # Load Model & Tokenizer
-            self.model, self.tokenizer = mlx_lm.load(self.model_path)
-            
+            target.load(model_path)
             logger.info("Model loaded successfully.")
+            self._warm_prefix(target)
+            return target
+        return load
+
+    def _model_for(self, role: Optional[str]) -> str:
+        return settings.MODEL_ROUTES.get(role or "", "") or self.default_model_path
+
+    def use_model(self, role: Optional[str] = None) -> str:
+        """
+        Mengaktifkan model pilihan router (role di settings.MODEL_ROUTES) untuk request ini.
+        Model resident dipakai langsung; jika tidak, dimuat via pool (LRU dikeluarkan bila perlu).
+        Gagal memuat model role -> kembali ke model default.
+        """
+        path = self._model_for(role)
+        if path != self.model_path:
+            self.backend = self.pool.get(path) or create_backend()
+            self.model_path = path
+        try:
+            if self.backend.is_loaded:
+                self.backend = self.pool.acquire(path, self._loader(self.backend))
+            else:
+                self.load_model()
+        except RuntimeError:
+            if path == self.default_model_path:
+                raise
+            logger.error(f"Routed model {role} failed to load, falling back to default model.")
+            return self.use_model(None)
+        return self.model_path
+
+    def preload_next(self):
+        """Memuat di latar model yang paling sering dipakai setelah model aktif (jika muat di anggaran RAM)."""
+        if not settings.MODEL_PRELOAD:
+            return None
+        key = self.pool.predict_next(self.model_path)
+        if key is None or key == self.model_path:
+            return None
+        return self.pool.preload(key, self._loader())
+
+    def set_prompt_prefix(self, messages: List[Dict[str, str]]):
+        """Mendaftarkan pesan pembuka tetap (system prompt) untuk di-prefill sekali per load model."""
+        self.prompt_prefix = messages
+        if self.backend.is_loaded:
+            self._warm_prefix(self.backend)
+
+    def _warm_prefix(self, backend: InferenceBackend):
+        if not self.prompt_prefix: return
+        try:
+            text = backend.apply_chat_template(self.prompt_prefix, add_generation_prompt=False)
+            tokens = backend.tokenize(text)
+            seconds = backend.prefill(tokens)
+            backend.prefix_stats = {"tokens": len(tokens), "prefill_sec": round(seconds, 4)}
+            logger.info(f"System prompt KV precomputed: {backend.prefix_stats}")
         except Exception as e:
-            logger.critical(f"Failed to load model: {e}")
-            raise RuntimeError(f"Could not load AI model: {e}")
+            # Tanpa template chat (atau backend tanpa prefill) prompt tetap berjalan, hanya tanpa warm-up
+            logger.warning(f"Prompt prefix warm-up skipped: {e}")
 
     def unload_model(self):
-        """Melepas model dari memori secara paksa."""
-        if self.model:
-            del self.model
-            del self.tokenizer
-            self.model = None
-            self.tokenizer = None
-            
-            if mx: mx.clear_cache()
-            gc.collect()
-            logger.info("Model unloaded from memory.")
+        """Melepas semua model (termasuk yang di-preload) dari memori secara paksa."""
+        self.pool.unload_all()
+        if self.backend.is_loaded:
+            self.backend.unload()
+        logger.info("Model unloaded from memory.")
+
+    def tokenize(self, text: str) -> List[int]:
+        if not self.backend.is_loaded:
+            self.load_model()
+        return self.backend.tokenize(text)
+
+    def apply_chat_template(self, messages: List[Dict[str, str]], add_generation_prompt: bool = True) -> str:
+        """Prompt dari daftar pesan memakai template chat model (ValueError jika tidak ada)."""
+        if not self.backend.is_loaded:
+            self.load_model()
+        return self.backend.apply_chat_template(messages, add_generation_prompt=add_generation_prompt)
+
+    def prompt_budget(self, max_tokens: int) -> Tuple[int, int]:
+        """(token untuk prompt, token output) dalam context window efektif."""
+        window = settings.CONTEXT_WINDOW_TOKENS
+        model_ctx = self.backend.context_length() if self.backend.is_loaded else None
+        if model_ctx:
+            window = min(window, model_ctx)
+        # Output tidak boleh menghabiskan lebih dari separuh window
+        max_tokens = min(max_tokens, window // 2)
+        return window - max_tokens, max_tokens
+
+    def build_prompt(self, messages: List[Dict[str, str]], max_tokens: int = 1000, context: str = "") -> str:
+        """
+        Prompt dari pesan chat yang dijamin muat di anggaran token: history lama lalu
+        konteks retrieval dikorbankan lebih dulu. ValueError jika model tanpa template chat.
+        """
+        if not self.backend.is_loaded:
+            self.load_model()
+        budget, _ = self.prompt_budget(max_tokens)
+        fitter = ContextBudget(self.backend.apply_chat_template, lambda text: len(self.backend.tokenize(text)))
+        prompt, self.last_budget = fitter.fit(messages, budget, context)
+        return prompt
+
+    def _fit_raw(self, prompt: str, max_tokens: int) -> Tuple[str, int]:
+        """Pengaman untuk prompt string mentah: potong bagian tengah di level token."""
+        budget, max_tokens = self.prompt_budget(max_tokens)
+        tokens = self.backend.tokenize(prompt)
+        if len(tokens) > budget:
+            logger.warning(f"Prompt too long ({len(tokens)} tokens, budget {budget}), trimming middle...")
+            prompt = self.backend.detokenize(trim_middle(tokens, budget, head=self.prefix_stats.get("tokens")))
+        return prompt, max_tokens
 
     def generate_stream(self, prompt: str, max_tokens: int = 1000, temp: float = 0.7, stop_sequences: list = None) -> Generator[str, None, None]:
         """Generator streaming untuk respon AI."""
-        if not self.model:
+        # Prefill model preload di latar tidak boleh berjalan bersamaan dengan generate (GPU/CPU yang sama)
+        self.pool.wait_preload()
+        if not self.backend.is_loaded:
             self.load_model()
 
-        # Proteksi Context Window Sederhana
-        if len(prompt) > settings.CONTEXT_WINDOW_LIMIT:
-            logger.warning("Prompt too long, truncating...")
-            prompt = prompt[-settings.CONTEXT_WINDOW_LIMIT:]
+        # Proteksi context window: prompt + max_tokens harus muat (build_prompt sudah menyesuaikan)
+        prompt, max_tokens = self._fit_raw(prompt, max_tokens)
 
+        self.backend.prompt_cache.last = {}
         try:
-            # Gunakan sampler dari mlx_lm.sample_utils
-            sampler = make_sampler(temp=temp) if make_sampler else None
-            
-            # Gunakan stream_generate dari mlx_lm
             # max_tokens di sini adalah output tokens
             # Stop sequences mencegah model "bicara sendiri" sebagai User
-            stream = mlx_lm.stream_generate(
-                self.model,
-                self.tokenizer,
-                prompt=prompt,
-                max_tokens=max_tokens,
-                sampler=sampler
-            )
-            
-            generated_text = ""
-            for response in stream:
-                current_chunk = str(response.text)
-                new_total_text = generated_text + current_chunk
-                
-                if stop_sequences:
-                    should_stop = False
-                    for stop in stop_sequences:
-                        if stop in new_total_text:
-                            stop_index = new_total_text.find(stop)
-                            safe_to_send_total = new_total_text[:stop_index]
-                            safe_chunk = safe_to_send_total[len(generated_text):]
-                            if safe_chunk:
-                                yield safe_chunk
-                            should_stop = True
-                            break
-                    if should_stop:
-                        break
+            stream = self.backend.stream_generate(prompt, max_tokens=max_tokens, temp=temp)
+
+            # Cek stop & repetisi hanya melihat chunk baru (+ ekor yang ditahan), bukan seluruh output
+            stops = StopMatcher(stop_sequences)
+            repetition = RepetitionDetector()
+            for current_chunk in stream:
+                safe_chunk = stops.feed(current_chunk)
+                if stops.stopped:
+                    if safe_chunk:
+                        yield safe_chunk
+                    break
                 
                 # Deteksi Repetisi (Loop Protection)
-                lines = new_total_text.splitlines()
-                if len(lines) > 5:
-                    last_three = lines[-3:]
-                    if len(set(last_three)) == 1 and len(last_three[0].strip()) > 5:
-                        logger.warning("Repetition detected, stopping generation.")
-                        break
+                if repetition.feed(current_chunk):
+                    logger.warning("Repetition detected, stopping generation.")
+                    break
                 
-                generated_text = new_total_text
-                yield current_chunk
+                if safe_chunk:
+                    yield safe_chunk
+            else:
+                tail = stops.flush()
+                if tail:
+                    yield tail
                 
         except Exception as e:
             logger.error(f"Generation error: {e}")
             yield f"\n[System Error: {str(e)}]\n"
         finally:
-            # Cleanup ringan setelah setiap request
-            if mx: mx.eval(None) # Ensure computation is done? (Not strictly needed in stream)
-            pass
+            # Panjang hit cache prefix dan perkiraan waktu prefill yang dihemat untuk request ini
+            self.last_request_stats = dict(self.backend.prompt_cache.last)
+            if self.last_request_stats:
+                logger.info(f"Prompt cache: {self.last_request_stats}")
 
     def generate_oneshot(self, prompt: str, max_tokens: int = 2000) -> str:
         """Generate full response sekaligus (bukan streaming)."""
-        if not self.model:
+        self.pool.wait_preload()
+        if not self.backend.is_loaded:
             self.load_model()
             
         try:
-            return mlx_lm.generate(
-                self.model,
-                self.tokenizer,
-                prompt=prompt,
-                max_tokens=max_tokens,
-                verbose=False
-            )
+            prompt, max_tokens = self._fit_raw(prompt, max_tokens)
+            return self.backend.generate_oneshot(prompt, max_tokens=max_tokens)
         except Exception as e:
             logger.error(f"Oneshot generation error: {e}")
             return ""
@@ -0,0 +1,189 @@
+import os
+import glob
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import psutil
+from src.core.config import settings
+from src.llm.backends import InferenceBackend
+
+logger = logging.getLogger("ModelPool")
+
+_WEIGHT_PATTERNS = ("*.safetensors", "*.gguf", "*.bin", "*.npz")
+
+
+def estimate_model_bytes(path: str) -> int:
+    """Perkiraan RAM model dari ukuran file bobot di disk (0 jika belum diunduh / repo HF)."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    if os.path.isdir(path):
+        files = {f for pattern in _WEIGHT_PATTERNS for f in glob.glob(os.path.join(path, pattern))}
+        return sum(os.path.getsize(f) for f in files)
+    return 0
+
+
+class ResidentModel:
+    def __init__(self, key: str, backend: InferenceBackend, ram_bytes: int, load_sec: float):
+        self.key = key
+        self.backend = backend
+        self.ram_bytes = ram_bytes
+        self.load_sec = load_sec
+        self.loaded_at = time.time()
+        self.uses = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "model": os.path.basename(self.key.rstrip("/")) or self.key,
+            "ram_mb": round(self.ram_bytes / 2 ** 20, 1),
+            "resident_sec": round(time.time() - self.loaded_at, 1),
+            "uses": self.uses,
+        }
+
+
+class ModelPool:
+    """
+    Responsibility: Menjaga beberapa model tetap termuat di bawah anggaran RAM.
+    - LRU: model yang paling lama tidak dipakai dikeluarkan lebih dulu saat anggaran penuh
+      (dicek SEBELUM memuat model baru, memakai ukuran bobot di disk).
+    - Preload: model yang paling sering dipakai setelah model aktif dimuat di latar,
+      hanya jika muat tanpa mengeluarkan model lain. Entri preload masuk di ujung LRU
+      (pertama dikeluarkan) sampai benar-benar di-acquire; acquire apa pun menunggu
+      preload yang sedang berjalan agar load/prefill tidak pernah tumpang tindih.
+    - Event load/preload/evict beserta lama residensi dicatat untuk metrics.
+    """
+    def __init__(self, budget_bytes: Optional[int] = None):
+        self.budget_bytes = budget_bytes
+        self.resident: "OrderedDict[str, ResidentModel]" = OrderedDict()
+        self.events: List[Dict[str, Any]] = []
+        # Urutan pemakaian: transitions[a][b] = berapa kali b dipakai tepat setelah a
+        self.transitions: Dict[str, Counter] = {}
+        self.last_key: Optional[str] = None
+        self._lock = threading.RLock()
+        self._preloading: Optional[threading.Thread] = None
+        # Perkiraan ukuran model yang sedang di-preload (sudah "dipesan" dari anggaran)
+        self._pending_bytes = 0
+
+    def budget(self) -> int:
+        if self.budget_bytes is not None:
+            return self.budget_bytes
+        if settings.MODEL_RAM_BUDGET_GB:
+            return int(settings.MODEL_RAM_BUDGET_GB * 1024 ** 3)
+        return int(psutil.virtual_memory().total * settings.MODEL_RAM_FRACTION)
+
+    def used_bytes(self) -> int:
+        return sum(m.ram_bytes for m in self.resident.values())
+
+    def _fits(self, need: int) -> bool:
+        reserve = int(settings.MODEL_RAM_RESERVE_GB * 1024 ** 3)
+        return self.used_bytes() + self._pending_bytes + need <= self.budget() and psutil.virtual_memory().available - need >= reserve
+
+    def get(self, key: str) -> Optional[InferenceBackend]:
+        """Backend resident untuk `key` tanpa mengubah urutan LRU (hanya acquire yang mempromosikan)."""
+        with self._lock:
+            entry = self.resident.get(key)
+            if entry is None or not entry.backend.is_loaded:
+                return None
+            return entry.backend
+
+    def wait_preload(self):
+        """Menunggu preload yang sedang berjalan (load + prefill di thread latar) selesai."""
+        thread = self._preloading
+        if thread is not None and thread is not threading.current_thread() and thread.is_alive():
+            thread.join()
+
+    def acquire(self, key: str, loader: Callable[[str], InferenceBackend]) -> InferenceBackend:
+        """Backend termuat untuk `key`; memuat via `loader` (dan mengeluarkan LRU) bila perlu."""
+        # Preload model apa pun harus selesai dulu: tidak ada dua load bersamaan (RAM & RSS tetap akurat)
+        self.wait_preload()
+        with self._lock:
+            backend = self.get(key)
+            if backend is None:
+                need = estimate_model_bytes(key)
+                while self.resident and not self._fits(need):
+                    self.evict(next(iter(self.resident)))
+                backend = self._load(key, loader, "load")
+            self.resident.move_to_end(key)
+            entry = self.resident[key]
+            entry.uses += 1
+            if self.last_key is not None and self.last_key != key:
+                self.transitions.setdefault(self.last_key, Counter())[key] += 1
+            self.last_key = key
+            return backend
+
+    def _load(self, key: str, loader: Callable[[str], InferenceBackend], event: str) -> InferenceBackend:
+        rss = psutil.Process().memory_info().rss
+        start = time.perf_counter()
+        backend = loader(key)
+        load_sec = time.perf_counter() - start
+        # Unified memory (MLX) tidak selalu tampak di RSS: ambil yang terbesar dari selisih RSS & ukuran bobot
+        ram = max(psutil.Process().memory_info().rss - rss, estimate_model_bytes(key))
+        entry = ResidentModel(key, backend, ram, load_sec)
+        with self._lock:
+            self.resident[key] = entry
+            # Model preload belum pernah dipakai: kandidat pertama untuk dikeluarkan
+            self.resident.move_to_end(key, last=event != "preload")
+            self.events.append({"event": event, "model": entry.snapshot()["model"],
+                                "sec": round(load_sec, 2), "ram_mb": round(ram / 2 ** 20, 1)})
+        logger.info(f"Model {event}: {key} ({ram / 2 ** 30:.2f} GB, {load_sec:.2f}s, resident: {len(self.resident)})")
+        return backend
+
+    def evict(self, key: str):
+        with self._lock:
+            entry = self.resident.pop(key, None)
+            if entry is None:
+                return
+            snap = entry.snapshot()
+            entry.backend.unload()
+            self.events.append({"event": "evict", "model": snap["model"], "resident_sec": snap["resident_sec"],
+                                "uses": snap["uses"], "ram_mb": snap["ram_mb"]})
+            logger.info(f"Model evicted: {key} after {snap['resident_sec']}s ({snap['uses']} uses)")
+
+    def unload_all(self):
+        self.wait_preload()
+        with self._lock:
+            for key in list(self.resident):
+                self.evict(key)
+
+    def predict_next(self, key: Optional[str] = None) -> Optional[str]:
+        key = key or self.last_key
+        following = self.transitions.get(key)
+        if not following:
+            return None
+        return following.most_common(1)[0][0]
+
+    def preload(self, key: str, loader: Callable[[str], InferenceBackend]) -> Optional[threading.Thread]:
+        """
+        Memuat `key` di thread latar jika belum resident dan muat tanpa eviction.
+        Berjalan di sela request (setelah generate); request berikutnya menunggu lewat wait_preload().
+        """
+        if self._preloading is not None and self._preloading.is_alive():
+            return None
+        with self._lock:
+            need = estimate_model_bytes(key)
+            if key in self.resident or not self._fits(need):
+                return None
+            self._pending_bytes = need
+
+        def run():
+            try:
+                self._load(key, loader, "preload")
+            except Exception as e:
+                logger.warning(f"Preload failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._pending_bytes = 0
+
+        self._preloading = threading.Thread(target=run, name="ModelPreload", daemon=True)
+        self._preloading.start()
+        return self._preloading
+
+    def residency(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [m.snapshot() for m in self.resident.values()]
+
+    def drain_events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            events, self.events = self.events, []
+            return events
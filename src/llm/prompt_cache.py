@@ -0,0 +1,62 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("PromptCache")
+
+# Prefill sependek ini didominasi overhead satu langkah decode; tidak dipakai untuk estimasi laju
+_MIN_RATE_TOKENS = 32
+
+
+def common_prefix_len(a: List[int], b: List[int]) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class PromptCache:
+    """
+    Responsibility: Mencatat token yang saat ini ada di KV cache backend dan
+    statistik reuse per request. Prompt baru hanya perlu di-prefill mulai dari
+    akhir prefix terpanjang yang sama dengan isi cache.
+    """
+    def __init__(self):
+        self.tokens: List[int] = []
+        # Laju prefill terukur (token/detik), untuk memperkirakan waktu yang dihemat
+        self.prefill_rate: Optional[float] = None
+        self.last: Dict[str, Any] = {}
+        self.totals = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "saved_sec": 0.0}
+
+    def reset(self):
+        self.tokens = []
+
+    def match(self, tokens: List[int]) -> int:
+        """Panjang prefix yang bisa dipakai ulang; minimal satu token tetap di-prefill untuk logits."""
+        if not tokens:
+            return 0
+        return min(common_prefix_len(self.tokens, tokens), len(tokens) - 1)
+
+    def observe(self, tokens: int, seconds: float):
+        if tokens < _MIN_RATE_TOKENS or seconds <= 0:
+            return
+        rate = tokens / seconds
+        self.prefill_rate = rate if self.prefill_rate is None else 0.7 * self.prefill_rate + 0.3 * rate
+
+    def record(self, prompt_tokens: int, cached_tokens: int, first_token_sec: float) -> Dict[str, Any]:
+        prefill_tokens = prompt_tokens - cached_tokens
+        self.observe(prefill_tokens, first_token_sec)
+        saved = cached_tokens / self.prefill_rate if self.prefill_rate else 0.0
+        self.last = {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "prefill_tokens": prefill_tokens,
+            "first_token_sec": round(first_token_sec, 4),
+            "saved_sec": round(saved, 4),
+        }
+        self.totals["requests"] += 1
+        self.totals["prompt_tokens"] += prompt_tokens
+        self.totals["cached_tokens"] += cached_tokens
+        self.totals["saved_sec"] = round(self.totals["saved_sec"] + saved, 4)
+        logger.debug(f"Prompt cache: {self.last}")
+        return self.last
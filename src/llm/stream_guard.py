@@ -0,0 +1,98 @@
+import re
+from typing import List, Optional, Tuple
+
+# Hash polinomial baris dengan basis 2^32 (satu "digit" per karakter UTF-32) modulo prima Mersenne.
+# Diperbarui per potongan teks, hasilnya tidak bergantung pada cara teks dipecah menjadi chunk.
+_HASH_MOD = (1 << 61) - 1
+
+
+class StopMatcher:
+    """
+    Responsibility: Mendeteksi stop sequence pada teks streaming dengan biaya per chunk
+    yang tidak bergantung pada panjang output: pencarian hanya pada chunk baru ditambah
+    ekor yang ditahan (< panjang stop terpanjang). Hanya ekor yang masih mungkin menjadi
+    awal stop sequence yang ditahan; sisanya langsung aman dikirim.
+    """
+    def __init__(self, stop_sequences: Optional[List[str]] = None):
+        stops = [s for s in (stop_sequences or []) if s]
+        # Satu regex alternatif: posisi match paling awal di antara semua stop sequence
+        self.pattern = re.compile("|".join(re.escape(s) for s in sorted(stops, key=len, reverse=True))) if stops else None
+        prefixes = sorted({s[:i] for s in stops for i in range(1, len(s))}, key=len, reverse=True)
+        # Ekor teks yang merupakan awal sebuah stop sequence; match paling kiri = ekor terpanjang
+        self.partial = re.compile("(?:" + "|".join(re.escape(p) for p in prefixes) + r")\Z") if prefixes else None
+        self.max_hold = max((len(s) for s in stops), default=1) - 1
+        self.held = ""
+        self.stopped = False
+
+    def feed(self, chunk: str) -> str:
+        """Teks yang aman dikirim setelah `chunk`; `stopped` menjadi True jika stop sequence ditemukan."""
+        if self.stopped:
+            return ""
+        if self.pattern is None:
+            return chunk
+        pending = self.held + chunk
+        match = self.pattern.search(pending)
+        if match:
+            self.stopped = True
+            self.held = ""
+            return pending[:match.start()]
+        hold = self._partial_len(pending)
+        self.held = pending[len(pending) - hold:] if hold else ""
+        return pending[:len(pending) - hold]
+
+    def _partial_len(self, text: str) -> int:
+        if self.partial is None:
+            return 0
+        match = self.partial.search(text, max(0, len(text) - self.max_hold))
+        return len(text) - match.start() if match else 0
+
+    def flush(self) -> str:
+        """Akhir stream: sisa teks yang ditahan ternyata bukan stop sequence."""
+        held, self.held = self.held, ""
+        return "" if self.stopped else held
+
+
+class RepetitionDetector:
+    """
+    Responsibility: Deteksi loop (tiga baris terakhir identik, baris > 5 karakter non-spasi,
+    output > 5 baris) secara bertahap. Setiap baris diwakili rolling hash polinomial
+    yang diperbarui per chunk, sehingga pengecekan per chunk O(panjang chunk).
+    Baris dipisah pada "\\n"; baris terakhir yang belum selesai ikut dihitung.
+    """
+    def __init__(self):
+        self.complete = 0
+        # (hash, panjang, panjang tanpa spasi tepi > 5) untuk tiga baris lengkap terakhir
+        self.recent: List[Tuple[int, int, bool]] = []
+        self._hash = 0
+        self._len = 0
+        self._parts: List[str] = []
+
+    def _extend(self, text: str):
+        digits = int.from_bytes(text.encode("utf-32-be"), "big")
+        self._hash = ((self._hash << (32 * len(text))) | digits) % _HASH_MOD
+        self._len += len(text)
+        self._parts.append(text)
+
+    def _end_line(self):
+        line = "".join(self._parts)
+        self.recent = (self.recent + [(self._hash, self._len, len(line.strip()) > 5)])[-3:]
+        self.complete += 1
+        self._hash, self._len, self._parts = 0, 0, []
+
+    def feed(self, chunk: str) -> bool:
+        """True jika teks sejauh ini (termasuk `chunk`) berakhir dengan pengulangan."""
+        for i, part in enumerate(chunk.split("\n")):
+            if i:
+                self._end_line()
+            if part:
+                self._extend(part)
+        return self.repeating()
+
+    def repeating(self) -> bool:
+        lines = self.recent
+        if self._len:
+            lines = lines[-2:] + [(self._hash, self._len, None)]
+        if self.complete + (1 if self._len else 0) <= 5 or len(lines) < 3:
+            return False
+        first = lines[0]
+        return first[2] and all(line[:2] == first[:2] for line in lines[1:])
@@ -10,6 +10,8 @@ from rich.panel import Panel
 from src.tools.updater import AronUpdater
 
 app = typer.Typer(name=settings.APP_NAME)
+index_app = typer.Typer(help="Kelola index semantik proyek (snapshot export/import)")
+app.add_typer(index_app, name="index")
 console = Console(theme=ARON_THEME)
 hub = ModelHub()
 updater = AronUpdater()
@@ -66,5 +68,44 @@ def version():
     """Tampilkan versi CodeAron"""
     console.print(f"{settings.APP_NAME} [bold green]v{settings.VERSION}[/bold green]")
 
+@index_app.command("export")
+def index_export(path: str = typer.Argument(..., help="File arsip tujuan, mis. aron-index.zip")):
+    """Ekspor index proyek aktif (vektor, simbol, manifest) ke satu arsip"""
+    from src.memory.vector_store import VectorStore
+    from src.memory.snapshot import export_index
+    store = VectorStore()
+    try:
+        meta = export_index(store, path)
+        console.print(
+            f"[bold green]✅ Exported {meta['points']} vectors, {meta['symbols']} symbols, "
+            f"{meta['files']} files[/bold green] [dim]({meta['bytes'] / 2**20:.1f} MB → {path})[/dim]"
+        )
+    finally:
+        store.close()
+
+@index_app.command("import")
+def index_import(
+    path: str = typer.Argument(..., help="Arsip hasil `aron index export`"),
+    sync: bool = typer.Option(True, help="Re-index file yang berubah sejak snapshot dibuat"),
+):
+    """Impor snapshot index, lalu re-index hanya file yang hash-nya berbeda"""
+    from src.memory.vector_store import VectorStore
+    from src.memory.indexer import ProjectIndexer
+    from src.memory.snapshot import import_index
+    store = VectorStore()
+    try:
+        meta = import_index(store, path)
+        console.print(
+            f"[bold green]✅ Imported {meta['points']} vectors, {meta['symbols']} symbols, "
+            f"{meta['files']} files[/bold green] [dim](Aron v{meta['app_version']} snapshot)[/dim]"
+        )
+        if sync:
+            ProjectIndexer(str(settings.CURRENT_PROJECT_DIR), store).scan_project()
+    except (ValueError, OSError) as e:
+        console.print(f"[bold red]Import gagal:[/bold red] {e}")
+        raise typer.Exit(code=1)
+    finally:
+        store.close()
+
 if __name__ == "__main__":
     app()
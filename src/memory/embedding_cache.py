@@ -0,0 +1,112 @@
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+import numpy as np
+from src.memory.models import init_db, load_embeddings, save_embeddings, prune_embeddings
+from src.core.config import settings
+
+logger = logging.getLogger("EmbeddingCache")
+
+class EmbeddingCache:
+    """
+    Responsibility: Cache embedding di disk (SQLite) dengan kunci hash(model, teks).
+    Hanya teks yang belum pernah di-embed yang diteruskan ke model, sehingga
+    scan ulang, fork, dan branch proyek yang sama tidak membayar embedding lagi.
+    """
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_prune = 0
+        self._lock = threading.Lock()
+        init_db()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8", errors="ignore")).hexdigest()
+
+    def embed(self, texts: List[str], embed_fn: Callable[[List[str]], Iterable[np.ndarray]]) -> List[np.ndarray]:
+        """Embedding untuk `texts` (urutan sama); cache miss dihitung lewat `embed_fn`."""
+        keys = [self.key(t) for t in texts]
+        try:
+            cached = load_embeddings(list(set(keys)))
+        except Exception as e:
+            logger.error(f"Embedding cache read error: {e}")
+            cached = {}
+        vectors: Dict[str, np.ndarray] = {k: np.frombuffer(v, dtype=np.float32) for k, v in cached.items()}
+
+        # Teks identik dalam satu batch cukup di-embed sekali
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            computed = list(embed_fn(list(missing.values())))
+            now = time.time()
+            rows = []
+            for key, vector in zip(missing.keys(), computed):
+                vector = np.asarray(vector, dtype=np.float32)
+                vectors[key] = vector
+                rows.append({"key": key, "vector": vector.tobytes(), "created_at": now})
+            self._store(rows)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [vectors[k] for k in keys]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+    def _store(self, rows: List[dict]):
+        try:
+            save_embeddings(rows)
+            self._writes_since_prune += len(rows)
+            if self._writes_since_prune >= 10_000:
+                self._writes_since_prune = 0
+                pruned = prune_embeddings(settings.EMBEDDING_CACHE_MAX_ROWS)
+                if pruned: logger.info(f"Pruned {pruned} old cached embeddings")
+        except Exception as e:
+            logger.error(f"Embedding cache write error: {e}")
+
+
+class LRUCache:
+    """Cache LRU kecil di memori (thread-safe), dipakai untuk query dan hasil pencarian."""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0: return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
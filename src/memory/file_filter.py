@@ -0,0 +1,218 @@
+import os
+import re
+import fnmatch
+import logging
+import subprocess
+import threading
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from src.core.config import settings
+
+logger = logging.getLogger("FileFilter")
+
+IGNORE_FILES = (".gitignore", ".aronignore")
+# Penanda file hasil generate yang umum (dicek pada potongan awal file)
+GENERATED_MARKERS = (
+    b"GENERATED CODE - DO NOT MODIFY", b"@generated", b"Code generated by", b"DO NOT EDIT",
+    b"<auto-generated", b"This file is automatically generated",
+)
+SNIFF_BYTES = 4096
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Menerjemahkan glob gitignore (`*`, `?`, `**`, `[...]`) ke regex."""
+    i, out = 0, []
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"): body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreMatcher:
+    """Subset aturan .gitignore: negasi `!`, pola khusus direktori `/`, anchor, dan `**`."""
+    def __init__(self):
+        # (base dir relatif, regex, negate, dir_only)
+        self.rules: List[Tuple[str, re.Pattern, bool, bool]] = []
+
+    def add_file(self, path: str, base: str = ""):
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+        for line in lines:
+            self.add_pattern(line, base)
+
+    def add_pattern(self, line: str, base: str = ""):
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            return
+        negate = line.startswith("!")
+        if negate: line = line[1:]
+        dir_only = line.endswith("/")
+        if dir_only: line = line.rstrip("/")
+        # Anchor: "/" di awal atau di tengah pola (bukan "/" penanda direktori di akhir)
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            return
+        regex = _glob_to_regex(line)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        self.rules.append((base, re.compile(regex + "$"), negate, dir_only))
+
+    def _match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        result = None
+        for base, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                target = rel_path[len(base) + 1:]
+            else:
+                target = rel_path
+            if regex.match(target):
+                result = not negate
+        return result
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        """True jika path atau salah satu direktori induknya diabaikan."""
+        parts = rel_path.split("/")
+        for depth in range(1, len(parts)):
+            if self._match("/".join(parts[:depth]), True):
+                return True
+        return bool(self._match(rel_path, is_dir))
+
+
+def is_excluded_path(rel_path: str) -> bool:
+    """True jika salah satu direktori di path termasuk IGNORED_DIRS atau tersembunyi."""
+    parts = rel_path.replace(os.sep, "/").split("/")
+    if not parts or parts[0] in ("", ".."):
+        return True
+    return any(d in settings.IGNORED_DIRS or d.startswith('.') for d in parts[:-1])
+
+
+def looks_generated(head: bytes) -> bool:
+    """Deteksi file generate/minified dari potongan awal konten."""
+    head = head[:SNIFF_BYTES]
+    if any(marker in head for marker in GENERATED_MARKERS):
+        return True
+    lines = head.split(b"\n")
+    # Minified: baris sangat panjang di awal file
+    return len(head) >= 1024 and len(head) / max(len(lines), 1) > settings.INDEX_MAX_AVG_LINE_LENGTH
+
+
+class FileEnumerator:
+    """
+    Responsibility: Menentukan file mana yang layak diindeks tanpa membacanya.
+    Memakai index git (`git ls-files`) jika proyek berupa repo, selain itu os.walk
+    dengan aturan .gitignore/.aronignore; lalu menyaring ukuran dan nama file generate.
+    Aturan ignore dimuat ulang (dan .gitignore bersarang ditambahkan) saat enumerasi,
+    jadi akses ke matcher dijaga lock bila satu instance dipakai beberapa thread.
+    """
+    def __init__(self, project_path: str):
+        self.root = Path(project_path)
+        self._lock = threading.RLock()
+        self.reload_rules()
+
+    def reload_rules(self):
+        """Memuat ulang .gitignore/.aronignore di root (.gitignore bersarang dimuat saat walk)."""
+        matcher = IgnoreMatcher()
+        for name in IGNORE_FILES:
+            matcher.add_file(str(self.root / name))
+        with self._lock:
+            self.matcher = matcher
+
+    def iter_files(self, use_git: Optional[bool] = None) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """Yield (path absolut, ekstensi, stat) untuk setiap file yang diterima.
+
+        `use_git=False` memaksa os.walk (tanpa subprocess git), mis. untuk polling watcher.
+        """
+        use_git = settings.INDEX_USE_GIT if use_git is None else use_git
+        with self._lock:
+            # Daftar path diselesaikan di bawah lock: walk menambah aturan .gitignore bersarang ke matcher
+            self.reload_rules()
+            rel_paths = self._git_files() if use_git else None
+            if rel_paths is None:
+                rel_paths = self._walk_files()
+            rel_paths = [rel_path for rel_path in rel_paths if self.is_indexable(rel_path)]
+        for rel_path in rel_paths:
+            file_path = os.path.join(self.root, rel_path)
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue  # Terhapus di working tree tapi masih ada di index git
+            if st.st_size > settings.INDEX_MAX_FILE_BYTES:
+                logger.debug(f"Skipping large file {rel_path} ({st.st_size} bytes)")
+                continue
+            yield file_path, os.path.splitext(rel_path)[1], st
+
+    def is_ignored_dir(self, rel_dir: str) -> bool:
+        name = os.path.basename(rel_dir)
+        if name in settings.IGNORED_DIRS or name.startswith('.'):
+            return True
+        with self._lock:
+            return self.matcher.is_ignored(rel_dir.replace(os.sep, "/"), is_dir=True)
+
+    def is_indexable(self, rel_path: str) -> bool:
+        """Cek berbasis path saja (tanpa stat/baca): ekstensi, direktori, ignore, nama generate."""
+        rel_path = rel_path.replace(os.sep, "/")
+        parts = rel_path.split("/")
+        if is_excluded_path(rel_path):
+            return False
+        if os.path.splitext(rel_path)[1] not in settings.SUPPORTED_EXTENSIONS:
+            return False
+        if any(fnmatch.fnmatch(parts[-1], p) for p in settings.INDEX_GENERATED_PATTERNS):
+            return False
+        with self._lock:
+            return not self.matcher.is_ignored(rel_path)
+
+    def _git_files(self) -> Optional[List[str]]:
+        """Daftar file dari index git (tracked + untracked yang tidak di-ignore)."""
+        try:
+            result = subprocess.run(
+                ["git", "-C", str(self.root), "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                capture_output=True, timeout=60
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.debug(f"git ls-files unavailable: {e}")
+            return None
+        if result.returncode != 0:
+            return None
+        files = os.fsdecode(result.stdout).split("\0")
+        return list(dict.fromkeys(f for f in files if f))
+
+    def _walk_files(self) -> Iterator[str]:
+        for root, dirs, files in os.walk(self.root):
+            rel_root = os.path.relpath(root, self.root)
+            rel_root = "" if rel_root == "." else rel_root.replace(os.sep, "/")
+            if rel_root and ".gitignore" in files:
+                self.matcher.add_file(os.path.join(root, ".gitignore"), base=rel_root)
+            # Skip ignored directories
+            dirs[:] = [d for d in dirs if not self.is_ignored_dir(f"{rel_root}/{d}" if rel_root else d)]
+            for file in files:
+                yield f"{rel_root}/{file}" if rel_root else file
@@ -0,0 +1,103 @@
+import os
+import re
+import time
+import logging
+from typing import Any, Dict, List, Optional
+from src.memory.models import lexical_search, find_symbols_by_name, hydrate_content
+from src.core.config import settings
+
+logger = logging.getLogger("HybridRetriever")
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*$")
+
+
+def looks_like_identifier(query: str) -> Optional[str]:
+    """Nama simbol jika query berupa identifier kode (`ProjectIndexer`, `_run_shell`, `a.b`), selain itu None."""
+    query = query.strip().strip("`'\"")
+    if query.endswith("()"): query = query[:-2]
+    if not _IDENTIFIER.match(query):
+        return None
+    # Kata biasa ("authentication") tetap lewat jalur semantik
+    if "_" in query or "." in query or query[0].isupper() or re.search(r"[a-z][A-Z]", query):
+        return query.rsplit(".", 1)[-1]
+    return None
+
+
+def _symbol_key(symbol: Dict[str, Any]) -> tuple:
+    return symbol.get("file_path"), symbol.get("name"), symbol.get("line_start")
+
+
+def _in_scope(symbols: List[Dict[str, Any]], path_prefix: Optional[str], language: Optional[str]) -> List[Dict[str, Any]]:
+    """Filter hasil SQL dengan aturan yang sama seperti filter payload dense."""
+    if path_prefix:
+        prefix = path_prefix.replace(os.sep, "/").strip("/") + "/"
+        symbols = [s for s in symbols if s["file_path"].replace(os.sep, "/").startswith(prefix)]
+    if language:
+        symbols = [s for s in symbols
+                   if settings.SUPPORTED_EXTENSIONS.get(os.path.splitext(s["file_path"])[1]) == language]
+    return symbols
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], k: int, limit: int) -> List[Dict[str, Any]]:
+    """Menggabungkan beberapa ranking: skor = Σ 1 / (k + rank)."""
+    scores: Dict[tuple, float] = {}
+    symbols: Dict[tuple, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, symbol in enumerate(ranking, start=1):
+            key = _symbol_key(symbol)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            symbols.setdefault(key, symbol)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [symbols[key] for key in ordered[:limit]]
+
+
+class HybridRetriever:
+    """
+    Responsibility: Retrieval simbol gabungan leksikal (BM25) dan dense.
+    Query berbentuk identifier dijawab langsung dari lookup nama tanpa embedding;
+    selain itu hasil BM25 dan vektor digabung dengan reciprocal-rank fusion.
+    """
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+        self.stats = {"identifier": 0, "hybrid": 0, "identifier_ms": 0.0, "hybrid_ms": 0.0}
+
+    def search(self, query: str, limit: int = 5, path_prefix: Optional[str] = None,
+               language: Optional[str] = None) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        scoped = path_prefix or language
+        candidates = max(limit, settings.HYBRID_CANDIDATES)
+        name = looks_like_identifier(query)
+        if name:
+            hits = self._safe(find_symbols_by_name, name, candidates if scoped else limit)
+            hits = _in_scope(hits, path_prefix, language)[:limit]
+            if hits:
+                self._record("identifier", start)
+                return self._with_content(hits)
+
+        # Kandidat cukup metadata; konten hanya diambil untuk `limit` hasil akhir
+        dense = self.vector_store.search(query, limit=candidates, path_prefix=path_prefix, language=language,
+                                         with_content=False)
+        lexical = _in_scope(self._safe(lexical_search, query, candidates * 2 if scoped else candidates), path_prefix, language)
+        results = reciprocal_rank_fusion([dense, lexical], settings.RRF_K, limit)
+        self._record("hybrid", start)
+        return self._with_content(results)
+
+    def _safe(self, fn, *args) -> List[Dict[str, Any]]:
+        try:
+            return fn(self.vector_store.project_hash, *args, with_content=False)
+        except Exception as e:
+            logger.error(f"Lexical search error: {e}")
+            return []
+
+    def _with_content(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        try:
+            return hydrate_content(results)
+        except Exception as e:
+            logger.error(f"Content lookup error: {e}")
+            return results
+
+    def _record(self, path: str, start: float):
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stats[path] += 1
+        self.stats[f"{path}_ms"] += elapsed
+        logger.debug(f"Search via {path} path in {elapsed:.1f}ms")
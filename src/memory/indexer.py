@@ -1,28 +1,116 @@
 import os
 import re
 import gc
+import time
+import bisect
+import hashlib
 import logging
+import multiprocessing
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from src.memory.models import CodeSymbol, save_symbol, init_db
-from src.memory.vector_store import VectorStore
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Iterable
+from src.memory.models import (
+    FileManifest, init_db, load_manifest, save_manifest, delete_manifest,
+    replace_symbols, clear_project
+)
+from src.memory.file_filter import FileEnumerator, looks_generated
+from src.memory.pipeline import IndexPipeline
 from src.core.config import settings
 from rich.console import Console
 
+if TYPE_CHECKING:
+    # Diimpor saat dipakai: worker parse (forkserver) cukup memuat parser, bukan qdrant/fastembed
+    from src.memory.vector_store import VectorStore
+
 console = Console()
 logger = logging.getLogger("Indexer")
 
-class ProjectIndexer:
-    def __init__(self, project_path: str, vector_store: Optional[VectorStore] = None):
-        self.project_path = Path(project_path)
-        init_db()
-        self.vector_store = vector_store or VectorStore()
+# Query tree-sitter per bahasa. Setiap pola menandai node definisi (@def) yang
+# punya field `name`; node type yang tidak dikenal grammar membuat query gagal
+# dikompilasi, jadi query tidak bisa dipakai bersama lintas bahasa.
+TREESITTER_QUERIES: Dict[str, str] = {
+    "python": """
+        (class_definition name: (identifier) @name) @def
+        (function_definition name: (identifier) @name) @def
+    """,
+    "dart": """
+        (class_definition name: (identifier) @name) @def
+        (enum_declaration name: (identifier) @name) @def
+        (function_signature name: (identifier) @name) @def
+    """,
+    "javascript": """
+        (class_declaration name: (identifier) @name) @def
+        (function_declaration name: (identifier) @name) @def
+        (method_definition name: (property_identifier) @name) @def
+        (variable_declarator name: (identifier) @name value: (arrow_function)) @def
+    """,
+    "typescript": """
+        (class_declaration name: (type_identifier) @name) @def
+        (interface_declaration name: (type_identifier) @name) @def
+        (function_declaration name: (identifier) @name) @def
+        (method_definition name: (property_identifier) @name) @def
+        (variable_declarator name: (identifier) @name value: (arrow_function)) @def
+    """,
+    "java": """
+        (class_declaration name: (identifier) @name) @def
+        (interface_declaration name: (identifier) @name) @def
+        (enum_declaration name: (identifier) @name) @def
+        (method_declaration name: (identifier) @name) @def
+        (constructor_declaration name: (identifier) @name) @def
+    """,
+    "kotlin": """
+        (class_declaration name: (type_identifier) @name) @def
+        (object_declaration name: (type_identifier) @name) @def
+        (function_declaration name: (simple_identifier) @name) @def
+    """,
+}
+
+# Pola fallback regex per ekstensi. `[ \t]` (bukan `\s`) menjaga setiap match
+# tetap di satu baris, sama seperti saat file dipindai baris per baris.
+# Kuantifier posesif (`++`, Python 3.11+) mencegah backtracking kuadratik
+# pada pola method Dart di file hasil generate yang besar.
+REGEX_PATTERNS: Dict[str, List[str]] = {
+    '.dart': [r'(class|mixin|enum)[ \t]+(\w+)', r'\b(\w++)[ \t]++(\w++)[ \t]*+\(.*?\)[ \t]*{'],
+    '.py': [r'class[ \t]+(\w+)', r'def[ \t]+(\w+)'],
+    '.js': [r'class[ \t]+(\w+)', r'function[ \t]+(\w+)', r'const[ \t]+(\w+)[ \t]*=[ \t]*\(.*?\)[ \t]*=>']
+}
+DEFAULT_REGEX_PATTERNS = [r'class[ \t]+(\w+)', r'def[ \t]+(\w+)']
+REGEX_CONTEXT_LINES = 15
+
+def _compile_fallback(patterns: List[str]):
+    """Menggabungkan pola menjadi satu regex alternation.
+
+    Mengembalikan (regex, name_group) dengan `name_group[g]` = nomor grup nama
+    simbol untuk match yang grup terakhirnya `g` (grup 1 jika pola hanya punya
+    satu grup, selain itu grup 2).
+    """
+    name_group = {}
+    offset = 0
+    for pattern in patterns:
+        groups = re.compile(pattern).groups
+        target = offset + (1 if groups == 1 else 2)
+        for g in range(offset + 1, offset + groups + 1):
+            name_group[g] = target
+        offset += groups
+    return re.compile("|".join(f"(?:{p})" for p in patterns)), name_group
+
+_FALLBACK_SCANNERS = {ext: _compile_fallback(p) for ext, p in REGEX_PATTERNS.items()}
+_DEFAULT_SCANNER = _compile_fallback(DEFAULT_REGEX_PATTERNS)
+_NEWLINE = re.compile("\n")
+
+class SymbolParser:
+    """Ekstraksi simbol dari source code (tree-sitter dengan fallback regex).
+
+    Tidak menyentuh database maupun vector store, sehingga aman dibuat ulang
+    di setiap worker process.
+    """
+    def __init__(self):
         self.parsers = {}
         self.languages = {}
+        self.queries = {}
         self._init_treesitter()
 
     def _init_treesitter(self):
-        """Mencoba memuat parser tree-sitter secara aman."""
+        """Mencoba memuat parser dan query tree-sitter (dikompilasi sekali per bahasa)."""
         try:
             import tree_sitter_languages
             from tree_sitter import Parser
@@ -37,98 +125,36 @@ class ProjectIndexer:
                             parser.language = language
                         except AttributeError:
                             parser.set_language(language)
+                        self.queries[lang_name] = language.query(TREESITTER_QUERIES[lang_name])
                         self.parsers[lang_name] = parser
                     except Exception as e:
+                        # Tanpa parser/query yang valid, bahasa ini memakai fallback regex
                         logger.debug(f"Parser for {lang_name} not loaded: {e}")
         except Exception as e:
             logger.warning(f"Tree-sitter initialization failed: {e}. Falling back to Regex.")
 
-    def scan_project(self):
-        """Memindai proyek dengan pembersihan database total."""
-        console.print("[bold yellow]🧹 Cleaning old semantic memory...[/bold yellow]")
-        self.vector_store.clear_all()
-        
-        console.print(f"\n[bold cyan]🔍 Indexing project:[/bold cyan] [dim]{self.project_path}[/dim]")
-        
-        count = 0
-        file_count = 0
-        batch_symbols = []
-        
-        for root, dirs, files in os.walk(self.project_path):
-            # Skip ignored directories
-            dirs[:] = [d for d in dirs if d not in settings.IGNORED_DIRS and not d.startswith('.')]
-            
-            for file in files:
-                ext = os.path.splitext(file)[1]
-                if ext in settings.SUPPORTED_EXTENSIONS:
-                    file_path = os.path.join(root, file)
-                    found_symbols = self._index_file_to_list(file_path, ext)
-                    if found_symbols:
-                        count += len(found_symbols)
-                        batch_symbols.extend(found_symbols)
-                        
-                        if len(batch_symbols) >= 20:
-                            self.vector_store.add_symbols(batch_symbols)
-                            batch_symbols = []
-                    file_count += 1
-        
-        if batch_symbols:
-            self.vector_store.add_symbols(batch_symbols)
-            
-        gc.collect()
-        console.print(f"[bold green]✅ Success! Indexed {count} symbols from {file_count} files.[/bold green]")
-
-    def _index_file_to_list(self, file_path: str, ext: str) -> List[Dict[str, Any]]:
-        rel_path = os.path.relpath(file_path, self.project_path)
+    def parse(self, source_code: str, rel_path: str, ext: str) -> List[Dict[str, Any]]:
         lang_name = settings.SUPPORTED_EXTENSIONS.get(ext)
-        found_symbols = []
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                source_code = f.read()
-
-            if lang_name in self.parsers:
-                found_symbols = self._parse_with_treesitter(source_code, rel_path, lang_name)
-            else:
-                found_symbols = self._parse_with_regex(source_code, rel_path, ext)
-
-            # Backup to SQL
-            for s in found_symbols:
-                try:
-                    save_symbol(CodeSymbol(**s))
-                except Exception as e:
-                    logger.error(f"SQL Save Error: {e}")
-                
-            return found_symbols
-        except Exception as e:
-            logger.error(f"Error indexing {rel_path}: {e}")
-            return []
+        if lang_name in self.parsers:
+            return self._parse_with_treesitter(source_code, rel_path, lang_name)
+        return self._parse_with_regex(source_code, rel_path, ext)
 
     def _parse_with_treesitter(self, source_code: str, rel_path: str, lang_name: str) -> List[Dict[str, Any]]:
         symbols = []
         try:
             parser = self.parsers[lang_name]
-            tree = parser.parse(bytes(source_code, "utf8"))
-            language = self.languages[lang_name]
-
-            query_scm = """
-                (class_definition name: (identifier) @name) @def
-                (function_definition name: (identifier) @name) @def
-                (class_declaration name: (identifier) @name) @def
-                (function_declaration name: (identifier) @name) @def
-                (method_declaration name: (identifier) @name) @def
-            """
-            
-            query = language.query(query_scm)
-            captures = query.captures(tree.root_node)
+            source_bytes = bytes(source_code, "utf8")
+            tree = parser.parse(source_bytes)
+            captures = self.queries[lang_name].captures(tree.root_node)
             
             for node, tag in captures:
                 if tag == 'def':
                     name_node = node.child_by_field_name('name')
                     if not name_node: continue
                         
-                    symbol_name = source_code[name_node.start_byte:name_node.end_byte]
-                    content = source_code[node.start_byte:node.end_byte]
+                    # Offset tree-sitter dalam byte, bukan indeks karakter
+                    symbol_name = source_bytes[name_node.start_byte:name_node.end_byte].decode("utf8", errors="ignore")
+                    content = source_bytes[node.start_byte:node.end_byte].decode("utf8", errors="ignore")
                     
                     symbols.append({
                         "name": symbol_name,
@@ -145,29 +171,295 @@ class ProjectIndexer:
             return []
 
     def _parse_with_regex(self, source_code: str, rel_path: str, ext: str) -> List[Dict[str, Any]]:
-        patterns = {
-            '.dart': [r'(class|mixin|enum)\s+(\w+)', r'(\w+)\s+(\w+)\s*\(.*?\)\s*{'],
-            '.py': [r'class\s+(\w+)', r'def\s+(\w+)'],
-            '.js': [r'class\s+(\w+)', r'function\s+(\w+)', r'const\s+(\w+)\s*=\s*\(.*?\)\s*=>']
-        }
-        
+        """Satu kali pindai seluruh file; nomor baris dicari lewat tabel offset newline."""
+        scanner, name_group = _FALLBACK_SCANNERS.get(ext, _DEFAULT_SCANNER)
+        if "\r" in source_code:
+            source_code = source_code.replace("\r\n", "\n").replace("\r", "\n")
+
+        line_starts = [0]
+        line_starts.extend(m.end() for m in _NEWLINE.finditer(source_code))
+        total_lines = len(line_starts) - 1 if source_code.endswith("\n") else len(line_starts)
+
         symbols = []
-        file_patterns = patterns.get(ext, [r'class\s+(\w+)', r'def\s+(\w+)'])
-        lines = source_code.splitlines()
-        
-        for i, line in enumerate(lines):
-            for pattern in file_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    name = match.group(1) if len(match.groups()) == 1 else match.group(2)
-                    symbols.append({
-                        "name": name,
-                        "type": "RegexDef",
-                        "file_path": rel_path,
-                        "line_start": i + 1,
-                        "line_end": min(i + 15, len(lines)),
-                        "signature": line.strip(),
-                        "content": "\n".join(lines[i:i+15])
-                    })
-                    break 
+        last_line = -1
+        for match in scanner.finditer(source_code):
+            i = bisect.bisect_right(line_starts, match.start()) - 1
+            if i == last_line:
+                continue  # Satu simbol per baris
+            last_line = i
+
+            line_stop = source_code.find("\n", match.end())
+            if line_stop == -1: line_stop = len(source_code)
+            end = min(i + REGEX_CONTEXT_LINES, total_lines)
+            content_stop = line_starts[end] - 1 if end < len(line_starts) else len(source_code)
+
+            symbols.append({
+                "name": match.group(name_group[match.lastindex]),
+                "type": "RegexDef",
+                "file_path": rel_path,
+                "line_start": i + 1,
+                "line_end": end,
+                "signature": source_code[line_starts[i]:line_stop].strip(),
+                "content": source_code[line_starts[i]:content_stop]
+            })
         return symbols
+
+
+# Parser milik worker process (diinisialisasi sekali per proses oleh Pool)
+_worker_parser: Optional[SymbolParser] = None
+
+def _init_parse_worker():
+    global _worker_parser
+    _worker_parser = SymbolParser()
+
+def _parse_job_in_worker(job: tuple):
+    return _read_and_parse(_worker_parser, job)
+
+def _parse_pool_context():
+    """Konteks multiprocessing untuk worker parse: tidak pernah fork dari proses indexer.
+
+    Saat pool dibuat, thread embed/upsert pipeline (dan warm-up model embedding) sudah
+    berjalan; fork menyalin lock ONNX/SQLite yang sedang dipegang thread itu sehingga
+    worker bisa deadlock. forkserver mem-fork dari proses server yang bersih (modul ini
+    di-preload sekali di sana); spawn dipakai jika forkserver tidak tersedia.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+def _read_and_parse(parser: SymbolParser, job: tuple):
+    """Membaca satu file, menghitung hash, lalu mem-parse jika kontennya berubah.
+
+    Mengembalikan (rel_path, (size, mtime), content_hash, symbols). `symbols`
+    bernilai None jika hash sama dengan `known_hash`; `content_hash` None jika
+    file gagal dibaca.
+    """
+    file_path, rel_path, ext, known_hash = job
+    try:
+        with open(file_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            raw = f.read()
+    except OSError as e:
+        logger.error(f"Error reading {rel_path}: {e}")
+        return rel_path, None, None, None
+
+    content_hash = hashlib.sha1(raw).hexdigest()
+    if content_hash == known_hash:
+        return rel_path, (st.st_size, st.st_mtime), content_hash, None
+    if looks_generated(raw):
+        # Tetap dicatat di manifest agar tidak dibaca ulang selama kontennya sama
+        logger.debug(f"Skipping generated/minified file {rel_path}")
+        return rel_path, (st.st_size, st.st_mtime), content_hash, []
+
+    try:
+        symbols = parser.parse(raw.decode('utf-8', errors='ignore'), rel_path, ext)
+    except Exception as e:
+        logger.error(f"Error indexing {rel_path}: {e}")
+        symbols = []
+    return rel_path, (st.st_size, st.st_mtime), content_hash, symbols
+
+
+class ProjectIndexer:
+    def __init__(self, project_path: str, vector_store: Optional["VectorStore"] = None, workers: Optional[int] = None):
+        self.project_path = Path(project_path)
+        init_db()
+        if vector_store is None:
+            from src.memory.vector_store import VectorStore
+            vector_store = VectorStore()
+        self.vector_store = vector_store
+        self.symbol_parser = SymbolParser()
+        self.file_enumerator = FileEnumerator(project_path)
+        self.workers = workers if workers is not None else (settings.INDEX_WORKERS or os.cpu_count() or 1)
+        self.last_pipeline_stats: Optional[Dict[str, Any]] = None
+
+    def scan_project(self, full: bool = False, verbose: bool = True) -> Dict[str, int]:
+        """Memindai proyek secara inkremental berdasarkan manifest file.
+
+        Hanya file baru/berubah yang di-parse dan di-embed; file yang hilang
+        dihapus dari vector store dan tabel CodeSymbol. Rebuild total dilakukan
+        jika `full=True` atau koleksi vektor masih kosong.
+        """
+        project = self.vector_store.project_hash
+        if full or self.vector_store.count_points() == 0:
+            if verbose: console.print("[bold yellow]🧹 Cleaning old semantic memory...[/bold yellow]")
+            self.vector_store.clear_all()
+            clear_project(project)
+            manifest = {}
+        else:
+            manifest = load_manifest(project)
+
+        if verbose: console.print(f"\n[bold cyan]🔍 Indexing project:[/bold cyan] [dim]{self.project_path}[/dim]")
+
+        stats = {"added": 0, "changed": 0, "skipped": 0, "removed": 0, "symbols": 0}
+        seen = set()
+        jobs = []
+
+        for file_path, ext, st in self._iter_source_files():
+            rel_path = os.path.relpath(file_path, self.project_path)
+            seen.add(rel_path)
+            job = self._make_job(file_path, rel_path, ext, manifest.get(rel_path), st)
+            if job is None:
+                stats["skipped"] += 1
+            elif job is not False:
+                jobs.append(job)
+
+        self._run_jobs(project, jobs, manifest, stats)
+        self._remove_files(project, [path for path in manifest if path not in seen], stats)
+
+        gc.collect()
+        if verbose:
+            console.print(
+                f"[bold green]✅ Success! Indexed {stats['symbols']} symbols "
+                f"(+{stats['added']} added, ~{stats['changed']} changed, "
+                f"={stats['skipped']} skipped, -{stats['removed']} removed).[/bold green]"
+            )
+            if jobs and self.last_pipeline_stats:
+                stages = self.last_pipeline_stats["stages"]
+                console.print(
+                    f"[dim]Pipeline {self.last_pipeline_stats['wall_sec']}s: "
+                    + ", ".join(f"{name} {s['items_per_sec']}/s (queue max {s['max_queue']})" for name, s in stages.items())
+                    + f" — bottleneck: {self.last_pipeline_stats['bottleneck']}[/dim]"
+                )
+        cache = self.vector_store.embedding_cache
+        logger.info(f"Scan finished: {stats}" + (f", embedding cache: {cache.stats()}" if cache else ""))
+        return stats
+
+    def reindex_files(self, rel_paths: Iterable[str]) -> Dict[str, int]:
+        """Re-index sebagian file saja (dipakai oleh watcher).
+
+        File yang sudah tidak ada dihapus dari index; file yang tidak didukung
+        atau berada di direktori yang diabaikan dilewati.
+        """
+        project = self.vector_store.project_hash
+        rel_paths = [p for p in set(rel_paths) if self.is_indexable(p)]
+        manifest = load_manifest(project, rel_paths)
+
+        stats = {"added": 0, "changed": 0, "skipped": 0, "removed": 0, "symbols": 0}
+        jobs = []
+        removed = []
+        for rel_path in rel_paths:
+            file_path = os.path.join(self.project_path, rel_path)
+            if not os.path.isfile(file_path):
+                if rel_path in manifest:
+                    removed.append(rel_path)
+                continue
+            job = self._make_job(file_path, rel_path, os.path.splitext(rel_path)[1], manifest.get(rel_path))
+            if job is None:
+                stats["skipped"] += 1
+            elif job is not False:
+                jobs.append(job)
+
+        self._run_jobs(project, jobs, manifest, stats)
+        self._remove_files(project, removed, stats)
+        return stats
+
+    def is_ignored_dir(self, rel_dir: str) -> bool:
+        return self.file_enumerator.is_ignored_dir(rel_dir)
+
+    def is_indexable(self, rel_path: str) -> bool:
+        """Apakah path relatif termasuk file yang seharusnya diindeks."""
+        return self.file_enumerator.is_indexable(rel_path)
+
+    def _iter_source_files(self):
+        """Menghasilkan (path absolut, ekstensi, stat) untuk setiap file yang layak diindeks."""
+        return self.file_enumerator.iter_files()
+
+    def _make_job(self, file_path: str, rel_path: str, ext: str, entry: Optional[FileManifest], st: Optional[os.stat_result] = None):
+        """Membuat job parse untuk satu file; None jika tidak berubah, False jika gagal stat."""
+        try:
+            st = st or os.stat(file_path)
+        except OSError as e:
+            logger.error(f"Stat error {rel_path}: {e}")
+            return False
+
+        if entry and entry.size == st.st_size and entry.mtime == st.st_mtime:
+            return None
+        return (file_path, rel_path, ext, entry.content_hash if entry else None)
+
+    def _run_jobs(self, project: str, jobs: List[tuple], manifest: Dict[str, FileManifest], stats: Dict[str, int]):
+        manifest_updates = []
+        # Parse (di sini/process pool) -> embed -> upsert berjalan bersamaan lewat antrean terbatas
+        pipeline = IndexPipeline(self.vector_store)
+        pipeline.start()
+        # Backup SQL ditulis per batch (satu transaksi), bukan per simbol
+        sql_replaced, sql_symbols = [], []
+
+        try:
+            parse_start = time.perf_counter()
+            for rel_path, st, content_hash, found_symbols in self._parse_jobs(jobs):
+                pipeline.record_parse(1, time.perf_counter() - parse_start)
+                if content_hash is None:
+                    parse_start = time.perf_counter()
+                    continue  # Gagal dibaca, sudah dicatat oleh worker
+                manifest_updates.append(FileManifest(
+                    project=project, path=rel_path, size=st[0],
+                    mtime=st[1], content_hash=content_hash
+                ))
+                if found_symbols is None:
+                    # Hanya mtime yang berubah (mis. touch/checkout), konten sama
+                    stats["skipped"] += 1
+                    parse_start = time.perf_counter()
+                    continue
+
+                # Baris SQL/FTS lama selalu dihapus dulu: file tanpa entri manifest bisa saja sudah
+                # pernah disisipkan (batch embed gagal atau scan terputus sebelum manifest disimpan)
+                sql_replaced.append(rel_path)
+                if rel_path in manifest:
+                    # Point lama dihapus oleh tahap upsert tepat sebelum batch berikutnya
+                    pipeline.mark_stale(rel_path)
+                    stats["changed"] += 1
+                else:
+                    stats["added"] += 1
+
+                sql_symbols.extend(found_symbols)
+                if len(sql_symbols) >= settings.SQL_BATCH_SIZE:
+                    self._flush_sql(project, sql_replaced, sql_symbols)
+                    sql_replaced, sql_symbols = [], []
+
+                if found_symbols:
+                    stats["symbols"] += len(found_symbols)
+                    if self.vector_store.model:
+                        pipeline.submit(found_symbols)
+                parse_start = time.perf_counter()
+        finally:
+            self.last_pipeline_stats = pipeline.close()
+
+        self._flush_sql(project, sql_replaced, sql_symbols)
+        if pipeline.failed:
+            # Tanpa entri manifest baru, file ini dianggap berubah dan di-index ulang pada scan berikutnya
+            logger.warning(f"{len(pipeline.failed)} file(s) not fully indexed, will retry: {sorted(pipeline.failed)[:10]}")
+            manifest_updates = [m for m in manifest_updates if m.path not in pipeline.failed]
+        save_manifest(manifest_updates)
+        if jobs:
+            logger.info(f"Index pipeline: {self.last_pipeline_stats}")
+
+    def _remove_files(self, project: str, removed: List[str], stats: Dict[str, int]):
+        """Menghapus jejak file yang sudah hilang dari vector store dan SQL."""
+        self.vector_store.delete_files(removed)
+        self._flush_sql(project, removed, [])
+        delete_manifest(project, removed)
+        stats["removed"] += len(removed)
+
+    def _flush_sql(self, project: str, replaced_paths: List[str], symbols: List[Dict[str, Any]]):
+        try:
+            replace_symbols(project, replaced_paths, symbols)
+        except Exception as e:
+            logger.error(f"SQL Save Error: {e}")
+
+    def _parse_jobs(self, jobs: List[tuple]):
+        """Membaca dan mem-parse file, paralel via process pool jika berkas cukup banyak.
+
+        Hasil di-yield segera setelah selesai (tidak berurutan) supaya embedding
+        dan penyimpanan bisa berjalan sambil worker lain masih mem-parse.
+        """
+        if self.workers <= 1 or len(jobs) < settings.INDEX_PARALLEL_MIN_FILES:
+            for job in jobs:
+                yield _read_and_parse(self.symbol_parser, job)
+            return
+
+        workers = min(self.workers, len(jobs))
+        logger.info(f"Parsing {len(jobs)} files with {workers} worker processes")
+        with _parse_pool_context().Pool(processes=workers, initializer=_init_parse_worker) as pool:
+            yield from pool.imap_unordered(_parse_job_in_worker, jobs, chunksize=8)
@@ -1,27 +1,235 @@
+import re
+import uuid
 from sqlmodel import SQLModel, Field, create_engine, Session, select
-from typing import Optional, List
+from sqlalchemy import delete, event, func, insert, inspect, text
+from sqlalchemy.engine import Engine
+from typing import Optional, List, Dict, Any, Iterable
 from src.core.config import settings
 
+# Namespace UUID5 untuk ID simbol (ID point vektor sekaligus kunci konten di SQL)
+SYMBOL_ID_NAMESPACE = uuid.UUID("6f1c2a52-6c1e-4f0e-9a57-0c0de4a20000")
+
+def symbol_id(project: str, symbol: Dict[str, Any]) -> str:
+    """ID point deterministik dari proyek, path file, nama simbol, dan rentang baris.
+
+    Upsert ulang simbol yang sama menimpa point lama alih-alih menduplikasinya.
+    """
+    key = f"{project}\0{symbol['file_path']}\0{symbol['name']}\0{symbol['line_start']}-{symbol['line_end']}"
+    return str(uuid.uuid5(SYMBOL_ID_NAMESPACE, key))
+
 class CodeSymbol(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    project: str = Field(default="", index=True)
+    # Sama dengan ID point vektor: payload vektor tidak menyimpan konten, konten diambil dari sini
+    symbol_id: str = Field(default="", index=True)
     name: str = Field(index=True)
     type: str  # Class, Function, Variable
-    file_path: str
+    file_path: str = Field(index=True)
     line_start: int
     line_end: int
     signature: str
     content: str  # Bagian kode terkait
 
-engine = create_engine(f"sqlite:///{settings.DB_PATH}")
+class FileManifest(SQLModel, table=True):
+    """Jejak file yang sudah diindeks (dipakai untuk re-index inkremental)."""
+    project: str = Field(primary_key=True)
+    path: str = Field(primary_key=True)
+    size: int
+    mtime: float
+    content_hash: str
+
+class CachedEmbedding(SQLModel, table=True):
+    """Embedding yang sudah dihitung, dikunci hash(model + teks); dipakai lintas proyek."""
+    key: str = Field(primary_key=True)
+    vector: bytes  # float32 mentah
+    created_at: float = Field(index=True)
+
+# Batas aman jumlah parameter per statement SQLite (SQLITE_MAX_VARIABLE_NUMBER lama = 999)
+_SQL_CHUNK = 500
+
+def _set_sqlite_pragmas(dbapi_connection, _record):
+    """WAL + synchronous=NORMAL: commit tidak lagi fsync penuh setiap transaksi."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")  # ~16MB page cache
+    cursor.close()
+
+def create_db_engine(db_path) -> Engine:
+    """Engine SQLite dengan pragma standar; dipakai untuk DB utama dan DB sementara (tes)."""
+    db_engine = create_engine(f"sqlite:///{db_path}")
+    event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+engine = create_db_engine(settings.DB_PATH)
+
+# Index leksikal FTS5 (BM25) atas nama, signature, dan konten simbol; disinkronkan oleh trigger
+_FTS_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS codesymbol_fts USING fts5("
+    "name, signature, content, content='codesymbol', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS codesymbol_fts_ai AFTER INSERT ON codesymbol BEGIN "
+    "INSERT INTO codesymbol_fts(rowid, name, signature, content) VALUES (new.id, new.name, new.signature, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS codesymbol_fts_ad AFTER DELETE ON codesymbol BEGIN "
+    "INSERT INTO codesymbol_fts(codesymbol_fts, rowid, name, signature, content) "
+    "VALUES ('delete', old.id, old.name, old.signature, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS codesymbol_fts_au AFTER UPDATE ON codesymbol BEGIN "
+    "INSERT INTO codesymbol_fts(codesymbol_fts, rowid, name, signature, content) "
+    "VALUES ('delete', old.id, old.name, old.signature, old.content); "
+    "INSERT INTO codesymbol_fts(rowid, name, signature, content) VALUES (new.id, new.name, new.signature, new.content); END",
+]
+# Bobot BM25 per kolom (name, signature, content): kecocokan nama paling berarti
+_BM25_WEIGHTS = "10.0, 5.0, 1.0"
+# Query panjang (mis. output shell) dipotong agar MATCH tetap murah
+_LEXICAL_MAX_TERMS = 32
+_SYMBOL_FIELDS = ("symbol_id", "name", "type", "file_path", "line_start", "line_end", "signature")
 
 def init_db():
     SQLModel.metadata.create_all(engine)
+    _migrate_columns()
+    _migrate_fts()
+
+def _migrate_columns():
+    """Menambahkan kolom baru ke tabel lama (create_all tidak melakukan ALTER)."""
+    columns = {c["name"] for c in inspect(engine).get_columns("codesymbol")}
+    with engine.begin() as conn:
+        if "project" not in columns:
+            conn.execute(text("ALTER TABLE codesymbol ADD COLUMN project VARCHAR NOT NULL DEFAULT ''"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_codesymbol_project ON codesymbol (project)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_codesymbol_file_path ON codesymbol (file_path)"))
+        if "symbol_id" not in columns:
+            conn.execute(text("ALTER TABLE codesymbol ADD COLUMN symbol_id VARCHAR NOT NULL DEFAULT ''"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_codesymbol_symbol_id ON codesymbol (symbol_id)"))
+            rows = conn.execute(text("SELECT id, project, file_path, name, line_start, line_end FROM codesymbol")).all()
+            if rows:
+                conn.execute(text("UPDATE codesymbol SET symbol_id = :sid WHERE id = :id"), [
+                    {"id": row.id, "sid": symbol_id(row.project, row._mapping)} for row in rows
+                ])
+
+def _migrate_fts():
+    """Membuat index FTS5 + trigger; index diisi ulang sekali jika tabelnya baru dibuat."""
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='codesymbol_fts'"
+        )).first()
+        for statement in _FTS_SCHEMA:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text("INSERT INTO codesymbol_fts(codesymbol_fts) VALUES ('rebuild')"))
 
 def save_symbol(symbol: CodeSymbol):
     with Session(engine) as session:
         session.add(symbol)
         session.commit()
 
+def save_symbols(project: str, symbols: List[Dict[str, Any]]):
+    """Menyimpan banyak simbol sekaligus dalam satu transaksi."""
+    replace_symbols(project, [], symbols)
+
+def delete_symbols_for_file(project: str, file_path: str):
+    """Menghapus semua simbol milik satu file pada proyek tertentu."""
+    delete_symbols_for_files(project, [file_path])
+
+def delete_symbols_for_files(project: str, file_paths: Iterable[str]):
+    """Menghapus simbol milik banyak file sekaligus dalam satu transaksi."""
+    replace_symbols(project, file_paths, [])
+
+def replace_symbols(project: str, file_paths: Iterable[str], symbols: List[Dict[str, Any]]):
+    """Dalam satu transaksi: hapus simbol lama milik `file_paths`, lalu sisipkan `symbols`."""
+    file_paths = list(file_paths)
+    if not file_paths and not symbols: return
+    with Session(engine) as session:
+        for i in range(0, len(file_paths), _SQL_CHUNK):
+            session.execute(delete(CodeSymbol).where(
+                (CodeSymbol.project == project) & (CodeSymbol.file_path.in_(file_paths[i:i + _SQL_CHUNK]))
+            ))
+        if symbols:
+            session.execute(insert(CodeSymbol), [
+                {**s, "project": project, "symbol_id": symbol_id(project, s)} for s in symbols
+            ])
+        session.commit()
+
+def load_manifest(project: str, paths: Optional[Iterable[str]] = None) -> Dict[str, FileManifest]:
+    """Memuat manifest file proyek sebagai dict {path: FileManifest}."""
+    with Session(engine) as session:
+        statement = select(FileManifest).where(FileManifest.project == project)
+        if paths is None:
+            return {row.path: row for row in session.exec(statement).all()}
+        paths = list(paths)
+        manifest = {}
+        for i in range(0, len(paths), _SQL_CHUNK):
+            chunk = statement.where(FileManifest.path.in_(paths[i:i + _SQL_CHUNK]))
+            manifest.update({row.path: row for row in session.exec(chunk).all()})
+        return manifest
+
+def save_manifest(entries: Iterable[FileManifest]):
+    with Session(engine) as session:
+        for entry in entries:
+            session.merge(entry)
+        session.commit()
+
+def insert_manifest(entries: List[Dict[str, Any]]):
+    """Sisip massal baris manifest baru (tanpa SELECT per baris seperti `save_manifest`)."""
+    if not entries: return
+    with Session(engine) as session:
+        session.execute(insert(FileManifest).prefix_with("OR REPLACE"), entries)
+        session.commit()
+
+def load_project_symbols(project: str) -> List[Dict[str, Any]]:
+    """Seluruh simbol satu proyek (tanpa kolom internal id/project/symbol_id)."""
+    fields = _SYMBOL_FIELDS[1:] + ("content",)
+    with Session(engine) as session:
+        statement = select(*[getattr(CodeSymbol, f) for f in fields]).where(CodeSymbol.project == project)
+        return [dict(row._mapping) for row in session.execute(statement).all()]
+
+def delete_manifest(project: str, paths: Iterable[str]):
+    paths = list(paths)
+    if not paths: return
+    with Session(engine) as session:
+        for i in range(0, len(paths), _SQL_CHUNK):
+            session.execute(delete(FileManifest).where(
+                (FileManifest.project == project) & (FileManifest.path.in_(paths[i:i + _SQL_CHUNK]))
+            ))
+        session.commit()
+
+def clear_project(project: str):
+    """Menghapus seluruh simbol dan manifest satu proyek (untuk rebuild total)."""
+    with Session(engine) as session:
+        session.execute(delete(CodeSymbol).where(CodeSymbol.project == project))
+        session.execute(delete(FileManifest).where(FileManifest.project == project))
+        session.commit()
+
+def load_embeddings(keys: List[str]) -> Dict[str, bytes]:
+    """Mengambil embedding tersimpan untuk `keys` sebagai dict {key: bytes}."""
+    found = {}
+    with Session(engine) as session:
+        for i in range(0, len(keys), _SQL_CHUNK):
+            statement = select(CachedEmbedding.key, CachedEmbedding.vector).where(
+                CachedEmbedding.key.in_(keys[i:i + _SQL_CHUNK])
+            )
+            found.update({key: vector for key, vector in session.exec(statement).all()})
+    return found
+
+def save_embeddings(rows: List[Dict[str, Any]]):
+    """Menyimpan banyak embedding dalam satu transaksi (key yang sudah ada diabaikan)."""
+    if not rows: return
+    with Session(engine) as session:
+        session.execute(insert(CachedEmbedding).prefix_with("OR IGNORE"), rows)
+        session.commit()
+
+def prune_embeddings(max_rows: int) -> int:
+    """Membuang embedding tertua jika cache melebihi `max_rows`."""
+    with Session(engine) as session:
+        total = session.execute(text("SELECT COUNT(*) FROM cachedembedding")).scalar()
+        excess = total - max_rows
+        if excess <= 0: return 0
+        session.execute(text(
+            "DELETE FROM cachedembedding WHERE key IN "
+            "(SELECT key FROM cachedembedding ORDER BY created_at LIMIT :n)"
+        ), {"n": excess})
+        session.commit()
+        return excess
+
 def search_symbols(query: str, limit: int = 5) -> List[CodeSymbol]:
     """Mencari simbol kode yang relevan berdasarkan nama atau konten."""
     with Session(engine) as session:
@@ -33,3 +241,59 @@ def search_symbols(query: str, limit: int = 5) -> List[CodeSymbol]:
         ).limit(limit)
         results = session.exec(statement).all()
         return list(results)
+
+def _symbol_fields(with_content: bool) -> tuple:
+    return _SYMBOL_FIELDS + ("content",) if with_content else _SYMBOL_FIELDS
+
+def load_contents(symbol_ids: Iterable[str]) -> Dict[str, str]:
+    """Mengambil konten simbol sebagai dict {symbol_id: content} (satu query per chunk)."""
+    symbol_ids = list(dict.fromkeys(symbol_ids))
+    found = {}
+    # Koneksi langsung (tanpa Session ORM): dipanggil di jalur setiap pencarian
+    with engine.connect() as conn:
+        for i in range(0, len(symbol_ids), _SQL_CHUNK):
+            chunk = symbol_ids[i:i + _SQL_CHUNK]
+            rows = conn.exec_driver_sql(
+                f"SELECT symbol_id, content FROM codesymbol WHERE symbol_id IN ({', '.join('?' * len(chunk))})",
+                tuple(chunk),
+            )
+            found.update(dict(rows.all()))
+    return found
+
+def hydrate_content(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Melengkapi hasil pencarian dengan konten dari SQL; dict asli tidak diubah.
+
+    Hasil yang sudah membawa konten (mis. payload index lama) dibiarkan apa adanya.
+    """
+    missing = [r["symbol_id"] for r in results if "content" not in r and r.get("symbol_id")]
+    if not missing:
+        return results
+    contents = load_contents(missing)
+    return [r if "content" in r else {**r, "content": contents.get(r.get("symbol_id"), "")} for r in results]
+
+def lexical_search(project: str, query: str, limit: int = 20, with_content: bool = True) -> List[Dict[str, Any]]:
+    """Pencarian BM25 (FTS5) atas nama, signature, dan konten simbol satu proyek."""
+    terms = list(dict.fromkeys(re.findall(r"\w+", query)))[:_LEXICAL_MAX_TERMS]
+    if not terms: return []
+    match = " OR ".join(f'"{term}"' for term in terms)
+    columns = ", ".join(f"s.{field}" for field in _symbol_fields(with_content))
+    with Session(engine) as session:
+        rows = session.execute(text(
+            f"SELECT {columns} FROM codesymbol_fts f JOIN codesymbol s ON s.id = f.rowid "
+            f"WHERE codesymbol_fts MATCH :match AND s.project = :project "
+            f"ORDER BY bm25(codesymbol_fts, {_BM25_WEIGHTS}) LIMIT :limit"
+        ), {"match": match, "project": project, "limit": limit})
+        return [dict(row._mapping) for row in rows]
+
+def find_symbols_by_name(project: str, name: str, limit: int = 5, with_content: bool = True) -> List[Dict[str, Any]]:
+    """Lookup nama simbol persis (memakai index `name`), fallback tanpa membedakan huruf besar."""
+    with Session(engine) as session:
+        columns = [getattr(CodeSymbol, field) for field in _symbol_fields(with_content)]
+        statement = select(*columns).where((CodeSymbol.project == project) & (CodeSymbol.name == name)).limit(limit)
+        rows = session.execute(statement).all()
+        if not rows:
+            statement = select(*columns).where(
+                (CodeSymbol.project == project) & (func.lower(CodeSymbol.name) == name.lower())
+            ).limit(limit)
+            rows = session.execute(statement).all()
+        return [dict(row._mapping) for row in rows]
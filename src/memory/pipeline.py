@@ -0,0 +1,152 @@
+import time
+import queue
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set
+from src.core.config import settings
+
+logger = logging.getLogger("IndexPipeline")
+
+_DONE = object()
+
+
+class StageStats:
+    """Throughput dan kedalaman antrean satu tahap pipeline."""
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy_sec = 0.0
+        self.max_queue = 0
+        self._queue_samples = 0
+        self._queue_total = 0
+
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.batches += 1
+        self.busy_sec += seconds
+
+    def sample_queue(self, depth: int):
+        self.max_queue = max(self.max_queue, depth)
+        self._queue_samples += 1
+        self._queue_total += depth
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_sec": round(self.busy_sec, 3),
+            "items_per_sec": round(self.items / self.busy_sec, 1) if self.busy_sec else 0.0,
+            "avg_queue": round(self._queue_total / self._queue_samples, 2) if self._queue_samples else 0.0,
+            "max_queue": self.max_queue,
+        }
+
+
+class IndexPipeline:
+    """
+    Responsibility: Menjalankan parse -> embed -> upsert secara bersamaan.
+    Parse berjalan di thread pemanggil (atau process pool-nya), embed dan upsert
+    masing-masing di thread sendiri, dihubungkan antrean terbatas sehingga tahap
+    yang lebih cepat otomatis tertahan (backpressure) oleh tahap yang paling lambat.
+    File yang batch-nya gagal di-embed/upsert dicatat di `failed` agar tidak masuk manifest.
+    """
+    def __init__(self, vector_store, batch_size: Optional[int] = None, queue_size: Optional[int] = None):
+        self.vector_store = vector_store
+        self.batch_size = batch_size or settings.INDEX_EMBED_BATCH
+        queue_size = queue_size or settings.INDEX_QUEUE_SIZE
+        self.embed_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.upsert_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.stages = {name: StageStats(name) for name in ("parse", "embed", "upsert")}
+        self._pending: List[Dict[str, Any]] = []
+        self._stale: List[str] = []
+        # Path file yang point-nya tidak lengkap tersimpan; diisi thread worker, dibaca setelah close()
+        self.failed: Set[str] = set()
+        self._threads: List[threading.Thread] = []
+        self._started_at = 0.0
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        for target in (self._embed_worker, self._upsert_worker):
+            t = threading.Thread(target=target, name=f"aron-index{target.__name__}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def record_parse(self, files: int, seconds: float):
+        self.stages["parse"].record(files, seconds)
+
+    def mark_stale(self, file_path: str):
+        """Point lama milik file ini dihapus sebelum batch berikutnya di-upsert."""
+        self._stale.append(file_path)
+
+    def submit(self, symbols: List[Dict[str, Any]]):
+        self._pending.extend(symbols)
+        while len(self._pending) >= self.batch_size:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            self._put(self.embed_queue, (self._take_stale(), batch), "embed")
+
+    def close(self) -> Dict[str, Any]:
+        """Flush sisa batch, tunggu semua tahap selesai, lalu kembalikan metrik."""
+        if self._pending or self._stale:
+            self._put(self.embed_queue, (self._take_stale(), self._pending), "embed")
+            self._pending = []
+        self.embed_queue.put(_DONE)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        return self.metrics()
+
+    def metrics(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self._started_at if self._started_at else 0.0
+        stages = {name: stage.summary() for name, stage in self.stages.items()}
+        # Tahap dengan waktu sibuk terbesar membatasi throughput keseluruhan
+        bottleneck = max(stages, key=lambda name: stages[name]["busy_sec"])
+        return {"wall_sec": round(wall, 3), "bottleneck": bottleneck, "stages": stages,
+                "failed_files": len(self.failed)}
+
+    def _take_stale(self) -> List[str]:
+        stale, self._stale = self._stale, []
+        return stale
+
+    def _put(self, q: queue.Queue, item, stage: str):
+        q.put(item)
+        self.stages[stage].sample_queue(q.qsize())
+
+    def _embed_worker(self):
+        while True:
+            item = self.embed_queue.get()
+            if item is _DONE:
+                self.upsert_queue.put(_DONE)
+                return
+            stale, batch = item
+            embeddings = []
+            if batch:
+                start = time.perf_counter()
+                try:
+                    embeddings = self.vector_store.embed_symbols(batch)
+                except Exception as e:
+                    logger.error(f"Embedding error: {e}")
+                    # Point lama file-file ini dibiarkan utuh; scan berikutnya mencoba lagi
+                    self.failed.update(s["file_path"] for s in batch)
+                    self.failed.update(stale)
+                    self.stages["embed"].record(0, time.perf_counter() - start)
+                    continue
+                self.stages["embed"].record(len(batch), time.perf_counter() - start)
+            self._put(self.upsert_queue, (stale, batch, embeddings), "upsert")
+
+    def _upsert_worker(self):
+        while True:
+            item = self.upsert_queue.get()
+            if item is _DONE:
+                return
+            stale, batch, embeddings = item
+            start = time.perf_counter()
+            try:
+                # Urutan penting: hapus point lama dulu, baru upsert point baru file yang sama
+                self.vector_store.delete_files(stale)
+                if batch:
+                    self.vector_store.upsert_embedded(batch, embeddings)
+            except Exception as e:
+                logger.error(f"Upsert error: {e}")
+                self.failed.update(s["file_path"] for s in batch)
+                self.failed.update(stale)
+            self.stages["upsert"].record(len(batch), time.perf_counter() - start)
@@ -0,0 +1,167 @@
+import io
+import json
+import time
+import logging
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+import numpy as np
+from src.memory.models import (
+    init_db, clear_project, replace_symbols, insert_manifest, load_manifest,
+    load_project_symbols, symbol_id
+)
+from src.memory.vector_backends import EMBEDDING_DIM
+from src.core.config import settings
+
+logger = logging.getLogger("IndexSnapshot")
+
+SNAPSHOT_FORMAT = "aron-index"
+SNAPSHOT_VERSION = 1
+_BATCH = 1000
+
+
+def _jsonl(rows: Iterator[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+
+
+def export_index(vector_store, archive_path: str) -> Dict[str, Any]:
+    """
+    Mengemas index proyek aktif ke satu arsip zip berversi:
+      meta.json      format, versi, model embedding, jumlah baris
+      vectors.npy    matriks vektor float16 (n x dim), urutan sama dengan points.jsonl
+      points.jsonl   payload point (ID dihitung ulang saat impor)
+      symbols.jsonl  baris CodeSymbol (sumber konten + index BM25)
+      files.jsonl    manifest file (path, ukuran, mtime, hash konten)
+    Path di dalam arsip relatif terhadap root proyek, jadi arsip bisa dipakai di mesin lain.
+    """
+    init_db()
+    project = vector_store.project_hash
+    vectors, payloads = [], []
+    for batch in vector_store.iter_points(_BATCH):
+        # float16 cukup untuk cosine top-k dan memangkas separuh ukuran arsip
+        vectors.append(np.asarray([v for _, v, _ in batch], dtype=np.float16))
+        payloads.extend(payload for _, _, payload in batch)
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, EMBEDDING_DIM), dtype=np.float16)
+    symbols = load_project_symbols(project)
+    files = [
+        {"path": m.path, "size": m.size, "mtime": m.mtime, "content_hash": m.content_hash}
+        for m in load_manifest(project).values()
+    ]
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "app_version": settings.VERSION,
+        "embedding_model": settings.EMBEDDING_MODEL,
+        "dim": int(matrix.shape[1]),
+        "created_at": time.time(),
+        "points": len(payloads),
+        "symbols": len(symbols),
+        "files": len(files),
+    }
+
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    archive_path = Path(archive_path)
+    tmp_path = archive_path.with_name(archive_path.name + ".tmp")
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("meta.json", json.dumps(meta, indent=2))
+        zf.writestr("vectors.npy", buffer.getvalue())
+        zf.writestr("points.jsonl", _jsonl(payloads))
+        zf.writestr("symbols.jsonl", _jsonl(symbols))
+        zf.writestr("files.jsonl", _jsonl(files))
+    tmp_path.replace(archive_path)
+    meta["bytes"] = archive_path.stat().st_size
+    logger.info(f"Index exported to {archive_path}: {meta}")
+    return meta
+
+
+def _read_meta(zf: zipfile.ZipFile) -> Dict[str, Any]:
+    try:
+        meta = json.loads(zf.read("meta.json"))
+    except (KeyError, ValueError):
+        raise ValueError("Bukan arsip index Aron (meta.json tidak ada/rusak).")
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Format arsip tidak dikenal: {meta.get('format')}")
+    if meta.get("version", 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"Arsip versi {meta['version']} lebih baru dari yang didukung ({SNAPSHOT_VERSION}); perbarui Aron.")
+    if meta.get("embedding_model") != settings.EMBEDDING_MODEL or meta.get("dim") != EMBEDDING_DIM:
+        raise ValueError(
+            f"Arsip dibuat dengan model embedding {meta.get('embedding_model')} ({meta.get('dim')} dim), "
+            f"bukan {settings.EMBEDDING_MODEL}."
+        )
+    return meta
+
+
+def _lines(zf: zipfile.ZipFile, name: str) -> Iterator[Dict[str, Any]]:
+    with zf.open(name) as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _validate(zf: zipfile.ZipFile, meta: Dict[str, Any]) -> np.ndarray:
+    """Membaca vektor dan memeriksa setiap member terhadap meta.json sebelum index lama dihapus."""
+    try:
+        matrix = np.load(io.BytesIO(zf.read("vectors.npy")))
+        if matrix.ndim != 2 or len(matrix) != meta["points"]:
+            raise ValueError("Arsip rusak: jumlah vektor tidak sama dengan jumlah point.")
+        for name, key in (("points.jsonl", "points"), ("symbols.jsonl", "symbols"), ("files.jsonl", "files")):
+            try:
+                count = sum(1 for _ in _lines(zf, name))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Arsip rusak: {name} bukan JSON lines yang valid ({e}).")
+            if count != meta.get(key):
+                raise ValueError(f"Arsip rusak: {name} berisi {count} baris, meta.json mencatat {meta.get(key)}.")
+    except KeyError as e:
+        raise ValueError(f"Arsip rusak: {e.args[0]}")
+    except (zipfile.BadZipFile, EOFError) as e:
+        raise ValueError(f"Arsip rusak: {e}")
+    return matrix
+
+
+def _batches(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_index(vector_store, archive_path: str) -> Dict[str, Any]:
+    """
+    Mengganti index proyek aktif dengan isi arsip (bulk load, tanpa embedding).
+    ID point dihitung ulang untuk proyek ini, sehingga arsip dari path lain tetap cocok.
+    Scan inkremental sesudahnya hanya mem-parse file yang hash kontennya berbeda:
+    mtime di mesin ini tidak sama, tetapi hash yang tercatat di manifest cocok.
+    """
+    init_db()
+    project = vector_store.project_hash
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except zipfile.BadZipFile:
+        raise ValueError(f"{archive_path} bukan arsip zip index Aron.")
+    with archive as zf:
+        meta = _read_meta(zf)
+        # Semua member dibaca & dicek dulu: arsip rusak tidak boleh menghapus index yang ada
+        matrix = _validate(zf, meta)
+
+        vector_store.clear_all()
+        clear_project(project)
+
+        row = 0
+        for payloads in _batches(_lines(zf, "points.jsonl"), _BATCH):
+            points = []
+            for payload, vector in zip(payloads, matrix[row:row + len(payloads)]):
+                sid = symbol_id(project, payload)
+                points.append((sid, vector.astype(np.float32).tolist(), {**payload, "symbol_id": sid}))
+            vector_store.upsert_points(points)
+            row += len(payloads)
+        for symbols in _batches(_lines(zf, "symbols.jsonl"), settings.SQL_BATCH_SIZE):
+            replace_symbols(project, [], symbols)
+        for files in _batches(_lines(zf, "files.jsonl"), settings.SQL_BATCH_SIZE):
+            insert_manifest([{**f, "project": project} for f in files])
+
+    logger.info(f"Index imported from {archive_path}: {meta}")
+    return meta
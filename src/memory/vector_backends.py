@@ -0,0 +1,605 @@
+import gc
+import os
+import abc
+import fcntl
+import json
+import shutil
+import logging
+import warnings
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import numpy as np
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchAny, MatchValue,
+    FilterSelector, PayloadSchemaType, QueryRequest
+)
+
+logger = logging.getLogger("VectorBackend")
+
+EMBEDDING_DIM = 384
+# Field payload ber-index keyword: dipakai delete per file dan pencarian terbatas (scope)
+PAYLOAD_INDEXES = ("file_path", "dirs", "name", "language", "type")
+
+# Jumlah bit 1 per byte, untuk jarak Hamming kode biner
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# (id, vektor, payload)
+Point = Tuple[str, List[float], Dict[str, Any]]
+
+
+def _scope_items(path_prefix: Optional[str], language: Optional[str], symbol_type: Optional[str]) -> List[Tuple[str, str]]:
+    """Normalisasi scope pencarian menjadi pasangan (field payload, nilai keyword)."""
+    items = []
+    if path_prefix and path_prefix.strip("/"):
+        items.append(("dirs", path_prefix.replace(os.sep, "/").strip("/")))
+    if language:
+        items.append(("language", language))
+    if symbol_type:
+        items.append(("type", symbol_type))
+    return items
+
+
+def scope_filter(path_prefix: Optional[str] = None, language: Optional[str] = None,
+                 symbol_type: Optional[str] = None) -> Optional[Filter]:
+    """Filter keyword Qdrant untuk pencarian terbatas direktori / bahasa / tipe simbol."""
+    must = [FieldCondition(key=field, match=MatchValue(value=value))
+            for field, value in _scope_items(path_prefix, language, symbol_type)]
+    return Filter(must=must) if must else None
+
+
+class VectorBackend(abc.ABC):
+    """
+    Antarmuka penyimpanan vektor di balik VectorStore.
+    VectorStore menangani embedding, cache, dan lock; backend hanya menyimpan
+    point (id, vektor, payload) dan menjawab pencarian top-k per koleksi.
+    """
+    name = "base"
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+
+    @abc.abstractmethod
+    def init_collection(self):
+        ...
+
+    @abc.abstractmethod
+    def upsert(self, points: List[Point]):
+        ...
+
+    @abc.abstractmethod
+    def delete_files(self, file_paths: List[str]):
+        ...
+
+    @abc.abstractmethod
+    def search_batch(self, vectors: List[List[float]], limit: int, path_prefix: Optional[str] = None,
+                     language: Optional[str] = None, symbol_type: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        ...
+
+    @abc.abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abc.abstractmethod
+    def iter_points(self, batch_size: int = 1000) -> Iterator[List[Point]]:
+        """Seluruh point koleksi per batch (dipakai ekspor snapshot index)."""
+
+    @abc.abstractmethod
+    def clear(self):
+        ...
+
+    def close(self):
+        pass
+
+
+class QdrantBackend(VectorBackend):
+    """Backend Qdrant (mode lokal embedded atau server)."""
+    name = "qdrant"
+
+    def __init__(self, client, collection_name: str):
+        super().__init__(collection_name)
+        self.client = client
+
+    def init_collection(self):
+        collections = self.client.get_collections().collections
+        if any(c.name == self.collection_name for c in collections):
+            self._migrate_payload_schema()
+        else:
+            self._create_collection()
+        # Index payload keyword untuk delete/filter (diabaikan oleh mode lokal)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for field in PAYLOAD_INDEXES:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field,
+                    field_schema=PayloadSchemaType.KEYWORD
+                )
+
+    def _create_collection(self):
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=VectorParams(size=EMBEDDING_DIM, distance=Distance.COSINE),
+        )
+
+    def _migrate_payload_schema(self):
+        """Koleksi lama tanpa payload `dirs`/`language` dikosongkan agar scan berikutnya rebuild total."""
+        points, _ = self.client.scroll(collection_name=self.collection_name, limit=1, with_payload=True)
+        if points and "dirs" not in (points[0].payload or {}):
+            logger.info("Outdated payload schema, recreating collection for a full re-index.")
+            self.client.delete_collection(collection_name=self.collection_name)
+            self._create_collection()
+
+    def upsert(self, points: List[Point]):
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[PointStruct(id=pid, vector=vector, payload=payload) for pid, vector, payload in points]
+        )
+
+    def delete_files(self, file_paths: List[str]):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="file_path", match=MatchAny(any=list(file_paths)))
+            ]))
+        )
+
+    def search_batch(self, vectors, limit, path_prefix=None, language=None, symbol_type=None):
+        query_filter = scope_filter(path_prefix, language, symbol_type)
+        # Gunakan query_batch_points jika tersedia (qdrant-client >= 1.10)
+        # Fallback ke search per query jika gagal
+        try:
+            responses = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=[
+                    QueryRequest(query=qv, filter=query_filter, limit=limit, with_payload=True)
+                    for qv in vectors
+                ]
+            )
+            hits = [response.points for response in responses]
+        except AttributeError:
+            hits = [
+                self.client.search(
+                    collection_name=self.collection_name,
+                    query_vector=qv,
+                    query_filter=query_filter,
+                    limit=limit,
+                    with_payload=True
+                ) for qv in vectors
+            ]
+        return [[res.payload for res in points if res.payload] for points in hits]
+
+    def count(self) -> int:
+        return self.client.get_collection(self.collection_name).points_count
+
+    def iter_points(self, batch_size: int = 1000):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=True
+            )
+            if points:
+                yield [(str(p.id), list(p.vector), p.payload or {}) for p in points]
+            if offset is None:
+                break
+
+    def clear(self):
+        self.client.delete_collection(collection_name=self.collection_name)
+        self.init_collection()
+
+    def close(self):
+        self.client.close()
+
+
+class NumpyBackend(VectorBackend):
+    """
+    Backend NumPy murni: matriks vektor ter-normalisasi di file memory-mapped
+    (float32/float16) + tabel payload append-only (JSON lines), top-k exact lewat
+    perkalian matriks-vektor dan argpartition. Cold start cepat, tanpa server,
+    dan latensi terprediksi hingga ratusan ribu simbol.
+
+    Mode ringkas (`quantization` = "int8" / "binary"): scoring memakai kode
+    terkuantisasi (4x / 32x lebih kecil dari float32), lalu kandidat teratas
+    opsional di-rescore dengan vektor presisi penuh yang tetap di disk. Dengan
+    `payloads_on_disk`, payload hanya dibaca dari disk untuk hasil top-k.
+
+    Satu koleksi hanya boleh dibuka satu proses (flock eksklusif pada `.lock` di
+    direktori koleksi): log payload & memmap tidak aman ditulis dua proses sekaligus.
+    """
+    name = "numpy"
+    # Baris matriks per blok saat scoring float32 (tanpa salinan).
+    SCORE_CHUNK = 65536
+    # Blok yang harus dikonversi (float16/int8 -> float32) dibuat kecil agar tetap di cache CPU;
+    # float16 menghemat separuh disk/RAM, tetapi konversinya membuat scoring lebih lambat.
+    CONVERT_CHUNK = 2048
+    QUANTIZATIONS = (None, "int8", "binary")
+
+    def __init__(self, root: Path, collection_name: str, dtype: str = "float32", dim: int = EMBEDDING_DIM,
+                 quantization: Optional[str] = None, rescore: bool = True, oversampling: float = 3.0,
+                 payloads_on_disk: bool = False):
+        super().__init__(collection_name)
+        if quantization not in self.QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.root = Path(root)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.quantization = quantization
+        self.rescore = rescore
+        self.oversampling = oversampling
+        self.payloads_on_disk = payloads_on_disk
+        self._opened: Optional[str] = None
+        self._lock_file = None
+        self._log = None
+        self._reader = None
+        self.matrix = None
+        self.codes = None
+        self.scales = None
+
+    # --- Penyimpanan ---
+
+    def init_collection(self):
+        self._open()
+
+    def _ensure_open(self):
+        # collection_name boleh diganti dari luar (mis. test); buka ulang jika berubah
+        if self._opened != self.collection_name:
+            self._open()
+
+    def _open(self):
+        self.close()
+        self.dir = self.root / self.collection_name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._acquire_lock()
+        self._vectors_path = self.dir / "vectors.bin"
+        self._codes_path = self.dir / "codes.bin"
+        self._scales_path = self.dir / "scales.bin"
+        self._payloads_path = self.dir / "payloads.jsonl"
+
+        meta = self._read_meta()
+        if meta and (meta.get("dim") != self.dim or meta.get("dtype") != self.dtype.name):
+            logger.info(f"Vector layout changed ({meta} -> {self.dim}/{self.dtype.name}), resetting {self.dir}")
+            self._reset_files()
+            meta = None
+        self.capacity = meta["capacity"] if meta else 0
+        self._map_all()
+        if meta and meta.get("quantization") != self.quantization:
+            # Kode dibangun ulang dari vektor presisi penuh, tanpa embedding ulang
+            self._rebuild_codes()
+            self._write_meta()
+
+        self.live = np.zeros(self.capacity, dtype=bool)
+        self.ids: List[Optional[str]] = [None] * self.capacity
+        # Nilai field ber-index per baris (kecil); payload penuh di RAM atau cukup offset di log
+        self.row_keys: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self.payloads: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self.offsets = np.full(self.capacity, -1, dtype=np.int64)
+        self.id_to_row: Dict[str, int] = {}
+        self.index: Dict[str, Dict[str, Set[int]]] = {field: {} for field in PAYLOAD_INDEXES}
+        self.rows_used = 0
+
+        log_lines = self._replay()
+        self.free = [row for row in range(self.rows_used) if not self.live[row]]
+        if log_lines > 2 * len(self.id_to_row) + 1000:
+            self._compact()
+        self._log = open(self._payloads_path, "ab")
+        self._opened = self.collection_name
+
+    def _acquire_lock(self):
+        handle = open(self.dir / ".lock", "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            raise RuntimeError(f"Vector index {self.dir} is locked by another process (is another aron instance running?)")
+        self._lock_file = handle
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.dir / "meta.json", "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self):
+        with open(self.dir / "meta.json", "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "capacity": self.capacity,
+                       "quantization": self.quantization}, f)
+
+    def _reset_files(self):
+        for path in (self._vectors_path, self._codes_path, self._scales_path, self._payloads_path, self.dir / "meta.json"):
+            if path.exists(): path.unlink()
+
+    def _code_layout(self):
+        if self.quantization == "int8":
+            return np.int8, (self.dim,)
+        if self.quantization == "binary":
+            return np.uint8, ((self.dim + 7) // 8,)
+        return None, None
+
+    def _map_all(self):
+        self.matrix = self._map(self._vectors_path, self.dtype, (self.dim,))
+        code_dtype, code_shape = self._code_layout()
+        self.codes = self._map(self._codes_path, code_dtype, code_shape) if code_dtype else None
+        self.scales = self._map(self._scales_path, np.float32, ()) if self.quantization == "int8" else None
+
+    def _map(self, path: Path, dtype, row_shape: tuple):
+        if self.capacity == 0:
+            return None
+        size = self.capacity * int(np.prod(row_shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size: f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(self.capacity, *row_shape))
+
+    def _flush_maps(self):
+        for m in (self.matrix, self.codes, self.scales):
+            if m is not None: m.flush()
+
+    def _grow(self, needed: int):
+        capacity = max(1024, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+        self._flush_maps()
+        self.matrix = self.codes = self.scales = None
+        extra = capacity - self.capacity
+        self.live = np.concatenate([self.live, np.zeros(extra, dtype=bool)])
+        self.offsets = np.concatenate([self.offsets, np.full(extra, -1, dtype=np.int64)])
+        for rows in (self.ids, self.row_keys, self.payloads):
+            rows.extend([None] * extra)
+        self.capacity = capacity
+        self._map_all()
+        self._write_meta()
+
+    def _encode(self, rows: List[int], vectors: np.ndarray):
+        """Menulis kode terkuantisasi untuk vektor ter-normalisasi."""
+        if self.quantization == "int8":
+            # Skala per baris: kode memakai rentang penuh [-127, 127]
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.codes[rows] = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            self.scales[rows] = scales
+        elif self.quantization == "binary":
+            self.codes[rows] = np.packbits(vectors > 0, axis=1)
+
+    def _rebuild_codes(self):
+        if not self.quantization or self.capacity == 0: return
+        logger.info(f"Rebuilding {self.quantization} codes for {self.dir}")
+        for start in range(0, self.capacity, self.SCORE_CHUNK):
+            end = min(start + self.SCORE_CHUNK, self.capacity)
+            self._encode(list(range(start, end)), np.asarray(self.matrix[start:end], dtype=np.float32))
+        self._flush_maps()
+
+    def _replay(self) -> int:
+        """Membangun ulang tabel payload dari log; baris rusak (crash saat menulis) dilewati."""
+        lines = 0
+        # Ratusan ribu dict kecil: GC siklik hanya memperlambat pemuatan
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self._payloads_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    lines += 1
+                    line_offset, offset = offset, offset + len(line)
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    row = entry["row"]
+                    if row >= self.capacity:
+                        continue
+                    self._unset_row(row)
+                    if "id" in entry:
+                        self._set_row(row, entry["id"], entry["payload"], line_offset)
+        except OSError:
+            pass
+        finally:
+            if gc_was_enabled: gc.enable()
+        return lines
+
+    def _compact(self):
+        tmp_path = self._payloads_path.with_suffix(".tmp")
+        offsets = {}
+        with open(tmp_path, "wb") as f:
+            for row in np.flatnonzero(self.live[:self.rows_used]):
+                row = int(row)
+                offsets[row] = f.tell()
+                f.write(self._encode_entry(row, self.ids[row], self._payload(row)))
+        self._close_reader()
+        os.replace(tmp_path, self._payloads_path)
+        for row, offset in offsets.items():
+            self.offsets[row] = offset
+
+    @staticmethod
+    def _encode_entry(row: int, pid: Optional[str] = None, payload: Optional[Dict[str, Any]] = None) -> bytes:
+        entry = {"row": row} if pid is None else {"row": row, "id": pid, "payload": payload}
+        return (json.dumps(entry) + "\n").encode("utf-8")
+
+    def _payload(self, row: int) -> Dict[str, Any]:
+        if not self.payloads_on_disk:
+            return self.payloads[row]
+        if self._reader is None:
+            self._reader = open(self._payloads_path, "rb")
+        self._reader.seek(int(self.offsets[row]))
+        return json.loads(self._reader.readline())["payload"]
+
+    def _close_reader(self):
+        if self._reader:
+            self._reader.close()
+            self._reader = None
+
+    def _set_row(self, row: int, pid: str, payload: Dict[str, Any], offset: int):
+        self.ids[row] = pid
+        keys = {field: payload.get(field) for field in PAYLOAD_INDEXES}
+        self.row_keys[row] = keys
+        self.offsets[row] = offset
+        if not self.payloads_on_disk:
+            self.payloads[row] = payload
+        self.live[row] = True
+        self.id_to_row[pid] = row
+        self.rows_used = max(self.rows_used, row + 1)
+        for field, value in keys.items():
+            for v in (value if isinstance(value, list) else [value]):
+                if v is not None:
+                    self.index[field].setdefault(v, set()).add(row)
+
+    def _unset_row(self, row: int):
+        pid = self.ids[row]
+        if pid is None:
+            return
+        for field, value in self.row_keys[row].items():
+            for v in (value if isinstance(value, list) else [value]):
+                rows = self.index[field].get(v)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows: del self.index[field][v]
+        self.id_to_row.pop(pid, None)
+        self.ids[row] = None
+        self.row_keys[row] = None
+        self.payloads[row] = None
+        self.offsets[row] = -1
+        self.live[row] = False
+
+    # --- Operasi ---
+
+    def upsert(self, points: List[Point]):
+        self._ensure_open()
+        if not points: return
+        rows, assigned, next_row = [], {}, self.rows_used
+        for pid, _vector, _payload in points:
+            row = assigned.get(pid, self.id_to_row.get(pid))
+            if row is None:
+                if self.free:
+                    row = self.free.pop()
+                else:
+                    row, next_row = next_row, next_row + 1
+            assigned[pid] = row
+            rows.append(row)
+        if max(rows) >= self.capacity:
+            self._grow(max(rows) + 1)
+
+        vectors = np.asarray([vector for _, vector, _ in points], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        # Vektor ditulis & di-flush sebelum log payload: crash di antaranya hanya menyisakan baris bebas
+        self.matrix[rows] = vectors.astype(self.dtype)
+        self._encode(rows, vectors)
+        self._flush_maps()
+        for row, (pid, _vector, payload) in zip(rows, points):
+            self._unset_row(row)
+            offset = self._log.tell()
+            self._log.write(self._encode_entry(row, pid, payload))
+            self._set_row(row, pid, payload, offset)
+        self._log.flush()
+
+    def delete_files(self, file_paths: List[str]):
+        self._ensure_open()
+        rows = set()
+        for path in file_paths:
+            rows |= self.index["file_path"].get(path, set())
+        for row in sorted(rows):
+            self._unset_row(row)
+            self.free.append(row)
+            self._log.write(self._encode_entry(row))
+        self._log.flush()
+
+    def _scores(self, queries: np.ndarray, n: int) -> np.ndarray:
+        """Skor semua baris: exact (tanpa kuantisasi) atau aproksimasi dari kode."""
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        if self.quantization == "binary":
+            query_bits = np.packbits(queries > 0, axis=1)
+        converts = self.quantization == "int8" or (self.quantization is None and self.dtype != np.float32)
+        chunk = self.CONVERT_CHUNK if converts else self.SCORE_CHUNK
+        for start in range(0, n, chunk):
+            end = min(start + chunk, n)
+            if self.quantization == "int8":
+                block = np.asarray(self.codes[start:end], dtype=np.float32)
+                scores[:, start:end] = (queries @ block.T) * self.scales[start:end]
+            elif self.quantization == "binary":
+                block = np.asarray(self.codes[start:end])
+                for q, bits in enumerate(query_bits):
+                    # Semakin kecil jarak Hamming, semakin mirip
+                    scores[q, start:end] = -_POPCOUNT[np.bitwise_xor(block, bits)].sum(axis=1, dtype=np.int32)
+            else:
+                scores[:, start:end] = queries @ np.asarray(self.matrix[start:end], dtype=np.float32).T
+        return scores
+
+    def search_batch(self, vectors, limit, path_prefix=None, language=None, symbol_type=None):
+        self._ensure_open()
+        n = self.rows_used
+        empty = [[] for _ in vectors]
+        if n == 0 or not vectors:
+            return empty
+        mask = self.live[:n].copy()
+        for field, value in _scope_items(path_prefix, language, symbol_type):
+            allowed = np.zeros(n, dtype=bool)
+            allowed[list(self.index[field].get(value, ()))] = True
+            mask &= allowed
+        candidates = int(mask.sum())
+        if candidates == 0:
+            return empty
+
+        queries = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1.0, norms)
+        scores = self._scores(queries, n)
+        scores[:, ~mask] = -np.inf
+
+        k = min(limit, candidates)
+        rescore = self.quantization is not None and self.rescore
+        # Dengan rescoring, ambil lebih banyak kandidat aproksimasi lalu urutkan ulang secara exact
+        pool = min(candidates, max(k, int(np.ceil(k * self.oversampling)))) if rescore else k
+        top = np.argpartition(-scores, pool - 1, axis=1)[:, :pool]
+        results = []
+        for q, rows in enumerate(top):
+            if rescore:
+                order = np.sort(rows)  # Akses memmap berurutan
+                exact = np.asarray(self.matrix[order], dtype=np.float32) @ queries[q]
+                rows = order[np.argsort(-exact)[:k]]
+            else:
+                rows = rows[np.argsort(-scores[q, rows])]
+            results.append([self._payload(int(r)) for r in rows])
+        return results
+
+    def footprint(self) -> Dict[str, int]:
+        """Ukuran (byte) komponen index: yang dipindai per query vs yang hanya disentuh saat rescoring."""
+        self._ensure_open()
+        n = self.rows_used
+        full = n * self.dim * self.dtype.itemsize
+        codes = n * int(np.prod(self.codes.shape[1:])) * self.codes.dtype.itemsize if self.codes is not None else 0
+        scales = n * 4 if self.scales is not None else 0
+        return {
+            "rows": n,
+            "full_vectors": full,
+            "scanned_per_query": codes + scales if self.quantization else full,
+            "payloads_in_memory": 0 if self.payloads_on_disk else os.path.getsize(self._payloads_path),
+        }
+
+    def count(self) -> int:
+        self._ensure_open()
+        return len(self.id_to_row)
+
+    def iter_points(self, batch_size: int = 1000):
+        self._ensure_open()
+        rows = np.flatnonzero(self.live[:self.rows_used])
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            vectors = np.asarray(self.matrix[chunk], dtype=np.float32)
+            yield [(self.ids[int(r)], vectors[i], self._payload(int(r))) for i, r in enumerate(chunk)]
+
+    def clear(self):
+        self.close()
+        shutil.rmtree(self.root / self.collection_name, ignore_errors=True)
+        self._open()
+
+    def close(self):
+        if self._log:
+            self._log.close()
+            self._log = None
+        self._close_reader()
+        self._flush_maps()
+        self.matrix = self.codes = self.scales = None
+        self._opened = None
+        if self._lock_file:
+            # Menutup file melepas flock
+            self._lock_file.close()
+            self._lock_file = None
@@ -1,54 +1,156 @@
 import os
+import time
 import logging
 import hashlib
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Optional
 from fastembed import TextEmbedding
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchText
+from src.memory.embedding_cache import EmbeddingCache, LRUCache
+from src.memory.file_filter import is_excluded_path
+from src.memory.vector_backends import VectorBackend, QdrantBackend, NumpyBackend
+from src.memory.models import symbol_id, hydrate_content
 from src.core.config import settings
 
 logger = logging.getLogger("VectorStore")
 
+def symbol_payload(symbol: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload point: metadata simbol + bahasa + daftar direktori leluhur (untuk filter "hanya di lib/").
+
+    Konten tidak ikut disimpan; satu-satunya salinan ada di tabel SQL `codesymbol`
+    dan diambil lewat `symbol_id` hanya untuk hasil akhir.
+    """
+    path = symbol["file_path"].replace(os.sep, "/")
+    parts = path.split("/")[:-1]
+    return {
+        **{key: value for key, value in symbol.items() if key != "content"},
+        "language": settings.SUPPORTED_EXTENSIONS.get(os.path.splitext(path)[1], "unknown"),
+        "dirs": ["/".join(parts[:i]) for i in range(1, len(parts) + 1)],
+    }
+
 class VectorStore:
     def __init__(self):
         self.db_path = str(settings.DB_DIR)
         self.cache_dir = str(settings.MODEL_DIR / ".embeddings")
         os.makedirs(self.cache_dir, exist_ok=True)
         
-        self.client = QdrantClient(path=self.db_path)
+        # Backend vektor tidak diasumsikan thread-safe; watcher menulis dari thread latar
+        self.lock = threading.RLock()
         
         # Buat nama koleksi unik per proyek menggunakan hash path
-        project_hash = hashlib.md5(str(settings.CURRENT_PROJECT_DIR).encode()).hexdigest()[:12]
-        self.collection_name = f"code_symbols_{project_hash}"
+        self.project_hash = hashlib.md5(str(settings.CURRENT_PROJECT_DIR).encode()).hexdigest()[:12]
+        self.backend = self._create_backend()
         
-        self.model = None
-        self._load_model()
+        self._model = None
+        self._model_ready = threading.Event()
+        self._model_lock = threading.Lock()
+        self.model_load_sec: Optional[float] = None
+        self.embedding_cache = EmbeddingCache(settings.EMBEDDING_MODEL) if settings.EMBEDDING_CACHE else None
+        self.query_cache = LRUCache(settings.QUERY_CACHE_SIZE)
+        self.result_cache = LRUCache(settings.SEARCH_CACHE_SIZE)
+        # Naik setiap kali isi koleksi berubah; hasil pencarian lama jadi tidak berlaku
+        self.index_version = 0
         self._init_collection()
 
+        # Memuat ONNX memakan waktu; jangan tahan prompt pertama kecuali diminta
+        if settings.EMBEDDING_WARMUP == "eager":
+            self._load_model()
+            self._model_ready.set()
+        elif settings.EMBEDDING_WARMUP == "background":
+            self.warm_up()
+
+    @property
+    def model(self):
+        """Model embedding; menunggu (atau memicu) warm-up jika belum siap."""
+        return self._ensure_model()
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+        self._model_ready.set()
+
+    def is_model_ready(self) -> bool:
+        return self._model_ready.is_set()
+
+    def warm_up(self):
+        """Memuat model embedding di thread latar tanpa memblokir pemanggil."""
+        if self._model_ready.is_set(): return
+        threading.Thread(target=self._ensure_model, name="aron-embedding-warmup", daemon=True).start()
+
+    def _ensure_model(self):
+        if not self._model_ready.is_set():
+            # Pemanggil kedua menunggu di lock sampai pemuatan pertama selesai
+            with self._model_lock:
+                if not self._model_ready.is_set():
+                    try:
+                        self._load_model()
+                    except RuntimeError:
+                        pass  # Sudah dicatat; pencarian semantik dinonaktifkan
+                    finally:
+                        self._model_ready.set()
+        return self._model
+
+    def _create_backend(self) -> VectorBackend:
+        """Qdrant (default) atau NumPy; jika Qdrant gagal dibuka, jatuh ke NumPy alih-alih tanpa retrieval."""
+        if settings.VECTOR_BACKEND == "qdrant" and settings.VECTOR_COMPACT:
+            logger.info("Compact vector mode requested; using the NumPy backend (embedded Qdrant keeps full vectors in RAM).")
+        elif settings.VECTOR_BACKEND == "qdrant":
+            try:
+                client = QdrantClient(path=self.db_path)
+                return QdrantBackend(client, f"code_symbols_{self.project_hash}")
+            except Exception as e:
+                logger.warning(f"Qdrant unavailable ({e}), falling back to NumPy vector backend.")
+        # Manifest & simbol SQL dipisah per backend agar tiap index tetap konsisten sendiri
+        self.project_hash = f"{self.project_hash}_np"
+        compact = settings.VECTOR_COMPACT
+        return NumpyBackend(
+            settings.DB_DIR / "numpy", f"code_symbols_{self.project_hash}", dtype=settings.VECTOR_DTYPE,
+            quantization=settings.VECTOR_QUANTIZATION if compact else None,
+            rescore=settings.VECTOR_RESCORE, oversampling=settings.VECTOR_OVERSAMPLING,
+            payloads_on_disk=compact,
+        )
+
+    @property
+    def client(self):
+        """Client Qdrant mentah (None untuk backend lain)."""
+        return getattr(self.backend, "client", None)
+
+    @client.setter
+    def client(self, value):
+        self.backend.client = value
+
+    @property
+    def collection_name(self) -> str:
+        return self.backend.collection_name
+
+    @collection_name.setter
+    def collection_name(self, value: str):
+        self.backend.collection_name = value
+
     def close(self):
         try:
-            if hasattr(self, 'client'): self.client.close()
+            if hasattr(self, 'backend'): self.backend.close()
         except Exception as e:
-            logger.error(f"Error closing Qdrant: {e}")
+            logger.error(f"Error closing vector backend: {e}")
 
     def _load_model(self):
         try:
-            self.model = TextEmbedding(
-                model_name="BAAI/bge-small-en-v1.5",
-                cache_dir=self.cache_dir
+            start = time.perf_counter()
+            self._model = TextEmbedding(
+                model_name=settings.EMBEDDING_MODEL,
+                cache_dir=self.cache_dir,
+                threads=settings.EMBEDDING_THREADS
             )
+            self.model_load_sec = time.perf_counter() - start
+            logger.info(f"Embedding model loaded in {self.model_load_sec:.2f}s")
         except Exception as e:
             logger.error(f"Embedding model error: {e}")
             raise RuntimeError("Semantic memory failed to load. Check internet/cache.")
 
     def _init_collection(self):
         try:
-            collections = self.client.get_collections().collections
-            if not any(c.name == self.collection_name for c in collections):
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-                )
+            with self.lock:
+                self.backend.init_collection()
         except Exception as e:
             logger.error(f"Collection init error: {e}")
 
@@ -56,66 +158,160 @@ class VectorStore:
         if not symbols or not self.model: return
 
         try:
-            texts = [f"{s['name']} in {s['file_path']}: {s['content']}" for s in symbols]
-            embeddings = list(self.model.embed(texts))
-            
-            points = []
-            for i, (symbol, embedding) in enumerate(zip(symbols, embeddings)):
-                points.append(PointStruct(
-                    id=hash(f"{symbol['file_path']}_{symbol['name']}_{i}") & 0xFFFFFFFFFFFFFFFF,
-                    vector=embedding.tolist(),
-                    payload=symbol
-                ))
-            
-            self.client.upsert(collection_name=self.collection_name, points=points)
+            self.upsert_embedded(symbols, self.embed_symbols(symbols))
         except Exception as e:
             logger.error(f"Upsert error: {e}")
 
+    def embed_symbols(self, symbols: List[Dict[str, Any]]) -> List[Any]:
+        """Tahap embedding saja (tanpa lock backend), dipakai pipeline indexing."""
+        texts = [f"{s['name']} in {s['file_path']}: {s['content']}" for s in symbols]
+        if self.embedding_cache:
+            return self.embedding_cache.embed(texts, self.embed_texts)
+        return self.embed_texts(texts)
+
+    def embed_texts(self, texts: List[str]) -> List[Any]:
+        """Embedding dokumen (urutan hasil = urutan `texts`).
+
+        ONNX mem-padding setiap batch ke teks terpanjangnya; dengan teks diurutkan
+        per panjang (karakter, proksi jumlah token), tiap batch berisi teks yang
+        panjangnya mirip sehingga hampir tidak ada komputasi terbuang untuk padding.
+        """
+        order = list(range(len(texts)))
+        if settings.EMBEDDING_SORT_BY_LENGTH:
+            order.sort(key=lambda i: len(texts[i]))
+        vectors = self.model.embed(
+            [texts[i] for i in order],
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            parallel=settings.EMBEDDING_PARALLEL,
+        )
+        result: List[Any] = [None] * len(texts)
+        for i, vector in zip(order, vectors):
+            result[i] = vector
+        return result
+
+    def upsert_embedded(self, symbols: List[Dict[str, Any]], embeddings: List[Any]):
+        """Tahap upsert saja untuk simbol yang sudah di-embed.
+
+        Simbol di direktori yang dikecualikan ditolak di sini, sehingga pencarian
+        tidak perlu lagi menyaring path per query.
+        """
+        points = [
+            (sid, embedding.tolist(), {**symbol_payload(symbol), "symbol_id": sid})
+            for symbol, embedding in zip(symbols, embeddings)
+            for sid in (symbol_id(self.project_hash, symbol),)
+            if not is_excluded_path(symbol["file_path"])
+        ]
+        if not points: return
+        
+        with self.lock:
+            self.backend.upsert(points)
+            self._index_changed()
+
+    def upsert_points(self, points: List[tuple]):
+        """Upsert point (id, vektor, payload) yang vektornya sudah ada, mis. dari snapshot index."""
+        if not points: return
+        with self.lock:
+            self.backend.upsert(points)
+            self._index_changed()
+
+    def iter_points(self, batch_size: int = 1000):
+        """Seluruh point koleksi per batch (id, vektor, payload)."""
+        with self.lock:
+            yield from self.backend.iter_points(batch_size)
+
+    def _index_changed(self):
+        self.index_version += 1
+        self.result_cache.clear()
+
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        """Embedding query (list float), diambil dari LRU jika query sama pernah dicari."""
+        return self.embed_queries([query])[0]
+
+    def embed_queries(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """Embedding banyak query; yang belum ada di LRU di-embed dalam satu batch."""
+        vectors = [self.query_cache.get(q) for q in queries]
+        missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+        if missing:
+            model = self.model
+            if not model: return vectors
+            computed = dict(zip(missing, (e.tolist() for e in model.embed(missing))))
+            for query, vector in computed.items():
+                self.query_cache.put(query, vector)
+            vectors = [v if v is not None else computed[q] for q, v in zip(queries, vectors)]
+        return vectors
+
+    def delete_file(self, file_path: str):
+        """Menghapus semua point milik satu file (dipakai saat file berubah/dihapus)."""
+        self.delete_files([file_path])
+
+    def delete_files(self, file_paths: List[str]):
+        """Menghapus semua point milik banyak file dalam satu operasi (filter index `file_path`)."""
+        if not file_paths: return
+        try:
+            with self.lock:
+                self.backend.delete_files(list(file_paths))
+                self._index_changed()
+        except Exception as e:
+            logger.error(f"Delete file points error ({len(file_paths)} files): {e}")
+
     def clear_all(self):
         try:
-            self.client.delete_collection(collection_name=self.collection_name)
-            self._init_collection()
+            with self.lock:
+                self.backend.clear()
+                self._index_changed()
         except Exception as e:
             logger.error(f"Clear DB error: {e}")
 
-    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, limit: int = 5, **scope) -> List[Dict[str, Any]]:
+        return self.search_many([query], limit=limit, **scope)[0]
+
+    def search_many(self, queries: List[str], limit: int = 5, path_prefix: Optional[str] = None,
+                    language: Optional[str] = None, symbol_type: Optional[str] = None,
+                    with_content: bool = True) -> List[List[Dict[str, Any]]]:
+        """Mencari banyak query sekaligus: satu batch embedding dan satu panggilan batch ke backend.
+
+        Hasil dikembalikan per query sesuai urutan `queries`. `path_prefix`,
+        `language`, dan `symbol_type` membatasi pencarian lewat payload index.
+        Dengan `with_content=False` hanya metadata yang dikembalikan (pemanggil
+        yang masih menyaring/menggabung hasil melengkapi konten sendiri).
+        """
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        scope = (path_prefix, language, symbol_type)
         try:
-            if not self.model: return []
-            query_embedding = list(self.model.embed([query]))[0]
-            qv = query_embedding.tolist()
-            
-            # Refined filtering: only exclude if a path segment exactly matches an ignored dir
-            must_not = []
-            for p in settings.IGNORED_DIRS:
-                if len(p) > 1:
-                    must_not.append(FieldCondition(key="file_path", match=MatchText(text=p)))
-
-            # Gunakan query_points jika tersedia (qdrant-client >= 1.7.0)
-            # Fallback ke search jika gagal
-            try:
-                results = self.client.query_points(
-                    collection_name=self.collection_name,
-                    query=qv,
-                    query_filter=Filter(must_not=must_not) if must_not else None,
-                    limit=limit,
-                    with_payload=True
-                ).points
-            except AttributeError:
-                results = self.client.search(
-                    collection_name=self.collection_name,
-                    query_vector=qv,
-                    query_filter=Filter(must_not=must_not) if must_not else None,
-                    limit=limit,
-                    with_payload=True
-                )
-            
-            return [res.payload for res in results if res.payload]
+            version = self.index_version
+            pending = []
+            for i, query in enumerate(queries):
+                cached = self.result_cache.get((self.collection_name, query, limit, scope))
+                if cached is not None:
+                    results[i] = list(cached)
+                else:
+                    pending.append(i)
+
+            # Blok di sini hanya jika warm-up latar belum selesai
+            vectors = self.embed_queries([queries[i] for i in pending]) if pending else []
+            pending = [(i, qv) for i, qv in zip(pending, vectors) if qv is not None]
+            if pending:
+                with self.lock:
+                    hits = self.backend.search_batch([qv for _, qv in pending], limit, path_prefix, language, symbol_type)
+                for (i, _), payloads in zip(pending, hits):
+                    # Jangan simpan hasil yang dihitung bersamaan dengan perubahan index
+                    if version == self.index_version:
+                        self.result_cache.put((self.collection_name, queries[i], limit, scope), payloads)
+                    results[i] = list(payloads)
+
+            if with_content:
+                # Satu query SQL untuk konten seluruh hasil akhir (cache hanya menyimpan metadata)
+                flat = hydrate_content([r for hits in results if hits for r in hits])
+                for i, hits in enumerate(results):
+                    if hits:
+                        results[i], flat = flat[:len(hits)], flat[len(hits):]
         except Exception as e:
             logger.error(f"Search error: {e}")
-            return []
+        return [r if r is not None else [] for r in results]
 
     def count_points(self) -> int:
         try:
-            return self.client.get_collection(self.collection_name).points_count
+            with self.lock:
+                return self.backend.count()
         except:
             return 0
@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Set
+from src.memory.file_filter import FileEnumerator
+from src.core.config import settings
+
+logger = logging.getLogger("IndexWatcher")
+
+# Konstanta inotify (lihat <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Penanda di antrean: terlalu banyak perubahan, lakukan scan inkremental penuh
+RESCAN = object()
+
+
+class _Inotify:
+    """Binding minimal inotify via ctypes (Linux saja)."""
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def read_events(self, timeout: float):
+        """Yield (wd, mask, name) untuk event yang tersedia dalam `timeout` detik."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            yield wd, mask, name
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class IndexWatcher:
+    """
+    Responsibility: Menjaga index semantik tetap segar selama sesi chat.
+    Memantau perubahan file (inotify, fallback polling), menggabungkan event
+    yang berulang, lalu me-re-index file yang tersentuh di thread latar.
+    Producer memakai FileEnumerator sendiri (bukan milik indexer yang dipakai thread
+    consumer); indexer hanya dipanggil lewat reindex_files / scan_project.
+    """
+    def __init__(self, indexer, debounce: Optional[float] = None, max_pending: Optional[int] = None):
+        self.indexer = indexer
+        self.root = Path(indexer.project_path)
+        self.file_enumerator = FileEnumerator(str(self.root))
+        self.debounce = debounce if debounce is not None else settings.WATCH_DEBOUNCE_SEC
+        self.max_pending = max_pending if max_pending is not None else settings.WATCH_MAX_PENDING
+        self.events: queue.Queue = queue.Queue(maxsize=settings.WATCH_QUEUE_SIZE)
+        self.stats = {"events": 0, "batches": 0, "files_reindexed": 0, "rescans": 0, "dropped": 0}
+        self.backend = None
+        self._stop = threading.Event()
+        self._rescan_requested = False
+        self._threads = []
+        self._inotify: Optional[_Inotify] = None
+        self._watches: Dict[int, Path] = {}
+        self._snapshot: Dict[str, tuple] = {}
+
+    def start(self, initial_sync: bool = False):
+        """Menjalankan thread watcher; `initial_sync` mengejar perubahan saat Aron mati."""
+        if self._threads: return
+        producer = self._run_polling
+        if sys.platform.startswith("linux") and settings.WATCH_BACKEND != "polling":
+            try:
+                self._inotify = _Inotify()
+                self._watch_tree(self.root)
+                producer = self._run_inotify
+            except Exception as e:
+                logger.warning(f"inotify unavailable ({e}), falling back to polling.")
+                if self._inotify: self._inotify.close()
+                self._inotify = None
+                self._watches.clear()
+        if producer == self._run_polling:
+            self._snapshot = self._take_snapshot()
+        self.backend = "inotify" if self._inotify else "polling"
+
+        if initial_sync:
+            self._put(RESCAN)
+        for target in (producer, self._run_consumer):
+            t = threading.Thread(target=target, name=f"aron-{target.__name__.strip('_')}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"Index watcher started ({self.backend}) on {self.root}")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+        logger.info(f"Index watcher stopped. Stats: {self.stats}")
+
+    def notify(self, path: str):
+        """Memberi tahu watcher secara eksplisit bahwa sebuah file berubah (mis. dari CodePatcher)."""
+        full_path = Path(path)
+        if not full_path.is_absolute():
+            full_path = self.root / full_path
+        self._put(os.path.relpath(full_path, self.root))
+
+    def _put(self, item):
+        try:
+            self.events.put_nowait(item)
+            self.stats["events"] += 1
+        except queue.Full:
+            # Antrean penuh (mis. git checkout besar): ganti dengan satu rescan
+            self.stats["dropped"] += 1
+            self._rescan_requested = True
+
+    # --- Producer: inotify ---
+
+    def _is_ignored_dir(self, path: str) -> bool:
+        return self.file_enumerator.is_ignored_dir(os.path.relpath(path, self.root))
+
+    def _watch_tree(self, directory: Path):
+        for root, dirs, _files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not self._is_ignored_dir(os.path.join(root, d))]
+            try:
+                self._watches[self._inotify.add_watch(root)] = Path(root)
+            except OSError as e:
+                logger.debug(f"Cannot watch {root}: {e}")
+
+    def _run_inotify(self):
+        while not self._stop.is_set():
+            try:
+                for wd, mask, name in self._inotify.read_events(timeout=0.5):
+                    self._handle_inotify_event(wd, mask, name)
+            except Exception as e:
+                if self._stop.is_set(): break
+                logger.error(f"inotify read error: {e}")
+                time.sleep(1.0)
+
+    def _handle_inotify_event(self, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            self._put(RESCAN)
+            return
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+        directory = self._watches.get(wd)
+        if directory is None or not name:
+            return
+
+        full_path = directory / name
+        if mask & IN_ISDIR:
+            if self._is_ignored_dir(full_path):
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Direktori baru: pasang watch, lalu antrekan isinya yang sudah ada
+                self._watch_tree(full_path)
+                for root, dirs, files in os.walk(full_path):
+                    dirs[:] = [d for d in dirs if not self._is_ignored_dir(os.path.join(root, d))]
+                    for file in files:
+                        self._put(os.path.relpath(os.path.join(root, file), self.root))
+            else:
+                # Direktori hilang/dipindah: isinya tidak dilaporkan satu per satu
+                self._put(RESCAN)
+            return
+        self._put(os.path.relpath(full_path, self.root))
+
+    # --- Producer: polling ---
+
+    def _take_snapshot(self) -> Dict[str, tuple]:
+        # Stat walk biasa setiap interval: tanpa subprocess `git ls-files`
+        snapshot = {}
+        for file_path, _ext, st in self.file_enumerator.iter_files(use_git=False):
+            snapshot[os.path.relpath(file_path, self.root)] = (st.st_size, st.st_mtime)
+        return snapshot
+
+    def _run_polling(self):
+        while not self._stop.wait(settings.WATCH_POLL_INTERVAL):
+            try:
+                current = self._take_snapshot()
+                for rel_path, sig in current.items():
+                    if self._snapshot.get(rel_path) != sig:
+                        self._put(rel_path)
+                for rel_path in self._snapshot.keys() - current.keys():
+                    self._put(rel_path)
+                self._snapshot = current
+            except Exception as e:
+                logger.error(f"Polling error: {e}")
+
+    # --- Consumer ---
+
+    def _run_consumer(self):
+        pending: Set[str] = set()
+        first_event = 0.0
+        while not self._stop.is_set():
+            waiting = pending or self._rescan_requested
+            try:
+                item = self.events.get(timeout=self.debounce if waiting else 0.5)
+            except queue.Empty:
+                item = None
+
+            if item is not None:
+                # Kumpulkan semua event yang sudah antre sekaligus (coalescing)
+                items = [item]
+                while True:
+                    try:
+                        items.append(self.events.get_nowait())
+                    except queue.Empty:
+                        break
+                for it in items:
+                    if it is RESCAN:
+                        self._rescan_requested = True
+                    else:
+                        pending.add(it)
+                if not first_event:
+                    first_event = time.monotonic()
+                if len(pending) > self.max_pending:
+                    self._rescan_requested = True
+                # Debounce: tunggu sampai sepi, tapi jangan menunda tanpa batas
+                if time.monotonic() - first_event < self.debounce * 10:
+                    continue
+
+            if not (pending or self._rescan_requested):
+                continue
+            batch, pending, first_event = pending, set(), 0.0
+            self._flush(batch)
+
+    def _flush(self, batch: Set[str]):
+        try:
+            if self._rescan_requested:
+                self._rescan_requested = False
+                self.stats["rescans"] += 1
+                stats = self.indexer.scan_project(verbose=False)
+            else:
+                stats = self.indexer.reindex_files(batch)
+            self.stats["batches"] += 1
+            self.stats["files_reindexed"] += stats["added"] + stats["changed"] + stats["removed"]
+            logger.info(f"Watcher re-index: {stats}")
+        except Exception as e:
+            logger.error(f"Watcher re-index failed: {e}")
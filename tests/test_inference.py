@@ -1,6 +1,15 @@
 import unittest
 import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
 from src.llm.inference import InferenceEngine
+from src.llm.prompt_cache import common_prefix_len
+from src.llm.context_budget import ContextBudget
+from src.llm.stream_guard import StopMatcher, RepetitionDetector
+from src.llm.model_pool import ModelPool
+from src.llm.backends import InferenceBackend, ScriptedBackend, MLXBackend, LlamaCppBackend, create_backend
 from src.core.config import settings
 
 class TestInferenceEngine(unittest.TestCase):
@@ -17,5 +26,292 @@ class TestInferenceEngine(unittest.TestCase):
         """Memastikan settings terbaca dengan benar."""
         self.assertEqual(settings.APP_NAME, "CodeAron")
 
+class EngineTestCase(unittest.TestCase):
+    """InferenceEngine singleton: backend, model aktif, prompt prefix & isi pool dikembalikan setelah tiap tes."""
+    def setUp(self):
+        self.engine = InferenceEngine()
+        self.addCleanup(self._restore, self.engine.backend, self.engine.model_path, self.engine.prompt_prefix)
+        self.engine.prompt_prefix = None
+
+    def _restore(self, backend, model_path, prompt_prefix):
+        pool = self.engine.pool
+        for key, entry in list(pool.resident.items()):
+            if entry.backend is not backend:
+                pool.evict(key)
+        pool.drain_events()
+        self.engine.backend, self.engine.model_path, self.engine.prompt_prefix = backend, model_path, prompt_prefix
+
+class TestInferenceBackends(EngineTestCase):
+    STOPS = ["<｜User｜>", "User:", "\n\n"]
+
+    def _generate(self, response: str, **kwargs) -> str:
+        self.engine.set_backend(ScriptedBackend([response]))
+        return "".join(self.engine.generate_stream("prompt", stop_sequences=self.STOPS, **kwargs))
+
+    def test_create_backend_by_name(self):
+        self.assertIsInstance(create_backend("scripted"), ScriptedBackend)
+        self.assertIsInstance(create_backend("mlx"), MLXBackend)
+        self.assertIsInstance(create_backend("llama_cpp"), LlamaCppBackend)
+        with self.assertRaises(ValueError):
+            create_backend("tpu")
+        # Antarmuka abstrak: backend tanpa load/tokenize/stream_generate tidak bisa dibuat
+        with self.assertRaises(TypeError):
+            InferenceBackend()
+
+    def test_stop_sequence_trims_output(self):
+        self.assertEqual(self._generate("Baris satu\n\nBaris dua"), "Baris satu")
+
+    def test_partial_stop_sequence_is_held_back(self):
+        # "User" dan ":" datang sebagai token terpisah; "User" tidak boleh bocor
+        self.assertEqual(self._generate("Selesai. User: lanjut"), "Selesai. ")
+        # Awal stop sequence yang ternyata bukan stop tetap dikirim, termasuk di akhir stream
+        self.assertEqual(self._generate("Username valid"), "Username valid")
+        self.assertEqual(self._generate("akhir User"), "akhir User")
+
+    def test_repetition_stops_generation(self):
+        looping = "intro\n" + "print('again and again')\n" * 20
+        output = self._generate(looping)
+        self.assertLess(output.count("print('again and again')"), 6)
+
+    def test_max_tokens_and_oneshot(self):
+        self.assertEqual(self._generate("a b c d e", max_tokens=3), "a b")
+        self.engine.set_backend(ScriptedBackend(["first", "second"]))
+        self.assertEqual(self.engine.generate_oneshot("x"), "first")
+        self.assertEqual(self.engine.generate_oneshot("x"), "second")
+
+    def test_tokenize_and_chat_template(self):
+        self.engine.set_backend(ScriptedBackend())
+        self.assertEqual(len(self.engine.tokenize("def foo(x):")), 7)
+        prompt = self.engine.apply_chat_template([{"role": "user", "content": "hi"}])
+        self.assertTrue(prompt.endswith("<|assistant|>"))
+
+    def test_load_failure_is_reported(self):
+        backend = LlamaCppBackend()
+        self.engine.set_backend(backend)
+        with mock.patch.object(backend, "load", side_effect=ImportError("No module named 'llama_cpp'")):
+            with self.assertRaises(RuntimeError):
+                self.engine.load_model()
+
+class TestPromptCache(EngineTestCase):
+    SYSTEM = {"role": "system", "content": "Identity: Aron. " + "Rules: be concise and technical. " * 40}
+
+    def setUp(self):
+        super().setUp()
+        self.engine.set_backend(ScriptedBackend(["Jawaban pertama.", "Jawaban kedua."], prefill_sec_per_token=0.0001))
+
+    def _turn(self, messages):
+        prompt = self.engine.apply_chat_template(messages)
+        "".join(self.engine.generate_stream(prompt))
+        return self.engine.last_request_stats
+
+    def test_common_prefix_len(self):
+        self.assertEqual(common_prefix_len([1, 2, 3], [1, 2, 4]), 2)
+        self.assertEqual(common_prefix_len([], [1]), 0)
+
+    def test_system_prompt_is_prefilled_once(self):
+        self.engine.set_prompt_prefix([self.SYSTEM])
+        self.engine.load_model()
+        prefix_tokens = self.engine.prefix_stats["tokens"]
+        self.assertGreater(prefix_tokens, 100)
+        stats = self._turn([self.SYSTEM, {"role": "user", "content": "halo"}])
+        self.assertEqual(stats["cached_tokens"], prefix_tokens)
+        self.assertEqual(stats["prefill_tokens"], stats["prompt_tokens"] - prefix_tokens)
+        self.assertGreater(stats["saved_sec"], 0)
+
+    def test_follow_up_turn_reuses_history(self):
+        first = [self.SYSTEM, {"role": "user", "content": "apa itu KV cache?"}]
+        self._turn(first)
+        second = first + [{"role": "assistant", "content": "Jawaban pertama."}, {"role": "user", "content": "lanjut"}]
+        stats = self._turn(second)
+        self.assertEqual(stats["prefill_tokens"], len(self.engine.tokenize("<|end|><|user|>lanjut<|end|><|assistant|>")))
+        self.assertGreater(stats["cached_tokens"], 100)
+
+    def test_divergent_prompt_falls_back_to_common_prefix(self):
+        self._turn([self.SYSTEM, {"role": "user", "content": "satu"}])
+        other = {"role": "system", "content": "Prompt lain sama sekali."}
+        stats = self._turn([other, {"role": "user", "content": "dua"}])
+        self.assertEqual(stats["cached_tokens"], len(self.engine.tokenize("<|system|>")))
+
+class TestStreamGuard(unittest.TestCase):
+    @staticmethod
+    def _legacy_repeating(text: str) -> bool:
+        lines = text.splitlines()
+        return len(lines) > 5 and len(set(lines[-3:])) == 1 and len(lines[-3].strip()) > 5
+
+    def test_stop_matcher_across_chunks(self):
+        matcher = StopMatcher(["<｜User｜>", "\n\n"])
+        out = "".join(matcher.feed(c) for c in ["jawab", "an <", "｜Us", "er｜> lagi"])
+        self.assertTrue(matcher.stopped)
+        self.assertEqual(out, "jawaban ")
+        matcher = StopMatcher(["\n\n"])
+        self.assertEqual(matcher.feed("a\n"), "a")
+        self.assertEqual(matcher.feed("b") + matcher.flush(), "\nb")
+        self.assertFalse(matcher.stopped)
+
+    def test_repetition_detector_matches_line_scan(self):
+        import random
+        rng = random.Random(0)
+        pieces = ["print('x')", "print('x')\n", "print('x')\n", "\n", "ab\n", " "]
+        for _ in range(200):
+            detector, text = RepetitionDetector(), ""
+            for _ in range(40):
+                chunk = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 3)))
+                text += chunk
+                self.assertEqual(detector.feed(chunk), self._legacy_repeating(text), repr(text))
+
+class TestContextBudget(EngineTestCase):
+    SYSTEM = {"role": "system", "content": "Identity: Aron. Rules: be concise."}
+
+    def setUp(self):
+        super().setUp()
+        self.engine.set_backend(ScriptedBackend(["OK."]))
+        self.engine.load_model()
+
+    def _count(self, prompt: str) -> int:
+        return len(self.engine.tokenize(prompt))
+
+    def _history(self, turns: int):
+        messages = []
+        for i in range(turns):
+            messages.append({"role": "user", "content": f"pertanyaan lama {i} " + "kata " * 50})
+            messages.append({"role": "assistant", "content": f"jawaban lama {i} " + "kata " * 50})
+        return messages
+
+    def test_prompt_within_budget_is_unchanged(self):
+        messages = [self.SYSTEM, {"role": "user", "content": "halo"}]
+        with mock.patch.object(settings, "CONTEXT_WINDOW_TOKENS", 4096):
+            prompt = self.engine.build_prompt(messages, max_tokens=100, context="File: a.py\ndef a(): pass")
+        self.assertEqual(prompt, self.engine.apply_chat_template(ContextBudget.compose(messages, "File: a.py\ndef a(): pass")))
+        self.assertEqual(self.engine.last_budget["dropped_messages"], 0)
+
+    def test_old_history_is_dropped_first(self):
+        messages = [self.SYSTEM] + self._history(4) + [{"role": "user", "content": "pertanyaan baru"}]
+        context = "\n".join(f"File: f{i}.py" for i in range(10))
+        with mock.patch.object(settings, "CONTEXT_WINDOW_TOKENS", 1000):
+            prompt = self.engine.build_prompt(messages, max_tokens=200, context=context)
+        self.assertLessEqual(self._count(prompt), 800)
+        self.assertTrue(prompt.startswith("<|system|>Identity: Aron."))
+        self.assertTrue(prompt.endswith("pertanyaan baru<|end|><|assistant|>"))
+        self.assertNotIn("pertanyaan lama 0", prompt)
+        self.assertIn("jawaban lama 3", prompt)
+        # Konteks tidak disentuh selama membuang history sudah cukup
+        self.assertIn("File: f9.py", prompt)
+        self.assertEqual(self.engine.last_budget["context_lines_dropped"], 0)
+        self.assertEqual(self.engine.last_budget["dropped_messages"] % 2, 0)
+
+    def test_context_is_trimmed_after_history(self):
+        messages = [self.SYSTEM] + self._history(1) + [{"role": "user", "content": "pertanyaan baru"}]
+        context = "\n".join(f"File: f{i}.py " + "isi " * 20 for i in range(40))
+        with mock.patch.object(settings, "CONTEXT_WINDOW_TOKENS", 1000):
+            prompt = self.engine.build_prompt(messages, max_tokens=200, context=context)
+        stats = self.engine.last_budget
+        self.assertLessEqual(self._count(prompt), 800)
+        self.assertEqual(stats["dropped_messages"], 2)
+        self.assertGreater(stats["context_lines_dropped"], 0)
+        self.assertIn("File: f0.py", prompt)
+        self.assertNotIn("File: f39.py", prompt)
+        self.assertTrue(prompt.endswith("pertanyaan baru<|end|><|assistant|>"))
+
+    def test_raw_prompt_keeps_head_and_tail(self):
+        raw = "HEAD " + "tengah " * 3000 + "TAIL"
+        with mock.patch.object(settings, "CONTEXT_WINDOW_TOKENS", 1000):
+            output = self.engine.generate_oneshot(raw, max_tokens=200)
+            prompt, max_tokens = self.engine._fit_raw(raw, 200)
+        self.assertEqual(output, "OK.")
+        self.assertEqual(max_tokens, 200)
+        self.assertLessEqual(self._count(prompt), 800)
+        self.assertTrue(prompt.startswith("HEAD") and prompt.endswith("TAIL"))
+
+class TestModelPool(EngineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp(prefix="aron-pool-")
+        self.paths = {}
+        for name in ("fast", "heavy", "summarizer"):
+            path = os.path.join(self.tmp, f"{name}.gguf")
+            with open(path, "wb") as f:
+                f.write(b"\0" * 400)
+            self.paths[name] = path
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    @staticmethod
+    def _loader(path):
+        backend = ScriptedBackend([path])
+        backend.load(path)
+        return backend
+
+    def test_lru_eviction_under_budget(self):
+        pool = ModelPool(budget_bytes=1000)
+        fast = pool.acquire(self.paths["fast"], self._loader)
+        pool.acquire(self.paths["heavy"], self._loader)
+        self.assertIs(pool.acquire(self.paths["fast"], self._loader), fast)
+        pool.acquire(self.paths["summarizer"], self._loader)
+        self.assertEqual(list(pool.resident), [self.paths["fast"], self.paths["summarizer"]])
+        events = pool.drain_events()
+        self.assertEqual([e["event"] for e in events], ["load", "load", "evict", "load"])
+        self.assertEqual(events[2]["model"], "heavy.gguf")
+        self.assertIn("resident_sec", events[2])
+        self.assertEqual([m["uses"] for m in pool.residency()], [2, 1])
+        self.assertEqual(pool.drain_events(), [])
+
+    def test_preload_predicted_model(self):
+        pool = ModelPool(budget_bytes=1000)
+        for name in ("fast", "heavy", "fast"):
+            pool.acquire(self.paths[name], self._loader)
+        self.assertEqual(pool.predict_next(self.paths["fast"]), self.paths["heavy"])
+        pool.evict(self.paths["heavy"])
+        thread = pool.preload(self.paths["heavy"], self._loader)
+        thread.join(5)
+        # Model preload belum dipakai: di ujung LRU sampai di-acquire
+        self.assertEqual(list(pool.resident), [self.paths["heavy"], self.paths["fast"]])
+        self.assertEqual(pool.drain_events()[-1]["event"], "preload")
+        # Preload tidak pernah mengeluarkan model lain
+        self.assertIsNone(pool.preload(self.paths["summarizer"], self._loader))
+        pool.acquire(self.paths["heavy"], self._loader)
+        self.assertEqual(list(pool.resident), [self.paths["fast"], self.paths["heavy"]])
+
+    def test_acquire_waits_for_running_preload(self):
+        pool = ModelPool(budget_bytes=1000)
+        pool.acquire(self.paths["fast"], self._loader)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_loader(path):
+            started.set()
+            release.wait(5)
+            return self._loader(path)
+
+        thread = pool.preload(self.paths["heavy"], slow_loader)
+        started.wait(5)
+        # Ukuran preload yang sedang berjalan sudah dihitung dari anggaran
+        self.assertFalse(pool._fits(400))
+        threading.Timer(0.1, release.set).start()
+        pool.acquire(self.paths["fast"], self._loader)
+        self.assertFalse(thread.is_alive())
+        self.assertIn(self.paths["heavy"], pool.resident)
+        self.assertEqual(pool._pending_bytes, 0)
+
+    def test_engine_serves_routed_model(self):
+        engine = self.engine
+        engine.prompt_prefix = [{"role": "system", "content": "Sistem."}]
+        engine.set_backend(ScriptedBackend(["default"]))
+        routes = {"heavy": self.paths["heavy"], "summarizer": os.path.join(self.tmp, "missing.gguf")}
+        with mock.patch.multiple(settings, MODEL_ROUTES=routes, INFERENCE_BACKEND="scripted"):
+            self.assertEqual(engine.use_model("fast"), engine.default_model_path)
+            self.assertEqual(engine.generate_oneshot("x"), "default")
+            default_backend = engine.backend
+            self.assertEqual(engine.use_model("heavy"), self.paths["heavy"])
+            self.assertEqual(engine.generate_oneshot("x"), "OK.")
+            self.assertEqual(len(engine.pool.resident), 2)
+            # Statistik prefix per model: tiap backend resident punya KV prefix sendiri
+            self.assertIs(engine.prefix_stats, engine.backend.prefix_stats)
+            self.assertIsNot(engine.prefix_stats, default_backend.prefix_stats)
+            self.assertGreater(engine.prefix_stats["tokens"], 0)
+            engine.use_model("fast")
+            self.assertEqual(engine.generate_oneshot("x"), "default")
+            with mock.patch.object(ScriptedBackend, "load", side_effect=FileNotFoundError("missing.gguf")):
+                self.assertEqual(engine.use_model("summarizer"), engine.default_model_path)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,11 +1,60 @@
 import unittest
 import os
 import shutil
+import tempfile
+import zipfile
+import subprocess
+import threading
+import numpy as np
+from unittest import mock
 from pathlib import Path
 from qdrant_client import QdrantClient
 from src.memory.vector_store import VectorStore
-from src.memory.indexer import ProjectIndexer
+from src.memory.indexer import ProjectIndexer, SymbolParser
+from src.memory import models
+from src.memory.models import (
+    clear_project, init_db, replace_symbols, delete_symbols_for_files, lexical_search,
+    load_project_symbols
+)
+from src.memory.hybrid import HybridRetriever, reciprocal_rank_fusion
+from src.memory.file_filter import FileEnumerator, IgnoreMatcher, looks_generated
+from src.memory.embedding_cache import EmbeddingCache
+from src.memory.vector_backends import NumpyBackend
+from src.memory.pipeline import IndexPipeline
+from src.memory.snapshot import export_index, import_index
 from src.core.config import settings
+from src.core.memory import MemoryManager
+
+class TempDatabase:
+    """Mengarahkan SQLite simbol/cache (models.engine) dan DB_DIR ke folder sementara, bukan qdrant_db/ repo."""
+    def __init__(self):
+        self.root = Path(tempfile.mkdtemp(prefix="aron-db-"))
+        self.engine = models.create_db_engine(self.root / "aron_symbols.db")
+        self._patches = [
+            mock.patch.object(models, "engine", self.engine),
+            mock.patch.object(settings, "DB_DIR", self.root),
+            mock.patch.object(settings, "DB_PATH", self.root / "aron_symbols.db"),
+        ]
+
+    def start(self):
+        for patch in self._patches:
+            patch.start()
+        init_db()
+
+    def stop(self):
+        for patch in reversed(self._patches):
+            patch.stop()
+        self.engine.dispose()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+_module_db = TempDatabase()
+
+def setUpModule():
+    # VectorStore / EmbeddingCache di tes lain juga menulis ke DB_DIR: jangan sentuh qdrant_db/ yang ter-track
+    _module_db.start()
+
+def tearDownModule():
+    _module_db.stop()
 
 class TestMemorySystem(unittest.TestCase):
     @classmethod
@@ -37,6 +86,105 @@ class TestMemorySystem(unittest.TestCase):
         self.assertTrue(len(results) > 0, "No results found for 'test_func'")
         self.assertEqual(results[0]['name'], "test_func")
 
+    def test_upsert_is_idempotent(self):
+        """Simbol yang sama di-upsert berulang kali tetap menjadi satu point."""
+        symbol = {
+            "name": "stable_func",
+            "type": "Definition",
+            "file_path": "stable.py",
+            "line_start": 3,
+            "line_end": 9,
+            "signature": "def stable_func():",
+            "content": "def stable_func():\n    return 42"
+        }
+        before = self.vector_store.count_points()
+        for _ in range(3):
+            self.vector_store.add_symbols([dict(symbol)])
+        self.assertEqual(self.vector_store.count_points(), before + 1)
+
+        self.vector_store.delete_files(["stable.py"])
+        self.assertEqual(self.vector_store.count_points(), before)
+
+    def test_search_cache_invalidated_on_index_change(self):
+        symbol = {
+            "name": "cached_lookup", "type": "Definition", "file_path": "cache_me.py",
+            "line_start": 1, "line_end": 2, "signature": "def cached_lookup():",
+            "content": "def cached_lookup():\n    return 1"
+        }
+        self.vector_store.add_symbols([symbol])
+        first = self.vector_store.search("cached_lookup", limit=2)
+        with mock.patch.object(self.vector_store.client, "query_batch_points") as query:
+            self.assertEqual(self.vector_store.search("cached_lookup", limit=2), first)
+            query.assert_not_called()
+
+        self.vector_store.delete_files(["cache_me.py"])
+        hits = self.vector_store.query_cache.hits
+        after = self.vector_store.search("cached_lookup", limit=2)
+        self.assertNotIn("cache_me.py", [r["file_path"] for r in after])
+        # Embedding query tetap diambil dari LRU meski hasilnya dihitung ulang
+        self.assertEqual(self.vector_store.query_cache.hits, hits + 1)
+
+    def test_search_many_batches_queries_in_order(self):
+        symbols = [
+            {"name": name, "type": "Definition", "file_path": f"{name}.py", "line_start": 1, "line_end": 2,
+             "signature": f"def {name}():", "content": f"def {name}():\n    pass"}
+            for name in ("alpha_loader", "beta_router", "gamma_parser")
+        ]
+        self.vector_store.add_symbols(symbols)
+        queries = ["gamma_parser", "alpha_loader", "beta_router"]
+        model = self.vector_store.model
+        with mock.patch.object(model, "embed", wraps=model.embed) as embed, \
+             mock.patch.object(self.vector_store.client, "query_batch_points",
+                               wraps=self.vector_store.client.query_batch_points) as batch:
+            results = self.vector_store.search_many(queries, limit=1)
+        embed.assert_called_once()
+        batch.assert_called_once()
+        self.assertEqual([r[0]["name"] for r in results], queries)
+        self.vector_store.delete_files([f"{q}.py" for q in queries])
+
+    def test_embed_texts_sorts_by_length_and_keeps_order(self):
+        texts = ["x" * 300 + " long", "short", "y" * 40 + " medium", "tiny"]
+        model = self.vector_store.model
+        with mock.patch.object(model, "embed", wraps=model.embed) as embed, \
+             mock.patch.object(settings, "EMBEDDING_BATCH_SIZE", 2):
+            vectors = self.vector_store.embed_texts(texts)
+        sent = list(embed.call_args.args[0])
+        self.assertEqual(sent, sorted(texts, key=len))
+        self.assertEqual(embed.call_args.kwargs["batch_size"], 2)
+        for text, vector in zip(texts, vectors):
+            self.assertTrue(np.allclose(vector, self.vector_store.embed_query(text), atol=1e-4))
+
+    def test_content_stored_once_and_hydrated(self):
+        symbol = {"name": "hydrate_me", "type": "Definition", "file_path": "hydrate.py", "line_start": 1,
+                  "line_end": 2, "signature": "def hydrate_me():", "content": "def hydrate_me():\n    return 'body'"}
+        project = self.vector_store.project_hash
+        init_db()
+        replace_symbols(project, ["hydrate.py"], [dict(symbol)])
+        self.vector_store.add_symbols([dict(symbol)])
+        try:
+            vector = self.vector_store.embed_query("hydrate_me")
+            raw = self.vector_store.backend.search_batch([vector], 1)[0][0]
+            self.assertNotIn("content", raw)
+            self.assertEqual(self.vector_store.search("hydrate_me", limit=1)[0]["content"], symbol["content"])
+            self.assertNotIn("content", self.vector_store.search("hydrate_me", limit=1, with_content=False)[0])
+        finally:
+            self.vector_store.delete_files(["hydrate.py"])
+            delete_symbols_for_files(project, ["hydrate.py"])
+
+    def test_feedback_iterations_reuse_cycle_retrieval(self):
+        with mock.patch.object(settings, "HYBRID_SEARCH", False):
+            memory = MemoryManager(vector_store=mock.Mock())
+        memory.vector_store.search.return_value = [{"file_path": "a.py", "content": "x"}]
+        memory.begin_cycle()
+        memory.get_combined_context("how does auth work")
+        memory.get_combined_context("[SYSTEM FEEDBACK]: [COMMAND OUTPUT]:\n" + "log line\n" * 500)
+        memory.get_combined_context("[CRITIC FEEDBACK]: [\"missing test\"]")
+        memory.vector_store.search.assert_called_once_with("how does auth work", limit=3)
+
+        memory.begin_cycle()
+        memory.get_combined_context("[SYSTEM FEEDBACK]: first input of a new cycle")
+        self.assertEqual(memory.vector_store.search.call_count, 2)
+
     def test_path_filtering(self):
         # Pastikan .venv diabaikan
         symbols = [
@@ -50,12 +198,562 @@ class TestMemorySystem(unittest.TestCase):
                 "content": "def ignored(): pass"
             }
         ]
+        before = self.vector_store.count_points()
         self.vector_store.add_symbols(symbols)
+        # Ditolak saat indexing, bukan disaring per query
+        self.assertEqual(self.vector_store.count_points(), before)
         
         results = self.vector_store.search("ignored_func", limit=10)
         # Seharusnya tidak ditemukan karena .venv masuk IGNORED_DIRS
         for res in results:
             self.assertNotIn(".venv", res['file_path'])
 
+    def test_scoped_search(self):
+        symbols = [
+            {"name": "render_widget", "type": "Definition", "file_path": path, "line_start": 1, "line_end": 3,
+             "signature": "render_widget", "content": "render widget tree"}
+            for path in ("lib/ui/render.dart", "tools/render.py")
+        ]
+        self.vector_store.add_symbols(symbols)
+        try:
+            in_lib = self.vector_store.search("render widget", limit=5, path_prefix="lib/")
+            self.assertEqual({r["file_path"] for r in in_lib}, {"lib/ui/render.dart"})
+            self.assertEqual(in_lib[0]["language"], "dart")
+            only_python = self.vector_store.search("render widget", limit=5, language="python")
+            self.assertIn("tools/render.py", {r["file_path"] for r in only_python})
+            self.assertTrue(all(r["language"] == "python" for r in only_python))
+            self.assertEqual(self.vector_store.search("render widget", limit=5, path_prefix="li"), [])
+        finally:
+            self.vector_store.delete_files([s["file_path"] for s in symbols])
+
+    def test_incremental_scan(self):
+        """Scan kedua hanya memproses file yang berubah, baru, atau terhapus."""
+        project_dir = tempfile.mkdtemp()
+        original = (self.vector_store.collection_name, self.vector_store.project_hash)
+        self.vector_store.collection_name = "test_incremental"
+        self.vector_store.project_hash = "test_incremental"
+        self.vector_store._init_collection()
+        try:
+            for name in ["a.py", "b.py", "c.py"]:
+                with open(os.path.join(project_dir, name), "w") as f:
+                    f.write(f"def func_{name[0]}():\n    return 1\n")
+            indexer = ProjectIndexer(project_dir, self.vector_store)
+
+            stats = indexer.scan_project()
+            self.assertEqual(stats["added"], 3)
+
+            with open(os.path.join(project_dir, "a.py"), "w") as f:
+                f.write("def func_a_renamed():\n    return 2\n")
+            os.remove(os.path.join(project_dir, "c.py"))
+            with open(os.path.join(project_dir, "d.py"), "w") as f:
+                f.write("class NewThing:\n    pass\n")
+
+            stats = indexer.scan_project()
+            self.assertEqual(
+                (stats["added"], stats["changed"], stats["skipped"], stats["removed"]),
+                (1, 1, 1, 1)
+            )
+            names = {r['name'] for r in self.vector_store.search("func", limit=10)}
+            self.assertNotIn("func_c", names)
+            self.assertNotIn("func_a", names)
+        finally:
+            clear_project("test_incremental")
+            self.vector_store.client.delete_collection("test_incremental")
+            self.vector_store.collection_name, self.vector_store.project_hash = original
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+    def test_failed_embedding_keeps_points_and_retries(self):
+        """Batch yang gagal di-embed tidak menghapus point lama dan file-nya tidak masuk manifest."""
+        project_dir = tempfile.mkdtemp()
+        original = (self.vector_store.collection_name, self.vector_store.project_hash)
+        self.vector_store.collection_name = self.vector_store.project_hash = "test_embed_failure"
+        self.vector_store._init_collection()
+        try:
+            with open(os.path.join(project_dir, "a.py"), "w") as f:
+                f.write("def flaky_original():\n    return 1\n")
+            indexer = ProjectIndexer(project_dir, self.vector_store)
+            indexer.scan_project(verbose=False)
+            with open(os.path.join(project_dir, "a.py"), "w") as f:
+                f.write("def flaky_changed():\n    return 2\n")
+
+            real_embed = self.vector_store.embed_symbols
+            with mock.patch.object(self.vector_store, "embed_symbols",
+                                   side_effect=[RuntimeError("ONNX session failed"), real_embed]) as embed:
+                indexer.scan_project(verbose=False)
+                self.assertEqual(indexer.last_pipeline_stats["failed_files"], 1)
+                names = {r["name"] for r in self.vector_store.search("flaky", limit=5)}
+                self.assertEqual(names, {"flaky_original"})
+
+                # Scan berikutnya melihat file sebagai berubah dan mencoba lagi
+                embed.side_effect = real_embed
+                stats = indexer.scan_project(verbose=False)
+            self.assertEqual(stats["changed"], 1)
+            names = {r["name"] for r in self.vector_store.search("flaky", limit=5)}
+            self.assertEqual(names, {"flaky_changed"})
+        finally:
+            clear_project("test_embed_failure")
+            self.vector_store.client.delete_collection("test_embed_failure")
+            self.vector_store.collection_name, self.vector_store.project_hash = original
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+    def test_retried_new_file_is_not_duplicated_in_sql(self):
+        """File baru yang batch embed-nya gagal di-index ulang tanpa baris CodeSymbol/FTS ganda."""
+        project_dir = tempfile.mkdtemp()
+        original = (self.vector_store.collection_name, self.vector_store.project_hash)
+        self.vector_store.collection_name = self.vector_store.project_hash = "test_retry_new"
+        self.vector_store._init_collection()
+        try:
+            with open(os.path.join(project_dir, "a.py"), "w") as f:
+                f.write("def retry_base():\n    return 1\n")
+            indexer = ProjectIndexer(project_dir, self.vector_store)
+            indexer.scan_project(verbose=False)
+            with open(os.path.join(project_dir, "b.py"), "w") as f:
+                f.write("def retry_fresh():\n    return 2\n")
+
+            with mock.patch.object(self.vector_store, "embed_symbols", side_effect=RuntimeError("ONNX session failed")):
+                indexer.scan_project(verbose=False)
+            self.assertEqual(indexer.last_pipeline_stats["failed_files"], 1)
+            stats = indexer.scan_project(verbose=False)
+            self.assertEqual(stats["added"], 1)
+
+            rows = [s["name"] for s in load_project_symbols("test_retry_new") if s["file_path"] == "b.py"]
+            self.assertEqual(rows, ["retry_fresh"])
+            hits = [h["name"] for h in lexical_search("test_retry_new", "retry_fresh")]
+            self.assertEqual(hits.count("retry_fresh"), 1)
+            self.assertEqual(self.vector_store.search("retry_fresh", limit=1)[0]["name"], "retry_fresh")
+        finally:
+            clear_project("test_retry_new")
+            self.vector_store.client.delete_collection("test_retry_new")
+            self.vector_store.collection_name, self.vector_store.project_hash = original
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+    def test_snapshot_export_import_reindexes_only_changed_files(self):
+        source_dir, target_dir, archive_dir = tempfile.mkdtemp(), tempfile.mkdtemp(), tempfile.mkdtemp()
+        original = (self.vector_store.collection_name, self.vector_store.project_hash)
+        archive = os.path.join(archive_dir, "index.zip")
+        try:
+            for name in ["a.py", "b.py", "c.py"]:
+                for root in (source_dir, target_dir):
+                    with open(os.path.join(root, name), "w") as f:
+                        f.write(f"def snap_{name[0]}():\n    return '{name}'\n")
+            self.vector_store.collection_name = self.vector_store.project_hash = "snap_src"
+            self.vector_store._init_collection()
+            ProjectIndexer(source_dir, self.vector_store).scan_project(verbose=False)
+            meta = export_index(self.vector_store, archive)
+            self.assertEqual((meta["points"], meta["files"]), (3, 3))
+
+            # Checkout lain: path & mtime berbeda, satu file diubah
+            with open(os.path.join(target_dir, "b.py"), "w") as f:
+                f.write("def snap_b_changed():\n    return 2\n")
+            self.vector_store.collection_name = self.vector_store.project_hash = "snap_dst"
+            self.vector_store._init_collection()
+            import_index(self.vector_store, archive)
+            self.assertEqual(self.vector_store.count_points(), 3)
+            self.assertIn("return 'a.py'", self.vector_store.search("snap_a", limit=1)[0]["content"])
+
+            stats = ProjectIndexer(target_dir, self.vector_store).scan_project(verbose=False)
+            self.assertEqual((stats["added"], stats["changed"], stats["skipped"]), (0, 1, 2))
+            self.assertEqual(self.vector_store.count_points(), 3)
+
+            with mock.patch.object(settings, "EMBEDDING_MODEL", "other/model"):
+                with self.assertRaises(ValueError):
+                    import_index(self.vector_store, archive)
+
+            # Arsip rusak ditolak sebelum index yang ada dihapus
+            not_zip = os.path.join(archive_dir, "notes.txt")
+            with open(not_zip, "w") as f:
+                f.write("bukan zip")
+            truncated = os.path.join(archive_dir, "truncated.zip")
+            with zipfile.ZipFile(archive) as src, zipfile.ZipFile(truncated, "w") as dst:
+                for item in src.namelist():
+                    if item == "points.jsonl":
+                        dst.writestr(item, src.read(item).splitlines(keepends=True)[0])
+                    elif item != "files.jsonl":
+                        dst.writestr(item, src.read(item))
+            for broken in (not_zip, truncated):
+                with self.assertRaises(ValueError):
+                    import_index(self.vector_store, broken)
+            with zipfile.ZipFile(truncated, "a") as zf:
+                zf.writestr("files.jsonl", b"")
+            with self.assertRaisesRegex(ValueError, "points.jsonl berisi 1 baris"):
+                import_index(self.vector_store, truncated)
+            self.assertEqual(self.vector_store.count_points(), 3)
+        finally:
+            for name in ("snap_src", "snap_dst"):
+                clear_project(name)
+                self.vector_store.client.delete_collection(name)
+            self.vector_store.collection_name, self.vector_store.project_hash = original
+            for path in (source_dir, target_dir, archive_dir):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def test_parallel_parse_matches_serial(self):
+        """Mode process pool menghasilkan simbol yang sama dengan mode serial."""
+        project_dir = tempfile.mkdtemp()
+        try:
+            jobs = []
+            for i in range(settings.INDEX_PARALLEL_MIN_FILES + 4):
+                path = os.path.join(project_dir, f"mod_{i}.py")
+                with open(path, "w") as f:
+                    f.write(f"class Model{i}:\n    def method_{i}(self):\n        pass\n")
+                jobs.append((path, f"mod_{i}.py", ".py", None))
+
+            serial = ProjectIndexer(project_dir, self.vector_store, workers=1)
+            parallel = ProjectIndexer(project_dir, self.vector_store, workers=2)
+            key = lambda result: result[0]
+            self.assertEqual(
+                sorted(serial._parse_jobs(jobs), key=key),
+                sorted(parallel._parse_jobs(jobs), key=key)
+            )
+        finally:
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+class TestSymbolParser(unittest.TestCase):
+    def test_per_language_queries(self):
+        """Query dikompilasi sekali per bahasa dan mengenali definisi khas tiap bahasa."""
+        parser = SymbolParser()
+        samples = {
+            "python": ("a.py", "class A:\n    def run(self):\n        pass\n", {"A", "run"}),
+            "typescript": ("a.ts", "interface I {}\nclass A { run() {} }\n", {"I", "A", "run"}),
+            "kotlin": ("a.kt", "class A {\n  fun run() {}\n}\n", {"A", "run"}),
+        }
+        for lang_name, (rel_path, source, expected) in samples.items():
+            if lang_name not in parser.parsers:
+                continue
+            self.assertIn(lang_name, parser.queries)
+            names = {s['name'] for s in parser._parse_with_treesitter(source, rel_path, lang_name)}
+            self.assertEqual(names, expected, lang_name)
+
+    def test_regex_fallback_single_pass(self):
+        """Scanner regex memetakan match ke nomor baris dan jendela konten yang benar."""
+        parser = SymbolParser()
+        source = "import 'x.dart';\r\nclass Home extends StatelessWidget {\r\n  Widget build(BuildContext c) {\r\n    return Text('hi');\r\n  }\r\n}\r\n"
+        symbols = parser._parse_with_regex(source, "home.dart", ".dart")
+        self.assertEqual([(s['name'], s['line_start'], s['line_end']) for s in symbols], [("Home", 2, 6), ("build", 3, 6)])
+        self.assertEqual(symbols[1]['signature'], "Widget build(BuildContext c) {")
+        self.assertEqual(symbols[1]['content'], "  Widget build(BuildContext c) {\n    return Text('hi');\n  }\n}")
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.db = TempDatabase()
+        self.db.start()
+        self.addCleanup(self.db.stop)
+
+    def test_only_misses_reach_the_model(self):
+        """Teks yang sudah pernah di-embed diambil dari cache, bukan dari model."""
+        import numpy as np
+        embedded = []
+        def fake_embed(texts):
+            embedded.extend(texts)
+            return [np.full(4, len(t), dtype=np.float32) for t in texts]
+
+        cache = EmbeddingCache("test-model")
+        first = cache.embed(["alpha", "beta", "alpha"], fake_embed)
+        second = EmbeddingCache(cache.model_name).embed(["beta", "gamma"], fake_embed)
+
+        self.assertEqual(embedded, ["alpha", "beta", "gamma"])
+        self.assertEqual([v[0] for v in first], [5, 4, 5])
+        self.assertEqual([v[0] for v in second], [4, 5])
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+class TestNumpyBackend(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _points(self, count):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((count, 384)).astype(np.float32)
+        return vectors, [
+            (f"s{i}", vectors[i].tolist(), {"name": f"s{i}", "file_path": f"pkg/f{i % 3}.py", "type": "Definition",
+                                            "language": "python", "dirs": ["pkg"]})
+            for i in range(count)
+        ]
+
+    def test_exact_top_k_delete_and_reopen(self):
+        vectors, points = self._points(1500)  # > kapasitas awal: memaksa file di-grow
+        backend = NumpyBackend(self.root, "col", dtype="float16")
+        backend.init_collection()
+        backend.upsert(points)
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        query = (vectors[7] + vectors[8]).tolist()
+        expected = [f"s{i}" for i in np.argsort(-(normed @ np.asarray(query)))[:2]]
+        self.assertEqual([p["name"] for p in backend.search_batch([query], 2)[0]], expected)
+
+        backend.delete_files(["pkg/f1.py"])  # s7 ada di f1
+        self.assertEqual(backend.count(), 1000)
+        self.assertNotEqual(backend.search_batch([vectors[7].tolist()], 1)[0][0]["file_path"], "pkg/f1.py")
+        backend.upsert([points[8]])  # id sama -> timpa, bukan duplikat
+        self.assertEqual(backend.count(), 1000)
+        backend.close()
+
+        reopened = NumpyBackend(self.root, "col", dtype="float16")
+        reopened.init_collection()
+        self.assertEqual(reopened.count(), 1000)
+        self.assertEqual(reopened.search_batch([vectors[8].tolist()], 1)[0][0]["name"], "s8")
+        self.assertEqual(reopened.search_batch([vectors[8].tolist()], 5, path_prefix="other/"), [[]])
+        exported = [point for batch in reopened.iter_points(300) for point in batch]
+        self.assertEqual(len(exported), 1000)
+        self.assertNotIn("s7", {pid for pid, _, _ in exported})
+        reopened.close()
+
+    def test_quantized_rescoring_and_disk_payloads(self):
+        vectors, points = self._points(1200)
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = [(vectors[i] + 0.3 * vectors[i + 1]).tolist() for i in range(0, 40, 4)]
+        for quantization in ("int8", "binary"):
+            backend = NumpyBackend(self.root, quantization, quantization=quantization,
+                                   oversampling=10.0, payloads_on_disk=True)
+            backend.init_collection()
+            backend.upsert(points)
+            for query, results in zip(queries, backend.search_batch(queries, 2)):
+                expected = [f"s{i}" for i in np.argsort(-(normed @ np.asarray(query)))[:2]]
+                # Rescoring memakai vektor penuh: urutan akhir sama dengan float32 exact
+                self.assertEqual([p["name"] for p in results], expected)
+            footprint = backend.footprint()
+            self.assertEqual(footprint["payloads_in_memory"], 0)
+            self.assertLess(footprint["scanned_per_query"], footprint["full_vectors"] / 3)
+
+            backend.delete_files(["pkg/f0.py"])  # Kompaksi/offset tetap konsisten setelah reopen
+            backend.close()
+            reopened = NumpyBackend(self.root, quantization, quantization=None, payloads_on_disk=True)
+            reopened.init_collection()
+            self.assertEqual(reopened.count(), 800)
+            self.assertEqual(reopened.search_batch([vectors[1].tolist()], 1)[0][0]["name"], "s1")
+            reopened.close()
+
+    def test_collection_is_locked_while_open(self):
+        owner = NumpyBackend(self.root, "col")
+        owner.init_collection()
+        owner.upsert(self._points(3)[1])
+        other = NumpyBackend(self.root, "col")
+        with self.assertRaisesRegex(RuntimeError, "locked by another process"):
+            other.init_collection()
+        # Koleksi lain tidak terpengaruh; setelah pemilik menutup, koleksi bisa dibuka lagi
+        unrelated = NumpyBackend(self.root, "other")
+        unrelated.init_collection()
+        unrelated.close()
+        owner.close()
+        self.assertEqual(other.count(), 3)
+        other.close()
+
+    def test_vector_store_falls_back_when_qdrant_fails(self):
+        def broken(path):
+            raise RuntimeError("Storage folder is already accessed by another instance")
+        with mock.patch("src.memory.vector_store.QdrantClient", broken), \
+             mock.patch.object(settings, "DB_DIR", Path(self.root)):
+            store = VectorStore()
+        try:
+            self.assertIsInstance(store.backend, NumpyBackend)
+            self.assertIsNone(store.client)
+            store.add_symbols([{"name": "fallback_func", "type": "Definition", "file_path": "lib/a.py",
+                                "line_start": 1, "line_end": 2, "signature": "fallback_func",
+                                "content": "def fallback_func(): pass"}])
+            self.assertEqual(store.count_points(), 1)
+            self.assertEqual(store.search("fallback_func", limit=1, path_prefix="lib")[0]["name"], "fallback_func")
+        finally:
+            store.close()
+
+class TestHybridRetriever(unittest.TestCase):
+    PROJECT = "test_hybrid"
+    SYMBOLS = [
+        {"name": "ProjectIndexer", "type": "Definition", "file_path": "indexer.py", "line_start": 1, "line_end": 9,
+         "signature": "ProjectIndexer", "content": "class ProjectIndexer:\n    def scan_project(self): pass"},
+        {"name": "_run_shell", "type": "Definition", "file_path": "orchestrator.py", "line_start": 4, "line_end": 8,
+         "signature": "_run_shell", "content": "def _run_shell(self, cmd):\n    return subprocess.run(cmd)"},
+        {"name": "load_manifest", "type": "Definition", "file_path": "models.py", "line_start": 2, "line_end": 6,
+         "signature": "load_manifest", "content": "def load_manifest(project):\n    return manifest rows"},
+    ]
+
+    def setUp(self):
+        self.db = TempDatabase()
+        self.db.start()
+        self.addCleanup(self.db.stop)
+        replace_symbols(self.PROJECT, [], self.SYMBOLS)
+        self.store = mock.Mock(project_hash=self.PROJECT)
+        self.store.search.return_value = []
+        self.retriever = HybridRetriever(self.store)
+
+    def test_identifier_query_skips_embedding(self):
+        for query in ("ProjectIndexer", "`_run_shell()`", "orchestrator._run_shell"):
+            results = self.retriever.search(query, limit=3)
+            self.assertEqual(results[0]["name"], query.strip("`()").rsplit(".", 1)[-1])
+        self.store.search.assert_not_called()
+        self.assertEqual(self.retriever.stats["identifier"], 3)
+
+    def test_lexical_index_follows_symbol_table(self):
+        self.assertEqual([r["name"] for r in lexical_search(self.PROJECT, "manifest rows")], ["load_manifest"])
+        delete_symbols_for_files(self.PROJECT, ["models.py"])
+        self.assertEqual(lexical_search(self.PROJECT, "manifest rows"), [])
+
+    def test_fusion_combines_dense_and_lexical(self):
+        dense_only = {"name": "semantic_hit", "file_path": "x.py", "line_start": 1}
+        self.store.search.return_value = [dense_only, self.SYMBOLS[1]]
+        results = self.retriever.search("how do we run a shell subprocess", limit=3)
+        # Muncul di kedua ranking -> peringkat teratas setelah fusion
+        self.assertEqual(results[0]["name"], "_run_shell")
+        self.assertIn("semantic_hit", [r["name"] for r in results])
+
+    def test_reciprocal_rank_fusion(self):
+        a, b, c = ({"name": n, "file_path": "f.py", "line_start": i} for i, n in enumerate("abc"))
+        fused = reciprocal_rank_fusion([[a, b, c], [c, b]], k=60, limit=2)
+        self.assertEqual([s["name"] for s in fused], ["c", "b"])
+
+class TestEmbeddingWarmup(unittest.TestCase):
+    def _store(self, mode):
+        with mock.patch.object(settings, "EMBEDDING_WARMUP", mode), \
+             mock.patch("src.memory.vector_store.QdrantClient", lambda path: QdrantClient(":memory:")):
+            return VectorStore()
+
+    def test_lazy_mode_loads_on_first_search(self):
+        store = self._store("lazy")
+        try:
+            self.assertFalse(store.is_model_ready())
+            store.search("anything", limit=1)
+            self.assertTrue(store.is_model_ready())
+            self.assertIsNotNone(store.model)
+        finally:
+            store.close()
+
+    def test_background_mode_does_not_block_construction(self):
+        loaded = threading.Event()
+        release = threading.Event()
+        original = VectorStore._load_model
+
+        def slow_load(store):
+            release.wait(5.0)
+            original(store)
+            loaded.set()
+
+        with mock.patch.object(VectorStore, "_load_model", slow_load):
+            store = self._store("background")
+            try:
+                self.assertFalse(store.is_model_ready())
+                release.set()
+                # search menunggu warm-up yang sedang berjalan, bukan memuat ulang
+                store.search("anything", limit=1)
+                self.assertTrue(loaded.is_set())
+                self.assertTrue(store.is_model_ready())
+            finally:
+                store.close()
+
+class RecordingStore:
+    """Vector store palsu yang mencatat urutan operasi pipeline."""
+    def __init__(self):
+        self.calls = []
+
+    def embed_symbols(self, symbols):
+        return [s["name"] for s in symbols]
+
+    def upsert_embedded(self, symbols, embeddings):
+        self.calls.append(("upsert", list(embeddings)))
+
+    def delete_files(self, paths):
+        if paths: self.calls.append(("delete", list(paths)))
+
+class TestIndexPipeline(unittest.TestCase):
+    def test_batches_keep_order_and_report_metrics(self):
+        store = RecordingStore()
+        pipeline = IndexPipeline(store, batch_size=3, queue_size=1)
+        pipeline.start()
+        pipeline.mark_stale("a.py")
+        pipeline.submit([{"name": f"s{i}"} for i in range(4)])
+        pipeline.mark_stale("b.py")
+        pipeline.submit([{"name": "s4"}])
+        metrics = pipeline.close()
+
+        # Point lama selalu dihapus sebelum batch yang menggantikannya di-upsert
+        self.assertEqual(store.calls, [
+            ("delete", ["a.py"]), ("upsert", ["s0", "s1", "s2"]),
+            ("delete", ["b.py"]), ("upsert", ["s3", "s4"]),
+        ])
+        self.assertEqual(metrics["stages"]["embed"]["items"], 5)
+        self.assertEqual(metrics["stages"]["upsert"]["batches"], 2)
+        self.assertIn(metrics["bottleneck"], ("parse", "embed", "upsert"))
+
+    def test_failed_batch_is_reported_and_keeps_stale_points(self):
+        store = RecordingStore()
+        calls = {"n": 0}
+        def flaky(symbols):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise RuntimeError("ONNX session failed")
+            return [s["name"] for s in symbols]
+        store.embed_symbols = flaky
+        pipeline = IndexPipeline(store, batch_size=2, queue_size=1)
+        pipeline.start()
+        pipeline.mark_stale("a.py")
+        pipeline.submit([{"name": "a0", "file_path": "a.py"}, {"name": "a1", "file_path": "a.py"}])
+        pipeline.mark_stale("b.py")
+        pipeline.submit([{"name": "b0", "file_path": "b.py"}])
+        metrics = pipeline.close()
+
+        self.assertEqual(store.calls, [("delete", ["b.py"]), ("upsert", ["b0"])])
+        self.assertEqual(pipeline.failed, {"a.py"})
+        self.assertEqual(metrics["failed_files"], 1)
+
+class TestFileEnumerator(unittest.TestCase):
+    def setUp(self):
+        self.project_dir = tempfile.mkdtemp()
+        files = {
+            "app/main.py": "def main(): pass\n",
+            "app/keep.py": "x = 1\n",
+            "generated/api.py": "x = 1\n",
+            "lib/model.g.dart": "class A {}\n",
+            "lib/model.dart": "class A {}\n",
+            "lib/sub/local.py": "x = 1\n",
+            "lib/sub/skip_me.py": "x = 1\n",
+            "vendor/big.js": "x" * 2048,
+            "notes/todo.py": "x = 1\n",
+            ".gitignore": "generated/\n*.py\n!app/*.py\n!lib/**/*.py\n",
+            ".aronignore": "notes/\n",
+            "lib/sub/.gitignore": "skip_me.py\n",
+        }
+        for rel_path, content in files.items():
+            path = os.path.join(self.project_dir, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.project_dir, ignore_errors=True)
+
+    def _listed(self):
+        enumerator = FileEnumerator(self.project_dir)
+        return {os.path.relpath(path, self.project_dir) for path, _ext, _st in enumerator.iter_files()}
+
+    def test_walk_respects_ignore_files_and_limits(self):
+        with mock.patch.object(settings, "INDEX_USE_GIT", False), \
+             mock.patch.object(settings, "INDEX_MAX_FILE_BYTES", 1024):
+            self.assertEqual(self._listed(), {"app/main.py", "app/keep.py", "lib/model.dart", "lib/sub/local.py"})
+
+    def test_git_index_matches_walk(self):
+        try:
+            subprocess.run(["git", "init", "-q", self.project_dir], check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest("git tidak tersedia")
+        with mock.patch.object(settings, "INDEX_MAX_FILE_BYTES", 1024):
+            self.assertEqual(self._listed(), {"app/main.py", "app/keep.py", "lib/model.dart", "lib/sub/local.py"})
+
+    def test_root_anchored_directory_pattern(self):
+        matcher = IgnoreMatcher()
+        matcher.add_pattern("/generated/")
+        matcher.add_pattern("build/")
+        matcher.add_pattern("docs/out/")
+        self.assertTrue(matcher.is_ignored("generated/a.py"))
+        self.assertFalse(matcher.is_ignored("src/generated/a.py"))
+        self.assertTrue(matcher.is_ignored("build/a.py"))
+        self.assertTrue(matcher.is_ignored("src/build/a.py"))
+        self.assertTrue(matcher.is_ignored("docs/out/a.py"))
+        self.assertFalse(matcher.is_ignored("src/docs/out/a.py"))
+        # Pola direktori tidak berlaku untuk file bernama sama
+        self.assertFalse(matcher.is_ignored("generated"))
+
+    def test_generated_content_detection(self):
+        self.assertTrue(looks_generated(b"// GENERATED CODE - DO NOT MODIFY BY HAND\nclass A {}"))
+        self.assertTrue(looks_generated(b"var a=1;" * 500))
+        self.assertFalse(looks_generated(b"def main():\n    return 1\n" * 100))
+
 if __name__ == '__main__':
     unittest.main()
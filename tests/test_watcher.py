@@ -0,0 +1,98 @@
+import unittest
+import os
+import time
+import shutil
+import tempfile
+import threading
+from unittest import mock
+from src.memory.watcher import IndexWatcher
+from src.memory.file_filter import FileEnumerator
+from src.core.config import settings
+
+class RecordingIndexer:
+    """Indexer palsu yang hanya mencatat file yang diminta untuk di-re-index."""
+    def __init__(self, project_path):
+        self.project_path = project_path
+        self.batches = []
+        self.rescans = 0
+        self.called = threading.Event()
+
+    def reindex_files(self, rel_paths):
+        self.batches.append(set(rel_paths))
+        self.called.set()
+        return {"added": 0, "changed": len(rel_paths), "removed": 0}
+
+    def scan_project(self, verbose=True):
+        self.rescans += 1
+        self.called.set()
+        return {"added": 0, "changed": 0, "removed": 0}
+
+class TestIndexWatcher(unittest.TestCase):
+    def setUp(self):
+        self.project_dir = tempfile.mkdtemp()
+        self.indexer = RecordingIndexer(self.project_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.project_dir, ignore_errors=True)
+
+    def _write(self, name, content="x = 1\n"):
+        with open(os.path.join(self.project_dir, name), "w") as f:
+            f.write(content)
+
+    def _run_watcher(self, backend):
+        with mock.patch.object(settings, "WATCH_BACKEND", backend), \
+             mock.patch.object(settings, "WATCH_POLL_INTERVAL", 0.1), \
+             mock.patch.object(FileEnumerator, "_git_files") as git_files:
+            watcher = IndexWatcher(self.indexer, debounce=0.2)
+            watcher.start()
+            try:
+                time.sleep(0.2)
+                for _ in range(3):
+                    self._write("a.py")  # Ditulis berulang, harus digabung jadi satu
+                self._write("b.py")
+                self.assertTrue(self.indexer.called.wait(5.0))
+                time.sleep(0.3)
+            finally:
+                watcher.stop()
+        # Producer hanya melakukan stat walk, tidak menjalankan `git ls-files` tiap interval
+        git_files.assert_not_called()
+        return watcher
+
+    def test_polling_backend_coalesces_events(self):
+        watcher = self._run_watcher("polling")
+        self.assertEqual(watcher.backend, "polling")
+        touched = set().union(*self.indexer.batches)
+        self.assertEqual(touched, {"a.py", "b.py"})
+
+    def test_polling_snapshot_respects_ignore_rules(self):
+        os.makedirs(os.path.join(self.project_dir, "build_out"))
+        self._write(".aronignore", "build_out/\n")
+        self._write("a.py")
+        self._write(os.path.join("build_out", "gen.py"))
+        self._write("notes.txt")
+        watcher = IndexWatcher(self.indexer)
+        self.assertEqual(set(watcher._take_snapshot()), {"a.py"})
+
+    @unittest.skipUnless(os.uname().sysname == "Linux", "inotify hanya tersedia di Linux")
+    def test_inotify_backend_coalesces_events(self):
+        watcher = self._run_watcher("auto")
+        self.assertEqual(watcher.backend, "inotify")
+        self.assertEqual(len(self.indexer.batches), 1)
+        self.assertEqual(self.indexer.batches[0], {"a.py", "b.py"})
+
+    def test_burst_over_limit_becomes_single_rescan(self):
+        watcher = IndexWatcher(self.indexer, debounce=0.1, max_pending=5)
+        with mock.patch.object(settings, "WATCH_BACKEND", "polling"):
+            watcher.start()
+        try:
+            for i in range(50):
+                watcher.notify(f"gen_{i}.py")
+            self.assertTrue(self.indexer.called.wait(5.0))
+            time.sleep(0.3)
+        finally:
+            watcher.stop()
+        self.assertEqual(self.indexer.rescans, 1)
+        self.assertEqual(self.indexer.batches, [])
+
+if __name__ == '__main__':
+    unittest.main()